@@ -139,7 +139,7 @@ def cli(expression_column_name, location, destination, api_url, api_key):
     license_data.insert(0, ['ScanCode License', 'SPDX Short Identifier',
                         'ScanCode License Category', 'ScanCode License URL'])
 
-    wb = bom_utils.create_nexb_bom(license_data)
+    wb = bom_utils.create_nexb_bom(license_data, write_only=True)
 
     click.echo('Saving License Ref to %s' % destination)
     wb.save(destination)
@@ -19,9 +19,8 @@
 import click
 
 from utilitycode import bom_utils
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import get_sheetname_from_xlsx
 from utilitycode.bom_utils import format_dict_data_for_xlsx_output
+from utilitycode.bom_utils import iter_sheets_data_from_xlsx
 
 packages_working_sheet_headers = [
     'Status',
@@ -375,12 +374,9 @@ def cli(package, resource, reorder, input, output):
     if resource:
         resource_ws = resource
 
-    sheetnames = get_sheetname_from_xlsx(input)
-
-    for sheetname in sheetnames:
+    # Read all the worksheets with a single load of the input
+    for sheetname, sheet_context, _sheet_headers in iter_sheets_data_from_xlsx(input):
         if not sheetname == package_ws and not sheetname == resource_ws:
-            sheet_context, _sheet_headers = get_data_from_xlsx(
-                input, sheetname)
             if reorder and sheetname == 'DEPENDENCIES':
                 updated_dep_list = add_and_order_fields(
                     sheet_context, dependencies_target_order)
@@ -388,8 +384,7 @@ def cli(package, resource, reorder, input, output):
             else:
                 input_data_dict[sheetname] = sheet_context
         elif sheetname == package_ws:
-            packages_context, _packages_headers = get_data_from_xlsx(
-                input, package_ws)
+            packages_context = sheet_context
             if reorder:
                 updated_packages_list = add_and_order_fields(
                     packages_context, packages_no_reported_fields_headers)
@@ -399,8 +394,7 @@ def cli(package, resource, reorder, input, output):
                     packages_list, packages_working_sheet_headers)
             input_data_dict[package_ws] = updated_packages_list
         else:
-            resources_context, _resources_headers = get_data_from_xlsx(
-                input, resource_ws)
+            resources_context = sheet_context
             if reorder:
                 updated_resources_list = add_and_order_fields(
                     resources_context, resources_no_reported_fields_headers)
@@ -526,6 +526,7 @@ def cli(report, location, destination):
     data = construct_data(
         updated_info_list, concluded_package_field_name, report)
 
-    wb = bom_utils.create_nexb_bom_from_scancode(data, report)
+    wb = bom_utils.create_nexb_bom_from_scancode(
+        data, report, write_only=True)
     click.echo('Saving BOM to %s' % destination)
     wb.save(destination)
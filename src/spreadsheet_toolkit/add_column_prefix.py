@@ -18,11 +18,10 @@
 
 import click
 
-from spreadsheet_toolkit.csv_utils import read_csv_rows
-
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
 
 
 def add_prefix(key, result):
@@ -41,6 +40,8 @@ def add_prefix(key, result):
 
 @click.command()
 @click.option('--csv', is_flag=True, help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl', is_flag=True, help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet', is_flag=True, help='Output as Parquet format (Default: XLSX format)')
 @click.option('-k', '--key', metavar='key', help='Prefix to be added to all column names.')
 @click.argument('input', required=True, metavar='INPUT',
                 type=click.Path(
@@ -48,36 +49,20 @@ def add_prefix(key, result):
 @click.argument('output', required=True, metavar='OUTPUT',
                 type=click.Path(exists=False, dir_okay=False, writable=True, resolve_path=True))
 @click.help_option('-h', '--help')
-def cli(csv, key, input, output):
+def cli(csv, jsonl, parquet, key, input, output):
     """
-    Take the input CSV/XLSX, add a defined prefix to all columns and write
-    to the output CSV/XLSX.
+    Take the input CSV/XLSX/JSONL/Parquet, add a defined prefix to all columns
+    and write to the output CSV/XLSX/JSONL/Parquet.
     """
     if not key:
         print("\nYou have not provided a prefix.  Please revise your command and re-run.")
         return
 
-    if not input.endswith('.csv') and not input.endswith('.xlsx'):
-        raise click.UsageError(
-            'ERROR: "The input does not ends with \'.csv\' or \'.xlsx\' extension.')
-    result = []
+    check_input(input)
+    output_format = get_output_format(csv, jsonl, parquet)
 
-    if input.endswith('.csv'):
-        result = read_csv_rows(input)
-    else:
-        result, _headers = get_data_from_xlsx(input)
+    result, _headers = read_input(input)
 
     new_result = add_prefix(key, result)
 
-    if csv:
-        if not output.endswith('.csv'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.csv\' extension.')
-        else:
-            write_to_csv(new_result, output)
-    else:
-        if not output.endswith('.xlsx'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.xlsx\' extension.')
-        else:
-            write_to_xlsx(new_result, output)
+    write_output(new_result, output, output_format)
@@ -17,16 +17,24 @@
 # ============================================================================
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
+from itertools import groupby
+from itertools import islice
+from operator import itemgetter
+from tempfile import NamedTemporaryFile
+from tempfile import TemporaryDirectory
 import click
+import heapq
+import pickle
 import sys
 
 from commoncode.paths import resolve
 
-from spreadsheet_toolkit.csv_utils import get_csv_headers, read_csv_rows
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
 
 
 def get_rows_by_split_resolved_path(result1, key1):
@@ -76,6 +84,154 @@ def get_rows_by_split_resolved_path_by_filename(results2, key2):
     return rows_by_split_resolved_path_by_filename
 
 
+class SegmentTrieNode(object):
+    """
+    A node of a SegmentTrie with its child nodes by path segment and the
+    indexes of the paths of its subtree, in the order they were added.
+    """
+    __slots__ = ('children', 'indexes')
+
+    def __init__(self):
+        self.children = {}
+        self.indexes = []
+
+
+class SegmentTrie(object):
+    """
+    A trie of reversed path segments for paths that share the same file name,
+    so that the paths with the longest common trailing segments with a
+    path are found in a single walk rather than comparing with every path.
+
+    The root node is for the file name: the matched score from the right of
+    the paths of a node is its depth, starting with 1 for the root node.
+    """
+    __slots__ = ('root', 'paths')
+
+    def __init__(self, split_paths=()):
+        self.root = SegmentTrieNode()
+        # The reversed path segments tuples, in the order they were added
+        self.paths = []
+        for split_path in split_paths:
+            self.add(split_path)
+
+    def add(self, split_path):
+        """
+        Add a tuple of reversed path segments, starting with the file name.
+        """
+        index = len(self.paths)
+        self.paths.append(split_path)
+        node = self.root
+        node.indexes.append(index)
+        for segment in split_path[1:]:
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = SegmentTrieNode()
+            child.indexes.append(index)
+            node = child
+
+    def walk(self, split_path):
+        """
+        Return the list of nodes matching the leading segments of a tuple of
+        reversed path segments, starting with the root node.
+        """
+        node = self.root
+        nodes = [node]
+        for segment in split_path[1:]:
+            node = node.children.get(segment)
+            if node is None:
+                break
+            nodes.append(node)
+        return nodes
+
+    def best_matches(self, split_path):
+        """
+        Return a tuple of the highest score of a tuple of reversed path
+        segments and the list of the paths with this score, in the order they
+        were added.
+        """
+        nodes = self.walk(split_path)
+        paths = self.paths
+        return len(nodes), [paths[index] for index in nodes[-1].indexes]
+
+    def scored_matches(self, split_path):
+        """
+        Return a list of (score, path) tuples for all the paths, in the order
+        they were added, where the score is the number of their leading
+        segments in common with a tuple of reversed path segments.
+        """
+        scores = [0] * len(self.paths)
+        # A path in a deeper node gets the higher score of this node
+        for score, node in enumerate(self.walk(split_path), 1):
+            for index in node.indexes:
+                scores[index] = score
+        return list(zip(scores, self.paths))
+
+
+def get_matching_segments_count(segments1, segments2):
+    """
+    Return the number of path segments of the `segments1` sequence that match
+    the segments of the `segments2` sequence.
+
+    This is the sum of the sizes of the matching blocks of a
+    difflib.SequenceMatcher: the longest common run of segments is matched
+    first, and then the segments on each side of this run, recursively.
+    The runs are found using the positions of the segments of `segments2`
+    rather than building a SequenceMatcher for each pair of paths.
+    """
+    if segments1 == segments2:
+        return len(segments1)
+
+    if len(segments2) >= 200:
+        # SequenceMatcher ignores the frequent elements of long sequences
+        seq_matcher = SequenceMatcher(a=segments1, b=segments2)
+        return sum(m.size for m in seq_matcher.get_matching_blocks())
+
+    positions_by_segment = {}
+    for pos, segment in enumerate(segments2):
+        positions_by_segment.setdefault(segment, []).append(pos)
+
+    count = 0
+    ranges = [(0, len(segments1), 0, len(segments2))]
+    while ranges:
+        start1, end1, start2, end2 = ranges.pop()
+        # Find the longest run, the first one in `segments1` on ties
+        best1 = best2 = size = 0
+        run_sizes = {}
+        for pos1 in range(start1, end1):
+            new_run_sizes = {}
+            for pos2 in positions_by_segment.get(segments1[pos1], ()):
+                if pos2 < start2:
+                    continue
+                if pos2 >= end2:
+                    break
+                run_size = new_run_sizes[pos2] = run_sizes.get(pos2 - 1, 0) + 1
+                if run_size > size:
+                    best1 = pos1 - run_size + 1
+                    best2 = pos2 - run_size + 1
+                    size = run_size
+            run_sizes = new_run_sizes
+
+        if not size:
+            continue
+        count += size
+        if start1 < best1 and start2 < best2:
+            ranges.append((start1, best1, start2, best2))
+        if best1 + size < end1 and best2 + size < end2:
+            ranges.append((best1 + size, end1, best2 + size, end2))
+    return count
+
+
+def get_row_key(row):
+    """
+    Return a hashable key for a `row` dictionary that is the same for equal
+    rows, or None if a value of the row is not hashable.
+    """
+    try:
+        return frozenset(row.items())
+    except TypeError:
+        return None
+
+
 def generate_headers(headers1, headers2, key1):
     """
     Return a list of strings that are header names for the output of column_match.
@@ -103,22 +259,52 @@ def generate_headers(headers1, headers2, key1):
     return output_headers
 
 
+# Number of shards of the inputs for each parallel process, so that a shard
+# with many matches does not keep a single process busy
+SHARDS_PER_JOB = 4
+
+# Number of rows sorted in memory at once before being written to a sorted
+# run file when matching inputs larger than the memory
+DEFAULT_SORT_BUFFER_SIZE = 100000
+
+# Number of records pickled at once in a sorted run file
+RUN_BATCH_SIZE = 1000
+
+
 def column_match(result1, result2, headers1, headers2, key1, key2, best_matches_only=False):
     """
     'matched_score' is calculated by the common trailing paths/values between two inputs columns.
     Note: Everything in result1 will be kept even if there is no match.
     """
+    for _split_path_s1, rows in column_match_groups(
+            result1, result2, headers1, headers2, key1, key2, best_matches_only):
+        yield from rows
+
+
+def column_match_groups(result1, result2, headers1, headers2, key1, key2, best_matches_only=False):
+    """
+    Yield a tuple of (reversed path segments, list of result rows) for each
+    resolved `key1` path of `result1`, in the order they are first seen.
+    See column_match for the result rows.
+    """
     # Create index of Resources to match against using `result2`
     result2_rows_by_split_path_by_filename = get_rows_by_split_resolved_path_by_filename(
         result2, key2)
+    # And a trie of their reversed path segments for each file name
+    tries_by_filename = {
+        file_name: SegmentTrie(rows_by_split_path)
+        for file_name, rows_by_split_path in result2_rows_by_split_path_by_filename.items()
+    }
 
     col_match_results_by_split_path_s1 = defaultdict(lambda: defaultdict(list))
+    # The keys of the stored rows for each (split_path_s1, score), to skip the
+    # duplicated rows
+    row_keys_by_split_path_score = defaultdict(set)
     for file_name, split_path_s1, row1 in get_rows_by_split_resolved_path(result1, key1):
         # We check to see if we have a Resource in result2 that has the same
         # file name as the Resource we are looking at now in result1
-        matched_rows_by_split_path = result2_rows_by_split_path_by_filename.get(
-            file_name, {})
-        if not matched_rows_by_split_path:
+        trie = tries_by_filename.get(file_name)
+        if trie is None:
             # If there is no Resource with `file_name` in `result2`,
             # append the row to match results without attempting to perform path matching
             # This is a column match result with no score. A non-match is indicated by
@@ -126,14 +312,18 @@ def column_match(result1, result2, headers1, headers2, key1, key2, best_matches_
             col_match_results_by_split_path_s1[split_path_s1][0].append(row1)
             continue
 
-        s1_size = len(split_path_s1)
-        for split_path_s2, matched_rows in matched_rows_by_split_path.items():
-            score = 0
-            for path_segment_s1, path_segment_s2 in zip(split_path_s1, split_path_s2):
-                if path_segment_s1 != path_segment_s2:
-                    break
-                score += 1
+        matched_rows_by_split_path = result2_rows_by_split_path_by_filename[file_name]
+        if best_matches_only:
+            # Only the matches with the highest score are kept, so only these
+            # are collected
+            score, split_paths_s2 = trie.best_matches(split_path_s1)
+            scored_split_paths_s2 = [(score, split_path_s2) for split_path_s2 in split_paths_s2]
+        else:
+            scored_split_paths_s2 = trie.scored_matches(split_path_s1)
 
+        s1_size = len(split_path_s1)
+        for score, split_path_s2 in scored_split_paths_s2:
+            matched_rows = matched_rows_by_split_path[split_path_s2]
             for matched_row in matched_rows:
                 # Calculate match statistics and populate fields
                 result_row = row1.copy()
@@ -154,8 +344,15 @@ def column_match(result1, result2, headers1, headers2, key1, key2, best_matches_
                 # Store matched row
                 s1_results = col_match_results_by_split_path_s1[split_path_s1]
                 score_s1_results = s1_results[score]
-                if result_row in score_s1_results:
-                    continue
+                row_key = get_row_key(result_row)
+                if row_key is None:
+                    if result_row in score_s1_results:
+                        continue
+                else:
+                    row_keys = row_keys_by_split_path_score[split_path_s1, score]
+                    if row_key in row_keys:
+                        continue
+                    row_keys.add(row_key)
                 score_s1_results.append(result_row)
 
     if best_matches_only:
@@ -167,30 +364,39 @@ def column_match(result1, result2, headers1, headers2, key1, key2, best_matches_
             col_match_results_by_split_path_s1[path_segs] = {
                 highest_score: best_matches}
 
-    # If we have more than one row for a result, use SequenceMatcher to determine best one,
-    # then add the best results to `results`
+    row_keys_by_split_path_score.clear()
+
+    # The matching segments count of each (path segments, matched path)
+    matching_segments_counts = {}
+
+    # If we have more than one row for a result, use the number of matching path
+    # segments from the left to determine the best one, then add the best
+    # results to `results`
     # If 'best_matches_only' is true, then only the highest scoring matches will be
     # yielded. Otherwise, all results are yielded.
-    for path_segs, col_match_results_by_score in col_match_results_by_split_path_s1.items():
-        # `path_segs` is a tuple of reversed path segments, where the first
+    for split_path_s1, col_match_results_by_score in col_match_results_by_split_path_s1.items():
+        # `split_path_s1` is a tuple of reversed path segments, where the first
         # element is the file name, working backwards to the root
-        # We reverse `path_segs` so we can sequence match it properly with
+        # We reverse it so we can sequence match it properly with
         # the path of the matched rows
-        path_segs = tuple(reversed(path_segs))
+        path_segs = tuple(reversed(split_path_s1))
+        rows = []
         highest_segment_match_count = 0
         best_segment_match_rows = []
         for score, col_match_results in col_match_results_by_score.items():
             for row in col_match_results:
                 matched_path = row.get('matched', '')
                 if not matched_path:
-                    yield row
+                    rows.append(row)
                     continue
 
                 # Calculate the number of matching path segments from the beginning of the path
-                matched_path_segs = matched_path.split('/')
-                seq_matcher = SequenceMatcher(a=path_segs, b=matched_path_segs)
-                matching_segments_count = sum(
-                    m.size for m in seq_matcher.get_matching_blocks())
+                matching_segments_count = matching_segments_counts.get(
+                    (path_segs, matched_path))
+                if matching_segments_count is None:
+                    matching_segments_count = get_matching_segments_count(
+                        path_segs, tuple(matched_path.split('/')))
+                    matching_segments_counts[path_segs, matched_path] = matching_segments_count
 
                 # Write stats to row
                 row['matched_score_from_left'] = matching_segments_count
@@ -207,17 +413,194 @@ def column_match(result1, result2, headers1, headers2, key1, key2, best_matches_
                         highest_segment_match_count = matching_segments_count
                         best_segment_match_rows = [row]
                     elif matching_segments_count == highest_segment_match_count:
-                        if row in best_segment_match_rows:
-                            continue
+                        # The rows of a score are already unique
                         best_segment_match_rows.append(row)
                 else:
                     # If `best_matches_only` is False, we want to yield every row
-                    yield row
+                    rows.append(row)
 
         if best_matches_only:
             # We yield all the best matches after keeping and tracking them
-            for row in best_segment_match_rows:
-                yield row
+            rows.extend(best_segment_match_rows)
+
+        yield split_path_s1, rows
+
+
+def parallel_column_match(result1, result2, headers1, headers2, key1, key2,
+                          best_matches_only=False, jobs=1):
+    """
+    Yield the same result rows as column_match, matching the inputs in `jobs`
+    parallel processes.
+
+    Only the paths with the same file name can match, so both inputs are
+    partitioned in shards by file name and each shard is matched separately.
+    The results of the shards are then merged in the order of the paths of
+    `result1`, as with a single process.
+    """
+    if jobs <= 1:
+        yield from column_match(
+            result1, result2, headers1, headers2, key1, key2, best_matches_only)
+        return
+
+    num_shards = jobs * SHARDS_PER_JOB
+    shards1 = [[] for _ in range(num_shards)]
+    shards2 = [[] for _ in range(num_shards)]
+    # The position of each reversed path segments of `result1`, in the order
+    # they are first seen
+    positions_by_split_path = {}
+    for row in result1:
+        split_path = tuple(reversed(resolve(row[key1]).split('/')))
+        positions_by_split_path.setdefault(split_path, len(positions_by_split_path))
+        shards1[hash(split_path[0]) % num_shards].append(row)
+    for row in result2:
+        file_name = resolve(row[key2]).rpartition('/')[2]
+        shards2[hash(file_name) % num_shards].append(row)
+
+    tasks = [
+        (shard1, shard2, headers1, headers2, key1, key2, best_matches_only)
+        for shard1, shard2 in zip(shards1, shards2)
+        if shard1
+    ]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        groups_by_shard = list(executor.map(_column_match_shard, tasks))
+
+    # The groups of each shard are already in the order of `result1`
+    groups = heapq.merge(
+        *groups_by_shard, key=lambda group: positions_by_split_path[group[0]])
+    for _split_path_s1, rows in groups:
+        yield from rows
+
+
+def _column_match_shard(task):
+    """
+    Return a list of column_match_groups for a shard `task` tuple of
+    column_match_groups arguments.
+    """
+    return list(column_match_groups(*task))
+
+
+def external_column_match(result1, result2, headers1, headers2, key1, key2,
+                          best_matches_only=False,
+                          sort_buffer_size=DEFAULT_SORT_BUFFER_SIZE):
+    """
+    Yield the same result rows as column_match for inputs larger than the
+    memory.
+
+    Both inputs are sorted by file name in temporary run files of at most
+    `sort_buffer_size` rows, then merged and matched one file name at a time,
+    since only the paths with the same file name can match. The result rows
+    are sorted back in the order of the paths of `result1` in other run files
+    and streamed from these. Only the rows of a single file name are loaded
+    in memory.
+    """
+    with TemporaryDirectory(prefix='column_match-') as temp_dir:
+        records1 = sort_records(
+            get_path_records(result1, key1), temp_dir, sort_buffer_size)
+        records2 = sort_records(
+            get_path_records(result2, key2), temp_dir, sort_buffer_size)
+
+        result_records = match_path_records(
+            records1, records2, headers1, headers2, key1, key2, best_matches_only)
+        sorted_results = sort_records(result_records, temp_dir, sort_buffer_size)
+        for _position, _index, row in sorted_results:
+            yield row
+
+
+def get_path_records(rows, key):
+    """
+    Yield a tuple of (file name, position, row, resolved path) for each of
+    the `rows` dictionaries, where the resolved path is that of the `key`
+    value.
+    """
+    for position, row in enumerate(rows):
+        path = resolve(row[key])
+        yield path.rpartition('/')[2], position, row, path
+
+
+def match_path_records(records1, records2, headers1, headers2, key1, key2,
+                       best_matches_only=False):
+    """
+    Yield a tuple of (position, index, result row) for the result rows of
+    matching the path records of get_path_records `records1` and `records2`
+    sorted by file name, where the position is the first position in
+    `records1` of the path of the row and the index is that of the row for
+    this path.
+    """
+    records_by_filename2 = groupby(records2, key=itemgetter(0))
+    file_name2, file_records2 = next(records_by_filename2, (None, ()))
+
+    for file_name, file_records1 in groupby(records1, key=itemgetter(0)):
+        while file_name2 is not None and file_name2 < file_name:
+            file_name2, file_records2 = next(records_by_filename2, (None, ()))
+        if file_name2 == file_name:
+            rows2 = [row for _file_name, _position, row, _path in file_records2]
+        else:
+            rows2 = []
+
+        rows1 = []
+        positions_by_split_path = {}
+        for _file_name, position, row, path in file_records1:
+            rows1.append(row)
+            split_path = tuple(reversed(path.split('/')))
+            positions_by_split_path.setdefault(split_path, position)
+
+        groups = column_match_groups(
+            rows1, rows2, headers1, headers2, key1, key2, best_matches_only)
+        for split_path, rows in groups:
+            position = positions_by_split_path[split_path]
+            for index, row in enumerate(rows):
+                yield position, index, row
+
+
+def sort_records(records, temp_dir, sort_buffer_size=DEFAULT_SORT_BUFFER_SIZE):
+    """
+    Return an iterator over an iterable of `records` tuples sorted by their
+    first two items, which are unique.
+
+    The records are sorted by batches of `sort_buffer_size` records written
+    to run files in the `temp_dir` directory, and these sorted runs are then
+    merged as the iterator advances.
+    """
+    records = iter(records)
+    runs = []
+    while True:
+        buffer = list(islice(records, sort_buffer_size))
+        buffer.sort(key=itemgetter(0, 1))
+        if len(buffer) < sort_buffer_size:
+            break
+        runs.append(write_sorted_run(buffer, temp_dir))
+    if not runs:
+        return iter(buffer)
+    sorted_runs = [iter_sorted_run(run) for run in runs]
+    sorted_runs.append(buffer)
+    return heapq.merge(*sorted_runs, key=itemgetter(0, 1))
+
+
+def write_sorted_run(records, temp_dir):
+    """
+    Write a list of sorted `records` to a new run file in the `temp_dir`
+    directory. Return the run file location.
+    """
+    with NamedTemporaryFile(dir=temp_dir, suffix='.run', delete=False) as run_file:
+        for start in range(0, len(records), RUN_BATCH_SIZE):
+            pickle.dump(
+                records[start:start + RUN_BATCH_SIZE],
+                run_file,
+                protocol=pickle.HIGHEST_PROTOCOL)
+    return run_file.name
+
+
+def iter_sorted_run(location):
+    """
+    Yield the records of the run file at `location`.
+    """
+    with open(location, 'rb') as run_file:
+        while True:
+            try:
+                records = pickle.load(run_file)
+            except EOFError:
+                return
+            yield from records
 
 
 @click.command()
@@ -232,6 +615,27 @@ def column_match(result1, result2, headers1, headers2, key1, key2, best_matches_
 @click.option('--csv',
               is_flag=True,
               help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl',
+              is_flag=True,
+              help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet',
+              is_flag=True,
+              help='Output as Parquet format (Default: XLSX format)')
+@click.option('--external',
+              is_flag=True,
+              help='Match inputs larger than the memory: sort the inputs by '
+              'file name in temporary files and stream the output. '
+              'Requires the --csv, --jsonl or --parquet option.')
+@click.option('--sort_buffer_size',
+              type=click.IntRange(min=1),
+              default=DEFAULT_SORT_BUFFER_SIZE,
+              show_default=True,
+              help='Number of rows sorted in memory at once with --external.')
+@click.option('-j', '--jobs',
+              type=int,
+              default=1,
+              show_default=True,
+              help='Number of parallel processes used to match the inputs.')
 @click.option('-k1', '--key1',
               required=True,
               metavar='key1',
@@ -255,32 +659,29 @@ def column_match(result1, result2, headers1, headers2, key1, key2, best_matches_
                 metavar='OUTPUT',
                 type=click.Path(exists=False, dir_okay=False, writable=True, resolve_path=True))
 @click.help_option('-h', '--help')
-def cli(best_matches_only, csv, key1, key2, input1, input2, output):
+def cli(best_matches_only, csv, jsonl, parquet, external, sort_buffer_size, jobs,
+        key1, key2, input1, input2, output):
     """
     Get the header keys from both input.
     """
-    if not input1.endswith('.csv') and not input1.endswith('.xlsx'):
+    check_input(input1, 'input1')
+    check_input(input2, 'input2')
+    output_format = get_output_format(csv, jsonl, parquet)
+    if external and output_format == 'xlsx':
         raise click.UsageError(
-            'ERROR: "The input1 does not ends with \'.csv\' or \'.xlsx\' extension.')
-    if not input2.endswith('.csv') and not input2.endswith('.xlsx'):
+            'ERROR: "The --external option requires the --csv, --jsonl or '
+            '--parquet option.')
+    if external and jobs > 1:
         raise click.UsageError(
-            'ERROR: "The input2 does not ends with \'.csv\' or \'.xlsx\' extension.')
+            'ERROR: "The --external and --jobs options cannot be used together.')
 
-    if input1.endswith('.csv'):
-        headers1 = get_csv_headers(input1)
-        result1 = read_csv_rows(input1)
-    else:
-        result1, headers1 = get_data_from_xlsx(input1)
+    result1, headers1 = read_input(input1)
 
     if key1 not in headers1:
         print(key1 + " is not in the INPUT1. Please correct and re-run.")
         sys.exit(1)
 
-    if input2.endswith('.csv'):
-        headers2 = get_csv_headers(input2)
-        result2 = read_csv_rows(input2)
-    else:
-        result2, headers2 = get_data_from_xlsx(input2)
+    result2, headers2 = read_input(input2)
 
     if key2 not in headers2:
         print(key2 + " is not in the INPUT2. Please correct and re-run.")
@@ -292,8 +693,18 @@ def cli(best_matches_only, csv, key1, key2, input1, input2, output):
         key1=key1
     )
 
-    results = list(column_match(result1, result2, headers1,
-                   headers2, key1, key2, best_matches_only))
+    if external:
+        results = external_column_match(result1, result2, headers1,
+                                        headers2, key1, key2, best_matches_only,
+                                        sort_buffer_size)
+        # Reorder the result dictionaries as they are streamed
+        results = ({header: result.get(header, '') for header in output_headers}
+                   for result in results)
+        write_output(results, output, output_format, headers=output_headers)
+        return
+
+    results = list(parallel_column_match(result1, result2, headers1,
+                   headers2, key1, key2, best_matches_only, jobs))
 
     # Reorder the result dictionary
     updated_results = []
@@ -306,15 +717,4 @@ def cli(best_matches_only, csv, key1, key2, input1, input2, output):
                 dict[header] = ''
         updated_results.append(dict)
 
-    if csv:
-        if not output.endswith('.csv'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.csv\' extension.')
-        else:
-            write_to_csv(updated_results, output)
-    else:
-        if not output.endswith('.xlsx'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.xlsx\' extension.')
-        else:
-            write_to_xlsx(updated_results, output)
+    write_output(updated_results, output, output_format)
@@ -18,11 +18,11 @@
 
 import click
 
-from spreadsheet_toolkit.csv_utils import read_csv_rows
-
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
+from utilitycode.table import Table
 
 # silence unicode literals warnings
 click.disable_unicode_literals_warning = True
@@ -35,10 +35,7 @@ def concat_inputs(input, ws):
     """
     concat_rows = []
     for i in input:
-        if i.endswith('.csv'):
-            rows = read_csv_rows(i)
-        else:
-            rows, _headers = get_data_from_xlsx(i, ws)
+        rows, _headers = read_input(i, ws)
         for row in rows:
             concat_rows.append(row)
     return concat_rows
@@ -49,26 +46,19 @@ def sync_rows_dict(rows):
     Sync the dictionary keys by inserting any missing keys with an empty
     value if they are not present in the original dictionary.
     """
-    dict_keys = []
-    new_list = []
-    # Collect all the keys from the list
-    for row in rows:
-        for key in row:
-            if key not in dict_keys:
-                dict_keys.append(key)
-
-    for row in rows:
-        for k in dict_keys:
-            if k not in row:
-                row[k] = ""
-        new_list.append(row)
-    return new_list
+    return list(Table.from_rows(rows).iter_rows())
 
 
 @click.command()
 @click.option('--csv',
               is_flag=True,
               help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl',
+              is_flag=True,
+              help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet',
+              is_flag=True,
+              help='Output as Parquet format (Default: XLSX format)')
 @click.option(
     '-ws', '--worksheet', nargs=1,
     help='Define the name of the worksheet to work on for the XLSX input.'
@@ -84,22 +74,16 @@ def sync_rows_dict(rows):
                               writable=True, resolve_path=True),
               help='Path to the concatenated output file.')
 @click.help_option('-h', '--help')
-def cli(csv, worksheet, input, output):
+def cli(csv, jsonl, parquet, worksheet, input, output):
     """
-    Concatenate the input CSV/XLSX files and write to a new CSV/XLSX (-o) file.
+    Concatenate the input CSV/XLSX/JSONL/Parquet files and write to a new
+    CSV/XLSX/JSONL/Parquet (-o) file.
     Multiple '-i' options are supported.
     """
+    for location in input:
+        check_input(location)
+    output_format = get_output_format(csv, jsonl, parquet)
+
     rows = concat_inputs(input, worksheet)
-    new_result = sync_rows_dict(rows)
-    if csv:
-        if not output.endswith('.csv'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.csv\' extension.')
-        else:
-            write_to_csv(new_result, output)
-    else:
-        if not output.endswith('.xlsx'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.xlsx\' extension.')
-        else:
-            write_to_xlsx(new_result, output)
+    new_result = Table.from_rows(rows)
+    write_output(new_result, output, output_format)
@@ -21,9 +21,8 @@ import os
 import sys
 
 from spreadsheet_toolkit.csv_utils import add_unc
-from spreadsheet_toolkit.csv_utils import get_csv_headers
-from spreadsheet_toolkit.csv_utils import read_csv_rows
-from utilitycode.bom_utils import get_data_from_xlsx
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import read_input
 
 # silence unicode literals warnings
 click.disable_unicode_literals_warning = True
@@ -96,17 +95,12 @@ def cli(input, project_loc, output, zip):
     Copy/Zip the resource paths listed in the input from the project_loc to
     the output location.
     """
-    if not input.endswith('.csv') and not input.endswith('.xlsx'):
-        raise click.UsageError(
-            'ERROR: "The input does not ends with \'.csv\' or \'.xlsx\' extension.')
-
-    if input.endswith('.csv'):
-        headers = get_csv_headers(input)
-        # Convert it with list to become a non-generator
-        # object
-        result = list(read_csv_rows(input))
-    else:
-        result, headers = get_data_from_xlsx(input)
+    check_input(input)
+
+    # Convert it with list to become a non-generator
+    # object
+    result, headers = read_input(input)
+    result = list(result)
 
     # Validate does the input has the 'Resource' header
     if 'Resource' not in headers:
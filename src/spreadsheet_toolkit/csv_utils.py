@@ -22,6 +22,14 @@ import csv
 import os
 import sys
 
+from utilitycode.bom_utils import iter_data_from_jsonl
+from utilitycode.bom_utils import iter_data_from_parquet
+from utilitycode.bom_utils import iter_data_from_xlsx
+from utilitycode.bom_utils import write_to_csv
+from utilitycode.bom_utils import write_to_jsonl
+from utilitycode.bom_utils import write_to_parquet
+from utilitycode.bom_utils import write_to_xlsx
+
 # silence unicode literals warnings
 click.disable_unicode_literals_warning = True
 
@@ -29,6 +37,17 @@ on_windows = 'win32' in sys.platform
 
 UNC_PREFIX = u'\\\\?\\'
 
+# Extensions of the input files supported by the toolkit
+INPUT_EXTENSIONS = ('.csv', '.xlsx', '.jsonl', '.parquet')
+
+# Writer function for each output format
+OUTPUT_WRITERS = {
+    'csv': write_to_csv,
+    'xlsx': write_to_xlsx,
+    'jsonl': write_to_jsonl,
+    'parquet': write_to_parquet,
+}
+
 
 def read_csv_rows(location):
     """
@@ -56,6 +75,65 @@ def get_csv_headers(location):
     return headers
 
 
+def check_input(location, name='input'):
+    """
+    Raise a click.UsageError if the `name` input `location` is not a supported
+    CSV, XLSX, JSON Lines or Parquet file.
+    """
+    if not location.endswith(INPUT_EXTENSIONS):
+        raise click.UsageError(
+            'ERROR: "The {} does not ends with \'.csv\', \'.xlsx\', '
+            '\'.jsonl\' or \'.parquet\' extension.'.format(name))
+
+
+def read_input(location, worksheet=None):
+    """
+    Return an iterator of dictionaries for the rows of the CSV, XLSX, JSON
+    Lines or Parquet file at `location` and the list of its column names.
+    Use the `worksheet` (or the active worksheet) of an XLSX input.
+    """
+    if location.endswith('.csv'):
+        return read_csv_rows(location), get_csv_headers(location)
+    if location.endswith('.jsonl'):
+        return iter_data_from_jsonl(location)
+    if location.endswith('.parquet'):
+        return iter_data_from_parquet(location)
+    return iter_data_from_xlsx(location, worksheet)
+
+
+def get_output_format(csv=False, jsonl=False, parquet=False):
+    """
+    Return the output format selected with the --csv, --jsonl or --parquet
+    options. XLSX is the default.
+    """
+    selected = [name for name, flag in
+                (('csv', csv), ('jsonl', jsonl), ('parquet', parquet)) if flag]
+    if len(selected) > 1:
+        raise click.UsageError(
+            'ERROR: "Only one of the --csv, --jsonl and --parquet options '
+            'can be used.')
+    return selected[0] if selected else 'xlsx'
+
+
+def write_output(data, output, output_format='xlsx', headers=None):
+    """
+    Write the `data` rows (a list of dictionaries or a Table) to the `output`
+    file in the `output_format` format.
+
+    If the `headers` columns are provided, the `data` rows can be any iterable
+    of dictionaries and are streamed to the output, which has these columns
+    even without rows.
+    """
+    if not output.endswith('.' + output_format):
+        raise click.UsageError(
+            'ERROR: "The output does not ends with \'.{}\' extension.'.format(
+                output_format))
+    if headers is None or output_format == 'jsonl':
+        OUTPUT_WRITERS[output_format](data, output)
+    else:
+        OUTPUT_WRITERS[output_format](data, output, headers=headers)
+
+
 def add_unc(location):
     """
     Convert a `location` to an absolute Window UNC path to support long paths on
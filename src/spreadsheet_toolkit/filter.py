@@ -16,14 +16,29 @@
 #  SPDX-License-Identifier: Apache-2.0
 # ============================================================================
 
+from itertools import compress
+from itertools import islice
+from itertools import repeat
+from operator import and_
+from operator import contains
+from operator import itemgetter
+from operator import methodcaller
+from operator import not_
+from operator import or_
 import click
 import re
 
-from spreadsheet_toolkit.csv_utils import get_csv_headers, read_csv_rows
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
 
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
+# Number of rows filtered at once
+FILTER_CHUNK_SIZE = 4096
+
+# Match more substrings than this with a single regex alternation search
+# rather than with one substring search each
+MAX_SUBSTRING_VALUES = 4
 
 
 @click.command()
@@ -41,6 +56,12 @@ from utilitycode.bom_utils import write_to_xlsx
 @click.option('--csv',
               is_flag=True,
               help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl',
+              is_flag=True,
+              help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet',
+              is_flag=True,
+              help='Output as Parquet format (Default: XLSX format)')
 @click.option('--include', multiple=True,
               metavar='"key=string [or] key=string..."',
               help='Include the rows which the string exist in the key value.')
@@ -60,90 +81,241 @@ from utilitycode.bom_utils import write_to_xlsx
               metavar='"key=string [or] key=string..."',
               help='Include the rows which the string equals with the key value.')
 @click.help_option('-h', '--help')
-def cli(input, output, csv, include, exclude, exclude_exact, startswith, endswith, equals):
+def cli(input, output, csv, jsonl, parquet, include, exclude, exclude_exact, startswith, endswith, equals):
     """
     Filtering the input with the provided option(s).
     """
-    if not input.endswith('.csv') and not input.endswith('.xlsx'):
-        raise click.UsageError(
-            'ERROR: "The input does not ends with \'.csv\' or \'.xlsx\' extension.')
-
-    include_condition = []
-    exclude_condition = []
-    exclude_exact_condition = []
-    startswith_condition = []
-    endswith_condition = []
-    equals_condition = []
-
-    # Get the filter condition
-    if include:
-        include_condition = get_filtering_keys_values(include)
-    if exclude:
-        exclude_condition = get_filtering_keys_values(exclude)
-    if exclude_exact:
-        exclude_exact_condition = get_filtering_keys_values(exclude_exact)
-    if startswith:
-        startswith_condition = get_filtering_keys_values(startswith)
-    if endswith:
-        endswith_condition = get_filtering_keys_values(endswith)
-    if equals:
-        equals_condition = get_filtering_keys_values(equals)
-
-    if input.endswith('.csv'):
-        column_names = get_csv_headers(input)
-        # Convert it with list to become a non-generator
-        # object
-        rows = list(read_csv_rows(input))
-    else:
-        rows, column_names = get_data_from_xlsx(input)
+    check_input(input)
+    output_format = get_output_format(csv, jsonl, parquet)
+
+    conditions = get_filter_conditions(
+        include=include,
+        exclude=exclude,
+        exclude_exact=exclude_exact,
+        startswith=startswith,
+        endswith=endswith,
+        equals=equals,
+    )
+
+    rows, column_names = read_input(input)
 
     # Validate the existance of the input keys
-    filter_keys = []
-    combined_condition = include_condition + exclude_condition + \
-        exclude_exact_condition + startswith_condition + \
-        endswith_condition + equals_condition
-    for dict in combined_condition:
-        keys = dict.keys()
-        for key in keys:
-            if key not in filter_keys:
-                filter_keys.append(key)
-
-    for key in filter_keys:
+    for key in get_filter_keys(conditions):
         if key not in column_names:
             import sys
             print("The key '" + key +
                   "' is not in the input. Please correct and re-run.")
             sys.exit(1)
 
-    result = []
-    for row in rows:
-        if include:
-            row = include_filtering(row, include_condition)
-        if exclude:
-            row = exclude_filtering(row, exclude_condition)
-        if exclude_exact:
-            row = exclude_exact_filtering(row, exclude_exact_condition)
-        if startswith:
-            row = startswith_filtering(row, startswith_condition)
-        if endswith:
-            row = endswith_filtering(row, endswith_condition)
-        if equals:
-            row = equals_filtering(row, equals_condition)
-        if row:
-            result.append(row)
-
-    if csv:
-        if not output.endswith('.csv'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.csv\' extension.')
-        else:
-            write_to_csv(result, output)
+    result = list(filter_rows(rows, conditions))
+
+    write_output(result, output, output_format)
+
+
+def get_filter_conditions(include=(), exclude=(), exclude_exact=(),
+                          startswith=(), endswith=(), equals=()):
+    """
+    Return a list of (filtering function, filter condition) tuples for the
+    provided filter expressions, in the order they are applied.
+    """
+    expressions = [
+        (include_filtering, include),
+        (exclude_filtering, exclude),
+        (exclude_exact_filtering, exclude_exact),
+        (startswith_filtering, startswith),
+        (endswith_filtering, endswith),
+        (equals_filtering, equals),
+    ]
+    return [(filtering, get_filtering_keys_values(expression))
+            for filtering, expression in expressions if expression]
+
+
+def get_filter_keys(conditions):
+    """
+    Return a list of the unique keys used in the filter `conditions`.
+    """
+    filter_keys = []
+    for _filtering, condition in conditions:
+        for dict in condition:
+            for key in dict.keys():
+                if key not in filter_keys:
+                    filter_keys.append(key)
+    return filter_keys
+
+
+def filter_rows(rows, conditions):
+    """
+    Yield the rows that pass all the filter `conditions`.
+
+    The rows are filtered by chunks of FILTER_CHUNK_SIZE rows: each condition
+    is checked on whole columns of a chunk at once, and only the rows that
+    passed are checked with the next condition.
+    """
+    predicates = compile_conditions(conditions)
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, FILTER_CHUNK_SIZE))
+        if not chunk:
+            return
+        for predicate in predicates:
+            chunk = list(compress(chunk, predicate(chunk)))
+            if not chunk:
+                break
+        yield from chunk
+
+
+def compile_conditions(conditions):
+    """
+    Return a list of predicates for the filter `conditions`, a list of
+    (filtering function, filter condition) tuples. Each predicate takes a list
+    of rows and returns a list of booleans, True for the rows that the
+    filtering function would keep.
+
+    Each condition is compiled once in column tests that map a single string
+    operation on a whole column, such as a substring or regex alternation
+    search, a str.startswith() with a tuple of prefixes or a set lookup.
+    """
+    return [CONDITION_COMPILERS[filtering](condition)
+            for filtering, condition in conditions]
+
+
+def get_column_test(values, match):
+    """
+    Return a function that takes a list of cell values and returns a list of
+    booleans, True for the cells that match any of the `values` of a condition
+    key using the `match` comparison. A True `values` (a key without values)
+    matches any non-empty cell value.
+    """
+    if isinstance(values, bool):
+        return lambda cells: list(map(bool, cells))
+
+    if match == 'contains':
+        if len(values) > MAX_SUBSTRING_VALUES:
+            search = re.compile('|'.join(re.escape(value) for value in values)).search
+            return lambda cells: list(map(bool, map(search, map(str, cells))))
+
+        def column_test(cells):
+            cells = list(map(str, cells))
+            hits = list(map(contains, cells, repeat(values[0])))
+            for value in values[1:]:
+                hits = list(map(or_, hits, map(contains, cells, repeat(value))))
+            return hits
+
+        return column_test
+
+    if match in ('exact', 'equals'):
+        # Only a string cell value is equal to a string value, as with the
+        # == comparisons of the filtering functions
+        values = frozenset(values)
+        if match == 'exact':
+            return lambda cells: [isinstance(cell, str) and cell in values
+                                  for cell in cells]
+        # Only a non-empty cell value can match
+        return lambda cells: [isinstance(cell, str) and bool(cell) and cell in values
+                              for cell in cells]
+
+    if match == 'startswith':
+        test = methodcaller('startswith', tuple(values))
+    elif match == 'endswith':
+        test = methodcaller('endswith', tuple(values))
     else:
-        if not output.endswith('.xlsx'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.xlsx\' extension.')
-        else:
-            write_to_xlsx(result, output)
+        raise ValueError('Unknown match: {!r}'.format(match))
+
+    # Only a non-empty cell value can match
+    return lambda cells: list(map(and_, map(bool, cells), map(test, map(str, cells))))
+
+
+def get_key_tests(condition, match):
+    """
+    Return a list of lists of (key, column test, has values) tuples, one list
+    for each dictionary of a filter `condition`.
+    """
+    return [[(key, get_column_test(values, match), not isinstance(values, bool))
+             for key, values in dict.items()]
+            for dict in condition]
+
+
+def get_column(rows, key):
+    """
+    Return the list of the `key` values of a list of `rows`.
+    """
+    return list(map(itemgetter(key), rows))
+
+
+def get_group_matches(rows, tests):
+    """
+    Return a tuple of lists of booleans for the `rows` and the key `tests` of
+    a condition dictionary: True for the rows where any key matches, and True
+    for the rows where the first matching key is a key without values, or
+    None if all the keys have values.
+    """
+    matched = None
+    accepted = None
+    for key, test, has_values in tests:
+        hits = test(get_column(rows, key))
+        if not has_values:
+            if matched is None:
+                accepted = hits
+            else:
+                accepted_now = map(and_, hits, map(not_, matched))
+                if accepted is None:
+                    accepted = list(accepted_now)
+                else:
+                    accepted = list(map(or_, accepted, accepted_now))
+        matched = hits if matched is None else list(map(or_, matched, hits))
+    return matched, accepted
+
+
+def compile_all(condition, match='contains'):
+    """
+    Return a predicate for a list of condition dictionaries that are all
+    required ("and") where any key of a dictionary can match ("or"), as used
+    by include_filtering, equals_filtering, startswith_filtering and
+    endswith_filtering.
+
+    Like include_filtering, a row is kept right away, without checking the
+    next dictionaries, if the first matching key of a dictionary is a key
+    without values. Each dictionary is only checked on the rows that matched
+    all the previous ones.
+    """
+    key_tests = get_key_tests(condition, match)
+
+    def predicate(rows):
+        kept = [True] * len(rows)
+        # The positions of the rows that still need to match
+        pending = list(range(len(rows)))
+        pending_rows = rows
+        for tests in key_tests:
+            matched, accepted = get_group_matches(pending_rows, tests)
+            for index in compress(pending, map(not_, matched)):
+                kept[index] = False
+            if accepted is not None:
+                matched = list(map(and_, matched, map(not_, accepted)))
+            pending = list(compress(pending, matched))
+            if not pending:
+                break
+            pending_rows = list(map(rows.__getitem__, pending))
+        return kept
+
+    return predicate
+
+
+def compile_exclude(condition, match='contains'):
+    """
+    Return a predicate that does not keep a row if any key of any of the
+    condition dictionaries matches, as used by exclude_filtering and
+    exclude_exact_filtering.
+    """
+    key_tests = [key_test for tests in get_key_tests(condition, match)
+                 for key_test in tests]
+
+    def predicate(rows):
+        matched = [False] * len(rows)
+        for key, test, _has_values in key_tests:
+            matched = list(map(or_, matched, test(get_column(rows, key))))
+        return list(map(not_, matched))
+
+    return predicate
 
 
 def get_filtering_keys_values(expression):
@@ -315,3 +487,14 @@ def endswith_filtering(input, endswith_condition):
             return
     if condition_met:
         return input
+
+
+# Compile a condition of each filtering function in a row predicate
+CONDITION_COMPILERS = {
+    include_filtering: compile_all,
+    exclude_filtering: compile_exclude,
+    exclude_exact_filtering: lambda condition: compile_exclude(condition, 'exact'),
+    equals_filtering: lambda condition: compile_all(condition, 'equals'),
+    startswith_filtering: lambda condition: compile_all(condition, 'startswith'),
+    endswith_filtering: lambda condition: compile_all(condition, 'endswith'),
+}
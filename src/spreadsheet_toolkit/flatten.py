@@ -17,51 +17,187 @@
 # ============================================================================
 
 import click
+import os
 
-from spreadsheet_toolkit.csv_utils import get_csv_headers, read_csv_rows
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
+
+
+class FlattenedRow(object):
+    """
+    The flattened row of the rows with the same key value: the first of these
+    rows, with the new lines of the values of the other rows appended to each
+    column value.
+
+    The new lines are kept in an ordered list and a set for each column and
+    are joined only once, when the flattened row is done.
+    """
+    __slots__ = ('row', 'lines_by_header')
+
+    def __init__(self, row):
+        self.row = row
+        # Map a header to a (set of known lines, list of new lines) tuple
+        self.lines_by_header = {}
+
+    def add(self, headers, row):
+        """
+        Add the new lines of the `headers` values of a `row` dictionary.
+        """
+        lines_by_header = self.lines_by_header
+        for header in headers:
+            value = row[header]
+            if value == '':
+                continue
+            lines = lines_by_header.get(header)
+            for new_value in str(value).splitlines():
+                if not new_value:
+                    continue
+                if lines is None:
+                    # A single line value is compared as a whole
+                    original_value = str(self.row[header])
+                    if '\n' in original_value:
+                        known = set(original_value.splitlines())
+                    else:
+                        known = {original_value}
+                    lines = lines_by_header[header] = (known, [])
+                known, new_lines = lines
+                if new_value in known:
+                    continue
+                if not new_lines:
+                    known.update(str(self.row[header]).splitlines())
+                known.add(new_value)
+                new_lines.append(new_value)
+
+    def get_row(self):
+        """
+        Return the flattened row dictionary, updated in place.
+        """
+        row = self.row
+        for header, (_known, new_lines) in self.lines_by_header.items():
+            if new_lines:
+                original_value = str(row[header])
+                if original_value:
+                    new_lines.insert(0, original_value)
+                row[header] = '\n'.join(new_lines)
+        return row
+
+
+class UnsortedInputError(ValueError):
+    """
+    The rows with the same key value are not next to each other in a sorted
+    input.
+    """
+
+
+class KeyedValues(object):
+    """
+    A mapping of key values to items. The key values are compared with `==`:
+    hashable values are stored in a dictionary and unhashable values, such as
+    lists, in a list of (value, item) tuples.
+    """
+    __slots__ = ('items_by_key', 'unhashable_items')
+
+    def __init__(self):
+        self.items_by_key = {}
+        self.unhashable_items = []
+
+    def get(self, value):
+        """
+        Return the item of a key `value` or None.
+        """
+        try:
+            return self.items_by_key.get(value)
+        except TypeError:
+            for key_value, item in self.unhashable_items:
+                if key_value == value:
+                    return item
+
+    def add(self, value, item):
+        """
+        Add the `item` of a key `value`.
+        """
+        try:
+            self.items_by_key[value] = item
+        except TypeError:
+            self.unhashable_items.append((value, item))
 
 
 def flattening(headers, result, key):
     """
     Flattening process and return the flattened data in a list of dictionary
+
+    The rows of the `result` iterable with equal `key` values are merged in a
+    single row. The rows are sorted by the string of their `key` value.
     """
-    sorted_result = sorted(result, key=lambda k: str(k[key]))
-    flatten_list = []
-    for i in sorted_result:
-        if not flatten_list:
-            flatten_list.append(i)
+    flattened_rows_by_key = KeyedValues()
+    # The flattened rows in the order their key value is first seen
+    flattened_rows = []
+    for row in result:
+        value = row[key]
+        flattened_row = flattened_rows_by_key.get(value)
+        if flattened_row is None:
+            flattened_row = FlattenedRow(row)
+            flattened_rows_by_key.add(value, flattened_row)
+            flattened_rows.append(flattened_row)
         else:
-            if i[key] == flatten_list[-1][key]:
-                for header_key in headers:
-                    split_value = str(i[header_key]).splitlines()
-                    for new_value in split_value:
-                        original_value = str(flatten_list[-1][header_key])
-                        if new_value and not new_value == original_value:
-                            if '\n' in original_value:
-                                if new_value in original_value.splitlines():
-                                    continue
-                                else:
-                                    flatten_list[-1][header_key] = original_value + '\n' + \
-                                        new_value if not original_value == '' else new_value
-                            else:
-                                flatten_list[-1][header_key] = original_value + '\n' + \
-                                    new_value if not original_value == '' else new_value
-            else:
-                flatten_list.append(i)
-    return flatten_list
+            flattened_row.add(headers, row)
+
+    flattened_rows.sort(key=lambda flattened_row: str(flattened_row.row[key]))
+    return [flattened_row.get_row() for flattened_row in flattened_rows]
+
+
+def iter_flattened_sorted(headers, result, key):
+    """
+    Yield the flattened rows of a `result` iterable of rows where the rows
+    with equal `key` values are next to each other, such as rows sorted by
+    `key` value, as they are read and in the same order. Raise an
+    UnsortedInputError if a `key` value is found again after the rows of
+    another key value.
+    """
+    # The key values of the flattened rows already yielded
+    done = KeyedValues()
+    flattened_row = None
+    for row in result:
+        value = row[key]
+        if flattened_row is not None:
+            previous_value = flattened_row.row[key]
+            if value == previous_value:
+                flattened_row.add(headers, row)
+                continue
+            done.add(previous_value, True)
+            yield flattened_row.get_row()
+        if done.get(value):
+            raise UnsortedInputError(
+                'The input is not sorted by the \'{}\' column: the \'{}\' rows '
+                'are not next to each other.'.format(key, value))
+        flattened_row = FlattenedRow(row)
+
+    if flattened_row is not None:
+        yield flattened_row.get_row()
 
 
 @click.command()
 @click.option('--csv',
               is_flag=True,
               help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl',
+              is_flag=True,
+              help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet',
+              is_flag=True,
+              help='Output as Parquet format (Default: XLSX format)')
 @click.option('-k', '--key',
               required=True,
               metavar='key',
               help='Key to be flatten.')
+@click.option('--sorted_input',
+              is_flag=True,
+              help='The INPUT rows with the same key value are next to each '
+              'other, as when sorted by the key in any order: flatten and '
+              'write the rows as they are read and in the same order, without '
+              'loading the whole INPUT in memory.')
 @click.argument('input', required=True, metavar='INPUT',
                 type=click.Path(
                     exists=True, file_okay=True, dir_okay=True, readable=True,
@@ -71,36 +207,29 @@ def flattening(headers, result, key):
                     exists=False, dir_okay=False, writable=True,
                     resolve_path=True))
 @click.help_option('-h', '--help')
-def cli(csv, key, input, output):
+def cli(csv, jsonl, parquet, key, sorted_input, input, output):
     """
-    Flatten the input CSV/XLSX based on the provided key.
+    Flatten the input CSV/XLSX/JSONL/Parquet based on the provided key.
     """
-    if not input.endswith('.csv') and not input.endswith('.xlsx'):
-        raise click.UsageError(
-            'ERROR: "The input does not ends with \'.csv\' or \'.xlsx\' extension.')
-
-    if input.endswith('.csv'):
-        headers = get_csv_headers(input)
-        # Convert it with list to become a non-generator
-        # object
-        result = list(read_csv_rows(input))
-    else:
-        result, headers = get_data_from_xlsx(input)
+    check_input(input)
+    output_format = get_output_format(csv, jsonl, parquet)
+
+    result, headers = read_input(input)
 
     if key not in headers:
         print(key + " is not in the INPUT. Please correct and re-run.")
         return
-    else:
+
+    if not sorted_input:
         flatten_result = flattening(headers, result, key)
-        if csv:
-            if not output.endswith('.csv'):
-                raise click.UsageError(
-                    'ERROR: "The output does not ends with \'.csv\' extension.')
-            else:
-                write_to_csv(flatten_result, output)
-        else:
-            if not output.endswith('.xlsx'):
-                raise click.UsageError(
-                    'ERROR: "The output does not ends with \'.xlsx\' extension.')
-            else:
-                write_to_xlsx(flatten_result, output)
+        write_output(flatten_result, output, output_format)
+        return
+
+    flatten_result = iter_flattened_sorted(headers, result, key)
+    try:
+        write_output(flatten_result, output, output_format, headers=headers)
+    except UnsortedInputError as e:
+        # Do not leave the partial output of the rows flattened before the error
+        if os.path.exists(output):
+            os.remove(output)
+        raise click.UsageError('ERROR: "{}'.format(e))
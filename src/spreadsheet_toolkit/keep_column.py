@@ -18,30 +18,31 @@
 
 import click
 
-from spreadsheet_toolkit.csv_utils import read_csv_rows
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
+from utilitycode.table import Table
 
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
 
-
-def keep_column(result, keep_cols):
+def keep_column(result, keep_cols, headers=()):
     """
     Keep only the defined column's data
     """
-    rows = []
-    for i in result:
-        row_dict = {}
-        for k in keep_cols:
-            row_dict[k] = i[k]
-        rows.append(row_dict)
-    return rows
+    table = Table.from_rows(result, headers)
+    return list(table.select(keep_cols).iter_rows())
 
 
 @click.command()
 @click.option('--csv',
               is_flag=True,
               help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl',
+              is_flag=True,
+              help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet',
+              is_flag=True,
+              help='Output as Parquet format (Default: XLSX format)')
 @click.option('-k', '--key',
               metavar='key',
               help='Column(s) to be kept.')
@@ -58,24 +59,15 @@ def keep_column(result, keep_cols):
                     exists=False, dir_okay=False, writable=True,
                     resolve_path=True))
 @click.help_option('-h', '--help')
-def cli(csv, key, input, output):
+def cli(csv, jsonl, parquet, key, input, output):
     """
-    Take the input CSV/XLSX and keep the defined columns and write to the
-    output CSV/XLSX
+    Take the input CSV/XLSX/JSONL/Parquet and keep the defined columns and
+    write to the output CSV/XLSX/JSONL/Parquet
     """
-    if not input.endswith('.csv') and not input.endswith('.xlsx'):
-        raise click.UsageError(
-            'ERROR: "The input does not ends with \'.csv\' or \'.xlsx\' extension.')
-    result = []
-    headers = []
-
-    if input.endswith('.csv'):
-        result = read_csv_rows(input)
-        for row in result:
-            headers = list(row.keys())
-            break
-    else:
-        result, headers = get_data_from_xlsx(input)
+    check_input(input)
+    output_format = get_output_format(csv, jsonl, parquet)
+    result, headers = read_input(input)
+    table = Table.from_rows(result, headers)
 
     keep_cols = key.split(',')
     for k in keep_cols:
@@ -83,17 +75,6 @@ def cli(csv, key, input, output):
             print(k + " is not in the INPUT. Please correct and re-run.")
             return
 
-    new_result = keep_column(result, keep_cols)
+    new_result = table.select(keep_cols)
 
-    if csv:
-        if not output.endswith('.csv'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.csv\' extension.')
-        else:
-            write_to_csv(new_result, output)
-    else:
-        if not output.endswith('.xlsx'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.xlsx\' extension.')
-        else:
-            write_to_xlsx(new_result, output)
+    write_output(new_result, output, output_format)
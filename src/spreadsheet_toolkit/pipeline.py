@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  SPDX-License-Identifier: Apache-2.0
+# ============================================================================
+
+import inspect
+import os
+
+import click
+import yaml
+
+from spreadsheet_toolkit import filter as filter_cmd
+from spreadsheet_toolkit import flatten
+from spreadsheet_toolkit import summarize
+from spreadsheet_toolkit import unflatten
+from spreadsheet_toolkit.csv_utils import OUTPUT_WRITERS
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
+
+# silence unicode literals warnings
+click.disable_unicode_literals_warning = True
+
+
+def as_list(value):
+    """
+    Return a list from a `value` that is either a list or a single value.
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def as_columns(value):
+    """
+    Return a list of column names from a `value` that is either a list or a
+    string of comma-separated column names.
+    """
+    if isinstance(value, str):
+        return value.split(',')
+    return as_list(value)
+
+
+def check_keys(keys, headers, step):
+    """
+    Raise a click.UsageError if any of the `keys` is not in `headers`.
+    """
+    for key in keys:
+        if key not in headers:
+            raise click.UsageError(
+                'ERROR: "The key \'{}\' is not in the input of the \'{}\' '
+                'step.'.format(key, step))
+
+
+def filter_step(rows, headers, include=(), exclude=(), exclude_exact=(),
+                startswith=(), endswith=(), equals=()):
+    """
+    Keep only the rows that pass the filter expressions, as with bom_filter.
+    """
+    conditions = filter_cmd.get_filter_conditions(
+        include=as_list(include),
+        exclude=as_list(exclude),
+        exclude_exact=as_list(exclude_exact),
+        startswith=as_list(startswith),
+        endswith=as_list(endswith),
+        equals=as_list(equals),
+    )
+    check_keys(filter_cmd.get_filter_keys(conditions), headers, 'filter')
+    return filter_cmd.filter_rows(rows, conditions), headers
+
+
+def flatten_step(rows, headers, key, sorted_input=False):
+    """
+    Flatten the rows on the `key` column, as with flatten. The rows are
+    streamed if the rows with the same `key` value are next to each other.
+    """
+    check_keys([key], headers, 'flatten')
+    if sorted_input:
+        return flatten.iter_flattened_sorted(headers, rows, key), headers
+    return iter(flatten.flattening(headers, rows, key)), headers
+
+
+def unflatten_step(rows, headers, key):
+    """
+    Unflatten the rows on the `key` column, as with unflatten.
+    """
+    check_keys([key], headers, 'unflatten')
+
+    def unflattened():
+        for row in rows:
+            yield from unflatten.unflattening(headers, [row], key)
+
+    return unflattened(), headers
+
+
+def keep_column_step(rows, headers, key):
+    """
+    Keep only the `key` columns, as with keep_column.
+    """
+    keep_cols = list(dict.fromkeys(as_columns(key)))
+    check_keys(keep_cols, headers, 'keep_column')
+    rows = ({col: row.get(col, '') for col in keep_cols} for row in rows)
+    return rows, keep_cols
+
+
+def remove_column_step(rows, headers, key):
+    """
+    Remove the `key` columns, as with remove_column.
+    """
+    remove_cols = set(as_columns(key))
+    rows = ({col: value for col, value in row.items() if col not in remove_cols}
+            for row in rows)
+    return rows, [header for header in headers if header not in remove_cols]
+
+
+def add_column_prefix_step(rows, headers, key):
+    """
+    Add the `key` prefix to all the column names, as with add_column_prefix.
+    """
+    rows = ({key + col: value for col, value in row.items()} for row in rows)
+    return rows, [key + header for header in headers]
+
+
+def summarize_step(rows, headers, key):
+    """
+    Summarize the `key` column from file level to directory level, as with
+    summarize.
+    """
+    check_keys(['Resource', key], headers, 'summarize')
+    output_headers = ['Resource', key]
+    summarized_list = summarize.summarize(rows, key)
+    result = flatten.flattening(output_headers, summarized_list, 'Resource')
+    return iter(result), output_headers
+
+
+def concat_step(rows, headers, input, worksheet=None):
+    """
+    Append the rows of the `input` file(s) after the rows, as with concat.
+    """
+    inputs = [(rows, headers)]
+    for location in as_list(input):
+        check_input(location)
+        inputs.append(read_input(location, worksheet))
+    return concat_rows(inputs)
+
+
+def concat_rows(inputs):
+    """
+    Return an iterator over the rows of a list of (rows, headers) `inputs` and
+    the union of their headers. Each row has all the headers and an empty
+    string for the missing ones.
+    """
+    all_headers = []
+    for _rows, headers in inputs:
+        for header in headers:
+            if header not in all_headers:
+                all_headers.append(header)
+
+    def rows():
+        for input_rows, headers in inputs:
+            if headers == all_headers:
+                yield from input_rows
+            else:
+                for row in input_rows:
+                    yield {header: row.get(header, '') for header in all_headers}
+
+    return rows(), all_headers
+
+
+PIPELINE_STEPS = {
+    'add_column_prefix': add_column_prefix_step,
+    'concat': concat_step,
+    'filter': filter_step,
+    'flatten': flatten_step,
+    'keep_column': keep_column_step,
+    'remove_column': remove_column_step,
+    'summarize': summarize_step,
+    'unflatten': unflatten_step,
+}
+
+
+def get_steps(steps):
+    """
+    Return a list of (step name, step function, step options) from a list of
+    `steps` as found in a pipeline spec, where each step is a mapping of a
+    single step name to its options.
+    """
+    pipeline_steps = []
+    for step in steps or []:
+        if isinstance(step, str):
+            step = {step: {}}
+        if not isinstance(step, dict) or len(step) != 1:
+            raise click.UsageError(
+                'ERROR: "Each pipeline step must be a step name with its '
+                'options: {!r}'.format(step))
+        [(name, options)] = step.items()
+        if name not in PIPELINE_STEPS:
+            raise click.UsageError(
+                'ERROR: "Unknown pipeline step: \'{}\'. Available steps: {}'.format(
+                    name, ', '.join(sorted(PIPELINE_STEPS))))
+        pipeline_steps.append((name, PIPELINE_STEPS[name], options or {}))
+    return pipeline_steps
+
+
+def run_pipeline(inputs, steps, worksheet=None):
+    """
+    Return an iterator of the rows and the headers resulting of running the
+    `steps` on the rows of the `inputs` files.
+
+    Each step takes an iterator of row dictionaries and the list of headers
+    and returns the same for the next step, so that the input is read once
+    and the rows are streamed from one step to the next. The flatten (unless
+    its input is sorted) and summarize steps need all their input rows and
+    collect them first.
+    """
+    for location in inputs:
+        check_input(location)
+    rows, headers = concat_rows(
+        [read_input(location, worksheet) for location in inputs])
+
+    for name, step, options in get_steps(steps):
+        try:
+            inspect.signature(step).bind(rows, headers, **options)
+        except TypeError as e:
+            raise click.UsageError(
+                'ERROR: "Invalid options for the \'{}\' step: {}'.format(name, e))
+        rows, headers = step(rows, headers, **options)
+    return rows, headers
+
+
+def load_spec(location):
+    """
+    Return a pipeline spec mapping loaded from the YAML file at `location`.
+
+    The relative paths of the input, output and concat step inputs of the
+    spec are resolved against the directory of the spec file.
+    """
+    with open(location, encoding='utf-8') as specfile:
+        spec = yaml.safe_load(specfile) or {}
+    if not isinstance(spec, dict):
+        raise click.UsageError(
+            'ERROR: "The pipeline spec must be a mapping with input, output '
+            'and steps.')
+
+    spec_dir = os.path.dirname(os.path.abspath(location))
+    if spec.get('input'):
+        spec['input'] = resolve_paths(spec['input'], spec_dir)
+    if spec.get('output'):
+        spec['output'] = resolve_paths(spec['output'], spec_dir)
+    for step in spec.get('steps') or []:
+        options = step.get('concat') if isinstance(step, dict) else None
+        if isinstance(options, dict) and options.get('input'):
+            options['input'] = resolve_paths(options['input'], spec_dir)
+    return spec
+
+
+def resolve_paths(paths, base_dir):
+    """
+    Return a path or list of `paths` with the relative paths resolved against
+    the `base_dir` directory.
+    """
+    if isinstance(paths, (list, tuple)):
+        return [resolve_paths(path, base_dir) for path in paths]
+    return os.path.normpath(os.path.join(base_dir, os.path.expanduser(paths)))
+
+
+@click.command()
+@click.argument('spec',
+                required=True,
+                metavar='SPEC',
+                type=click.Path(
+                    exists=True, file_okay=True, dir_okay=False, readable=True,
+                    resolve_path=True))
+@click.option('-i', '--input', multiple=True,
+              metavar='FILE',
+              type=click.Path(exists=True, dir_okay=False,
+                              readable=True, resolve_path=True),
+              help='Path to the input file. Multiple inputs are concatenated. '
+              'Override the input of the SPEC.')
+@click.option('-o', '--output',
+              metavar='OUTPUT',
+              type=click.Path(exists=False, dir_okay=False,
+                              writable=True, resolve_path=True),
+              help='Path to the output file. Override the output of the SPEC.')
+@click.option(
+    '-ws', '--worksheet', nargs=1,
+    help='Define the name of the worksheet to work on for the XLSX input.'
+)
+@click.help_option('-h', '--help')
+def cli(spec, input, output, worksheet):
+    """
+    Run the steps of the YAML pipeline SPEC on the input CSV/XLSX/JSONL/Parquet
+    file(s) and write the result to the output CSV/XLSX/JSONL/Parquet. The
+    output format is selected from the output file extension.
+    """
+    spec = load_spec(spec)
+    inputs = input or as_list(spec.get('input'))
+    output = output or spec.get('output')
+    worksheet = worksheet or spec.get('worksheet')
+
+    if not inputs:
+        raise click.UsageError('ERROR: "No input provided.')
+    if not output:
+        raise click.UsageError('ERROR: "No output provided.')
+
+    output_format = os.path.splitext(output)[1].lstrip('.')
+    if output_format not in OUTPUT_WRITERS:
+        raise click.UsageError(
+            'ERROR: "The output does not ends with \'.csv\', \'.xlsx\', '
+            '\'.jsonl\' or \'.parquet\' extension.')
+
+    rows, headers = run_pipeline(inputs, spec.get('steps'), worksheet)
+    try:
+        write_output(rows, output, output_format, headers=headers)
+    except flatten.UnsortedInputError as e:
+        # Do not leave the partial output of the rows processed before the error
+        if os.path.exists(output):
+            os.remove(output)
+        raise click.UsageError('ERROR: "{}'.format(e))
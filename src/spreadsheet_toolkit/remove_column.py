@@ -18,11 +18,11 @@
 
 import click
 
-from spreadsheet_toolkit.csv_utils import read_csv_rows
-
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
+from utilitycode.table import Table
 
 
 def remove_header(headers, remove_cols):
@@ -40,6 +40,12 @@ def remove_header(headers, remove_cols):
 @click.option('--csv',
               is_flag=True,
               help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl',
+              is_flag=True,
+              help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet',
+              is_flag=True,
+              help='Output as Parquet format (Default: XLSX format)')
 @click.option('-k', '--key',
               metavar='key',
               help='Column(s) to be removed.')
@@ -56,38 +62,18 @@ def remove_header(headers, remove_cols):
                     exists=False, dir_okay=False, writable=True,
                     resolve_path=True))
 @click.help_option('-h', '--help')
-def cli(csv, key, input, output):
+def cli(csv, jsonl, parquet, key, input, output):
     """
-    Take the input CSV/XLSX and remove the defined columns and write to the
-    output CSV/XLSX
+    Take the input CSV/XLSX/JSONL/Parquet and remove the defined columns and
+    write to the output CSV/XLSX/JSONL/Parquet
     """
-    if not input.endswith('.csv') and not input.endswith('.xlsx'):
-        raise click.UsageError(
-            'ERROR: "The input does not ends with \'.csv\' or \'.xlsx\' extension.')
-    result = []
+    check_input(input)
+    output_format = get_output_format(csv, jsonl, parquet)
 
-    if input.endswith('.csv'):
-        result = read_csv_rows(input)
-    else:
-        result, _headers = get_data_from_xlsx(input)
+    result, _headers = read_input(input)
 
     remove_cols = key.split(',')
 
-    new_result = []
-    for row in result:
-        for key in remove_cols:
-            row.pop(key, None)
-        new_result.append(row)
+    new_result = Table.from_rows(result).drop(remove_cols)
 
-    if csv:
-        if not output.endswith('.csv'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.csv\' extension.')
-        else:
-            write_to_csv(new_result, output)
-    else:
-        if not output.endswith('.xlsx'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.xlsx\' extension.')
-        else:
-            write_to_xlsx(new_result, output)
+    write_output(new_result, output, output_format)
@@ -20,13 +20,12 @@ import click
 import os
 import sys
 
-from spreadsheet_toolkit.csv_utils import get_csv_headers, read_csv_rows
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
 from spreadsheet_toolkit import flatten
 
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
-
 
 @click.command()
 @click.argument('input',
@@ -44,26 +43,28 @@ from utilitycode.bom_utils import write_to_xlsx
 @click.option('--csv',
               is_flag=True,
               help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl',
+              is_flag=True,
+              help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet',
+              is_flag=True,
+              help='Output as Parquet format (Default: XLSX format)')
 @click.option('-k', '--key',
               required=True,
               metavar='key',
               help='Key to be summarized.')
 @click.help_option('-h', '--help')
-def cli(input, output, csv, key):
+def cli(input, output, csv, jsonl, parquet, key):
     """
     Summarize the key data in the input from file level to directory level.
     """
-    if not input.endswith('.csv') and not input.endswith('.xlsx'):
-        raise click.UsageError(
-            'ERROR: "The input does not ends with \'.csv\' or \'.xlsx\' extension.')
+    check_input(input)
+    output_format = get_output_format(csv, jsonl, parquet)
 
-    if input.endswith('.csv'):
-        headers = get_csv_headers(input)
-        # Convert it with list to become a non-generator
-        # object
-        result = list(read_csv_rows(input))
-    else:
-        result, headers = get_data_from_xlsx(input)
+    # Convert it with list to become a non-generator
+    # object
+    result, headers = read_input(input)
+    result = list(result)
 
     if 'Resource' not in headers:
         print("Resource column is required. Please correct and re-run.")
@@ -77,18 +78,7 @@ def cli(input, output, csv, key):
     updated_result = flatten.flattening(
         output_headers, summarized_list, 'Resource')
 
-    if csv:
-        if not output.endswith('.csv'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.csv\' extension.')
-        else:
-            write_to_csv(updated_result, output)
-    else:
-        if not output.endswith('.xlsx'):
-            raise click.UsageError(
-                'ERROR: "The output does not ends with \'.xlsx\' extension.')
-        else:
-            write_to_xlsx(updated_result, output)
+    write_output(updated_result, output, output_format)
 
 
 def summarize(result, key):
@@ -18,10 +18,10 @@
 
 import click
 
-from spreadsheet_toolkit.csv_utils import get_csv_headers, read_csv_rows
-from utilitycode.bom_utils import get_data_from_xlsx
-from utilitycode.bom_utils import write_to_csv
-from utilitycode.bom_utils import write_to_xlsx
+from spreadsheet_toolkit.csv_utils import check_input
+from spreadsheet_toolkit.csv_utils import get_output_format
+from spreadsheet_toolkit.csv_utils import read_input
+from spreadsheet_toolkit.csv_utils import write_output
 
 
 def unflattening(headers, result, key):
@@ -49,6 +49,12 @@ def unflattening(headers, result, key):
 @click.option('--csv',
               is_flag=True,
               help='Output as CSV format (Default: XLSX format)')
+@click.option('--jsonl',
+              is_flag=True,
+              help='Output as JSON Lines format (Default: XLSX format)')
+@click.option('--parquet',
+              is_flag=True,
+              help='Output as Parquet format (Default: XLSX format)')
 @click.option('-k', '--key',
               required=True,
               metavar='key',
@@ -63,36 +69,21 @@ def unflattening(headers, result, key):
                 metavar='OUTPUT',
                 type=click.Path(exists=False, dir_okay=False, writable=True, resolve_path=True))
 @click.help_option('-h', '--help')
-def cli(csv, key, input, output):
+def cli(csv, jsonl, parquet, key, input, output):
     """
-    Unflatten the input CSV/XLSX based on the provided key.
+    Unflatten the input CSV/XLSX/JSONL/Parquet based on the provided key.
     """
-    if not input.endswith('.csv') and not input.endswith('.xlsx'):
-        raise click.UsageError(
-            'ERROR: "The input does not ends with \'.csv\' or \'.xlsx\' extension.')
+    check_input(input)
+    output_format = get_output_format(csv, jsonl, parquet)
 
-    if input.endswith('.csv'):
-        headers = get_csv_headers(input)
-        # Convert it with list to become a non-generator
-        # object
-        result = list(read_csv_rows(input))
-    else:
-        result, headers = get_data_from_xlsx(input)
+    # Convert it with list to become a non-generator
+    # object
+    result, headers = read_input(input)
+    result = list(result)
 
     if key not in headers:
         print(key + " is not in the INPUT. Please correct and re-run.")
         return
     else:
         unflatten_result = unflattening(headers, result, key)
-        if csv:
-            if not output.endswith('.csv'):
-                raise click.UsageError(
-                    'ERROR: "The output does not ends with \'.csv\' extension.')
-            else:
-                write_to_csv(unflatten_result, output)
-        else:
-            if not output.endswith('.xlsx'):
-                raise click.UsageError(
-                    'ERROR: "The output does not ends with \'.xlsx\' extension.')
-            else:
-                write_to_xlsx(unflatten_result, output)
+        write_output(unflatten_result, output, output_format)
@@ -20,7 +20,12 @@ from __future__ import print_function, absolute_import
 
 from collections import Counter
 from copy import copy
+from itertools import chain
+from itertools import islice
+from tempfile import NamedTemporaryFile
 import csv
+import gzip
+import io
 import json
 import logging
 import operator
@@ -30,16 +35,27 @@ import warnings
 
 import openpyxl
 from openpyxl import load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment
 from openpyxl.styles import Font
+from openpyxl.styles import NamedStyle
 from openpyxl.utils import get_column_letter
 
+from utilitycode.table import Table
+from utilitycode.table import iter_row_values
+
 logger = logging.getLogger('utilitycode')
 # logging.basicConfig(level=logging.DEBUG)
 
 # disable annoying warnings from OpenPyxl
 warnings.filterwarnings('ignore', module='openpyxl')
 
+# Size of the write buffer of the CSV outputs
+CSV_BUFFER_SIZE = 1024 * 1024
+
+# Number of rows read or written at once from a Parquet input or output
+PARQUET_BATCH_SIZE = 64 * 1024
+
 
 def get_expressions(location, column_char):
     """
@@ -61,11 +77,14 @@ def get_expressions(location, column_char):
     return expressions
 
 
-def create_nexb_bom(data):
+def create_nexb_bom(data, write_only=False):
     '''
     Given a destination path and data from the input csv, write out the
     report XLSX file that contains the analysis data formatted to nexb
     report BOM standards.
+
+    If `write_only` is True, the rows are streamed to a write-only workbook
+    that can only be saved once.
     '''
     side = openpyxl.styles.borders.Side(border_style='thin', color='000000')
     border = openpyxl.styles.borders.Border(
@@ -78,31 +97,36 @@ def create_nexb_bom(data):
     content_alignment = openpyxl.styles.alignment.Alignment(
         vertical='center', wrapText=True)
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
+    wb = openpyxl.Workbook(write_only=write_only)
+    ws = get_first_worksheet(wb)
 
-    for row in data:
+    header_style = add_named_style(
+        wb, 'nexB BOM Header', font=header_font, fill=header_color,
+        border=border)
+    content_style = add_named_style(
+        wb, 'nexB BOM Content', font=content_font,
+        alignment=content_alignment, border=border)
+
+    for row_idx, row in enumerate(data):
+        style = header_style if row_idx == 0 else content_style
         xlsx_row = []
         for cell in row:
-            xlsx_cell = openpyxl.cell.cell.Cell(worksheet=ws, value=cell)
-            xlsx_cell.border = border
-            if row == data[0]:
-                xlsx_cell.font = header_font
-                xlsx_cell.fill = header_color
-            else:
-                xlsx_cell.font = content_font
-                xlsx_cell.alignment = content_alignment
+            xlsx_cell = WriteOnlyCell(ws, value=cell)
+            xlsx_cell.style = style
             xlsx_row.append(xlsx_cell)
         ws.append(xlsx_row)
 
     return wb
 
 
-def create_nexb_bom_from_scancode(data, report=False):
+def create_nexb_bom_from_scancode(data, report=False, write_only=False):
     '''
     Given a destination path and data from the input csv, write out the
     report XLSX file that contains the analysis data formatted to nexb
     report BOM standards.
+
+    If `write_only` is True, the rows are streamed to a write-only workbook
+    that can only be saved once.
     '''
     side = openpyxl.styles.borders.Side(border_style='thin', color='000000')
     border = openpyxl.styles.borders.Border(
@@ -123,72 +147,128 @@ def create_nexb_bom_from_scancode(data, report=False):
     vertical_alignment = Alignment(textRotation=90, horizontal="center")
     center_alignment = Alignment(horizontal="center", vertical='center')
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
+    # Header formatting
+    header_height = 82.00
+    short_width = 4.00
+    normal_width = 15.00
+    long_width = 50.00
+    # Columns letter
+    short_width_cols = ['A', 'D', 'O', 'X',
+                        'Y', 'AB', 'AC', 'AD', 'AE', 'AF']
+    long_width_cols = ['L', 'AG', 'AH', 'AI', 'AJ']
+
+    wb = openpyxl.Workbook(write_only=write_only)
+    ws = get_first_worksheet(wb)
     ws.title = "INVENTORY"
 
-    for row in data:
+    rows = iter(data)
+    header = next(rows, None)
+    if header is None:
+        return wb
+
+    # The columns formatting must be set before any row is written to a
+    # write-only worksheet. The style of each column is looked up once from
+    # the header and then applied to all its cells.
+    header_styles = []
+    content_styles = []
+    for idx in range(len(header)):
+        col_letter = get_column_letter(idx + 1)
+        header_fill = None
+        header_alignment = None
+        content_alignment_ = content_alignment
+        style_suffix = ''
+        if report:
+            if idx <= 2:
+                header_fill = file_cat_color
+                style_suffix = ' File Cat'
+            elif idx >= 3 and idx <= 6:
+                header_fill = status_color
+                style_suffix = ' Status'
+            elif (idx >= 7 and idx <= 20) or (idx >= 25 and idx <= 39):
+                header_fill = report_color
+                style_suffix = ' Report'
+            elif idx >= 21 and idx <= 24:
+                header_fill = license_color
+                style_suffix = ' License'
+
+            if col_letter in short_width_cols:
+                ws.column_dimensions[col_letter].width = short_width
+                header_alignment = vertical_alignment
+                content_alignment_ = center_alignment
+                style_suffix += ' Short'
+            elif col_letter in long_width_cols:
+                ws.column_dimensions[col_letter].width = long_width
+            else:
+                ws.column_dimensions[col_letter].width = normal_width
+
+        header_styles.append(add_named_style(
+            wb, 'nexB Inventory Header' + style_suffix, font=header_font,
+            fill=header_fill, alignment=header_alignment, border=border))
+        content_styles.append(add_named_style(
+            wb, 'nexB Inventory Content' + style_suffix, font=bom_font,
+            alignment=content_alignment_, border=border))
+
+    if report:
+        ws.row_dimensions[1].height = header_height
+
+    # Used for the cells of content rows longer than the header
+    default_content_style = add_named_style(
+        wb, 'nexB Inventory Content', font=bom_font,
+        alignment=content_alignment, border=border)
+
+    for row_idx, row in enumerate(chain([header], rows)):
+        styles = header_styles if row_idx == 0 else content_styles
         xlsx_row = []
         for idx, cell in enumerate(row):
-            # The index is used to determine the color theme for the column
             try:
-                xlsx_cell = openpyxl.cell.cell.Cell(worksheet=ws, value=cell)
+                xlsx_cell = WriteOnlyCell(ws, value=cell)
             except:
                 # ToDo: temp fix
                 # Leave blank if the cell has encoding issue or otherwise
                 # openpyxml will throw AttributionError
-                xlsx_cell = openpyxl.cell.cell.Cell(worksheet=ws, value='')
-            xlsx_cell.border = border
-            if row == data[0]:
-                xlsx_cell.font = header_font
-                if report:
-                    if idx <= 2:
-                        xlsx_cell.fill = file_cat_color
-                    elif idx >= 3 and idx <= 6:
-                        xlsx_cell.fill = status_color
-                    elif (idx >= 7 and idx <= 20) or (idx >= 25 and idx <= 39):
-                        xlsx_cell.fill = report_color
-                    elif idx >= 21 and idx <= 24:
-                        xlsx_cell.fill = license_color
+                xlsx_cell = WriteOnlyCell(ws, value='')
+            if idx < len(styles):
+                xlsx_cell.style = styles[idx]
             else:
-                xlsx_cell.font = bom_font
-                xlsx_cell.alignment = content_alignment
+                xlsx_cell.style = default_content_style
             xlsx_row.append(xlsx_cell)
         ws.append(xlsx_row)
 
-    if report:
-        # Header formatting
-        header_height = 82.00
-        short_width = 4.00
-        normal_width = 15.00
-        long_width = 50.00
+    return wb
 
-        # Set the height of the first row
-        ws.row_dimensions[1].height = header_height
-        index = 1
-        # Columns letter
-        short_width_cols = ['A', 'D', 'O', 'X',
-                            'Y', 'AB', 'AC', 'AD', 'AE', 'AF']
-        long_width_cols = ['L', 'AG', 'AH', 'AI', 'AJ']
-        for idx, row in enumerate(ws.rows):
-            for cell in row:
-                if get_column_letter(cell.col_idx) in short_width_cols:
-                    if idx == 0:
-                        cell.alignment = vertical_alignment
-                    else:
-                        cell.alignment = center_alignment
 
-        for column_cells in ws.columns:
-            col_letter = get_column_letter(index)
-            if col_letter in short_width_cols:
-                ws.column_dimensions[col_letter].width = short_width
-            elif col_letter in long_width_cols:
-                ws.column_dimensions[col_letter].width = long_width
-            else:
-                ws.column_dimensions[col_letter].width = normal_width
-            index = index + 1
+def add_named_style(workbook, name, font=None, fill=None, alignment=None,
+                    border=None):
+    """
+    Register a NamedStyle `name` with the `font`, `fill`, `alignment` and
+    `border` styles in `workbook` unless it already has one with this name,
+    and return the style name to assign to cells.
 
-    return wb
+    A named style is registered only once per workbook and assigning it to a
+    cell is much cheaper than setting each style attribute on every cell.
+    """
+    if name not in workbook.named_styles:
+        named_style = NamedStyle(name=name)
+        if font:
+            named_style.font = font
+        if fill:
+            named_style.fill = fill
+        if alignment:
+            named_style.alignment = alignment
+        if border:
+            named_style.border = border
+        workbook.add_named_style(named_style)
+    return name
+
+
+def get_first_worksheet(workbook):
+    """
+    Return the active worksheet of a new `workbook`, creating it for a
+    write-only workbook which starts without any worksheet.
+    """
+    if workbook.write_only:
+        return workbook.create_sheet()
+    return workbook.active
 
 
 def create_scio2inv_bom(data, packages_ws, resources_ws, reorder):
@@ -719,7 +799,35 @@ def create_scan2inv_format(data, wb, worksheet_name=None):
     else:
         ws = wb.create_sheet(worksheet_name)
 
-    from openpyxl.styles import Alignment
+    # The other worksheets than 'RESOURCES' get the plain header font and
+    # alignment, and so does this worksheet when it has another name
+    plain_header = ws.title != 'RESOURCES'
+
+    file_cat_header_font = openpyxl.styles.fonts.Font(
+        name='Calibri', size=10, b=True, italic=True)
+    file_cat_color = openpyxl.styles.fills.PatternFill(
+        'solid', fgColor='fff2cc')
+    status_color = openpyxl.styles.fills.PatternFill('solid', fgColor='f2f2f2')
+    rotated_alignment = openpyxl.styles.alignment.Alignment(
+        horizontal='center', wrapText=False, textRotation=90)
+    wrapped_alignment = openpyxl.styles.alignment.Alignment(
+        horizontal='left', wrapText=True)
+
+    # Map a header to the (name, font, fill, alignment) of its named style
+    header_styles = {
+        'analysis_priority': ('Priority', file_cat_header_font, file_cat_color, rotated_alignment),
+        'file_category': ('File Cat', file_cat_header_font, file_cat_color, wrapped_alignment),
+        'file_subcategory': ('File Cat', file_cat_header_font, file_cat_color, wrapped_alignment),
+        'Party': ('Party', file_cat_header_font, status_color, rotated_alignment),
+        'Status': ('Status', file_cat_header_font, status_color, wrapped_alignment),
+        'Notes': ('Status', file_cat_header_font, status_color, wrapped_alignment),
+        'ToDo': ('Status', file_cat_header_font, status_color, wrapped_alignment),
+    }
+    default_header_style = ('Default', header_font, header_color, None)
+
+    content_style = add_named_style(
+        wb, 'scan2inv Content', font=content_font,
+        alignment=content_alignment, border=border)
 
     force_int_index_list = []
     hide_fields_list = ['md5', 'sha1', 'sha256', 'sha512', 'is_binary',
@@ -731,68 +839,42 @@ def create_scan2inv_format(data, wb, worksheet_name=None):
     path_field_col_letter = ''
     max_len_path = 0
 
-    for row in data:
+    for row_idx, row in enumerate(data):
         xlsx_row = []
         for idx, cell in enumerate(row):
             idx += 1
 
             if idx in force_int_index_list and cell:
                 # Force the cell value to be an integer
-                xlsx_cell = openpyxl.cell.cell.Cell(
-                    worksheet=ws, value=int(cell))
+                xlsx_cell = WriteOnlyCell(ws, value=int(cell))
             else:
-                xlsx_cell = openpyxl.cell.cell.Cell(worksheet=ws, value=cell)
-            xlsx_cell.border = border
-            if row == data[0]:
+                xlsx_cell = WriteOnlyCell(ws, value=cell)
+            if row_idx == 0:
                 if cell in hide_fields_list:
                     hide_fields_col_letter.append(get_column_letter(idx))
-                if cell == 'analysis_priority':
+                if cell == 'analysis_priority' or cell == 'size':
                     force_int_index_list.append(idx)
-                    xlsx_cell.font = openpyxl.styles.fonts.Font(
-                        name='Calibri', size=10, b=True, italic=True)
-                    xlsx_cell.fill = openpyxl.styles.fills.PatternFill(
-                        'solid', fgColor='fff2cc')
-                    xlsx_cell.alignment = Alignment(textRotation=90)
-                    xlsx_cell.alignment = openpyxl.styles.alignment.Alignment(
-                        horizontal='center', wrapText=False, textRotation=90)
-                elif cell == 'file_category' or cell == 'file_subcategory':
-                    xlsx_cell.font = openpyxl.styles.fonts.Font(
-                        name='Calibri', size=10, b=True, italic=True)
-                    xlsx_cell.fill = openpyxl.styles.fills.PatternFill(
-                        'solid', fgColor='fff2cc')
-                    xlsx_cell.alignment = openpyxl.styles.alignment.Alignment(
-                        horizontal='left', wrapText=True)
-                elif cell == 'Party':
-                    xlsx_cell.font = openpyxl.styles.fonts.Font(
-                        name='Calibri', size=10, b=True, italic=True)
-                    xlsx_cell.fill = openpyxl.styles.fills.PatternFill(
-                        'solid', fgColor='f2f2f2')
-                    xlsx_cell.alignment = Alignment(textRotation=90)
-                    xlsx_cell.alignment = openpyxl.styles.alignment.Alignment(
-                        horizontal='center', wrapText=False, textRotation=90)
-                elif cell == 'Status' or cell == 'Notes' or cell == 'ToDo':
-                    xlsx_cell.font = openpyxl.styles.fonts.Font(
-                        name='Calibri', size=10, b=True, italic=True)
-                    xlsx_cell.fill = openpyxl.styles.fills.PatternFill(
-                        'solid', fgColor='f2f2f2')
-                    xlsx_cell.alignment = openpyxl.styles.alignment.Alignment(
-                        horizontal='left', wrapText=True)
-                else:
-                    if cell == 'size':
-                        force_int_index_list.append(idx)
-                    elif cell == 'path':
-                        path_field_idx = idx
-                        path_field_col_letter = get_column_letter(idx)
-                    xlsx_cell.font = header_font
-                    xlsx_cell.fill = header_color
+                elif cell == 'path':
+                    path_field_idx = idx
+                    path_field_col_letter = get_column_letter(idx)
+
+                style_name, font, fill, alignment = header_styles.get(
+                    cell, default_header_style)
+                style_name = 'scan2inv Header ' + style_name
+                if plain_header:
+                    style_name += ' Plain'
+                    font = header_font
+                    alignment = header_alignment
+                xlsx_cell.style = add_named_style(
+                    wb, style_name, font=font, fill=fill,
+                    alignment=alignment, border=border)
             else:
                 # Calculate the length of the path field
                 if idx == path_field_idx:
                     if len(str(cell)) > max_len_path:
                         max_len_path = len(str(cell))
 
-                xlsx_cell.font = content_font
-                xlsx_cell.alignment = content_alignment
+                xlsx_cell.style = content_style
             xlsx_row.append(xlsx_cell)
         ws.append(xlsx_row)
 
@@ -808,8 +890,9 @@ def create_scan2inv_format(data, wb, worksheet_name=None):
         # Freeze the first row
         worksheet.freeze_panes = worksheet["A2"]
         # Update font and alignment for all worksheets
-        # No need to work on 'RESOURCES' as it's been hendled
-        if not worksheet.title == 'RESOURCES':
+        # No need to work on 'RESOURCES' and the new worksheet as they've
+        # been handled
+        if worksheet is not ws and not worksheet.title == 'RESOURCES':
             for row in worksheet.iter_rows(min_row=1, max_row=worksheet.max_row, min_col=1, max_col=worksheet.max_column):
                 for cell in row:
                     if cell.row == 1:
@@ -991,36 +1074,39 @@ def format_dict_data_for_xlsx_output(data_list):
     to [['Resource', 'package__type', 'package__namespace'], ['xxx', 'npm', '']]
     as this is the format needed for create_xlsx_output.
     """
-    formatted_list = []
-    key_list = []
-    # Get all the dictionary keys from the list
-    for data_dict in data_list:
-        for key in data_dict:
-            if key not in key_list:
-                key_list.append(key)
-
-    headers = key_list
-    formatted_list.append(headers)
-    for entry in data_list:
+    return list(iter_dict_data_for_xlsx_output(data_list))
+
+
+def iter_dict_data_for_xlsx_output(data_list, headers=None):
+    """
+    Yield the header row and then each non-empty content row of a list of
+    dictionary or Table `data_list`, formatted as
+    format_dict_data_for_xlsx_output does, without building the whole list of
+    rows.
+
+    If the `headers` columns are provided, data_list can be any iterable of
+    dictionaries and the rows are yielded as they are iterated.
+    """
+    if headers is None:
+        table = Table.from_rows(data_list)
+        headers = table.headers
+        rows = table.iter_values()
+    else:
+        headers = list(dict.fromkeys(headers))
+        rows = iter_row_values(data_list, headers)
+
+    yield list(headers)
+    for values in rows:
+        # Prevent empty entry
+        if not any(values):
+            continue
         entry_list = []
-        have_content = False
-        for header in headers:
-            if header not in entry:
-                entry[header] = ""
+        for value in values:
             # Special treatment to prevent excel to treat this cell as formula
-            if entry[header] and str(entry[header]).startswith('='):
-                special_treatment = "'" + entry[header]
-                entry_list.append(special_treatment)
-            else:
-                entry_list.append(entry[header])
-        # Prevent empty entry
-        for entry in entry_list:
-            if entry:
-                have_content = True
-                break
-        if have_content:
-            formatted_list.append(entry_list)
-    return formatted_list
+            if value and str(value).startswith('='):
+                value = "'" + value
+            entry_list.append(value)
+        yield entry_list
 
 
 def create_xlsx_output(destination, data, input_bom=None, input_ws=None):
@@ -1029,6 +1115,9 @@ def create_xlsx_output(destination, data, input_bom=None, input_ws=None):
     by other list of content
     For instance,
     data = [['Resource', 'name', license], ['/tmp/', 'tmp', 'gpl-2.0']]
+
+    Without an input_bom, data can be any iterable of rows: the rows are
+    streamed to a write-only workbook as they are iterated.
     """
     header_font = openpyxl.styles.fonts.Font(
         name='Calibri', size=10, bold=True)
@@ -1037,8 +1126,8 @@ def create_xlsx_output(destination, data, input_bom=None, input_ws=None):
         vertical='center', wrapText=True)
     report_color = openpyxl.styles.fills.PatternFill('solid', fgColor='C0FEFD')
 
-    output_workbook = openpyxl.Workbook()
     if input_bom:
+        output_workbook = openpyxl.Workbook()
         # Remove the default sheet created in the new workbook
         output_workbook.remove(output_workbook.active)
 
@@ -1087,7 +1176,8 @@ def create_xlsx_output(destination, data, input_bom=None, input_ws=None):
                             output_sheet[next_coordinate].font = bom_font
                             output_sheet[next_coordinate].alignment = content_alignment
     else:
-        output_sheet = output_workbook.active
+        output_workbook = openpyxl.Workbook(write_only=True)
+        output_sheet = output_workbook.create_sheet()
 
         # Freeze the top row
         output_sheet.freeze_panes = "A2"
@@ -1106,23 +1196,23 @@ def create_multiple_worksheets_xlsx_output(destination, ws_name_list, data_list)
     For instance,
     ws_name_list = ['Worksheet1', 'Worksheet2']
     data_list = [[['Resource', 'name'], ['/tmp/ws1', 'ws1']], [['Resource', 'name'], ['/tmp/ws2', 'ws2']]]
+
+    The rows are streamed to a write-only workbook, so each data can be any
+    iterable of rows.
     """
     assert len(ws_name_list) == len(data_list)
-    new_bom = openpyxl.Workbook()
-    # Remove the default sheet created by openpyxl
-    new_bom.remove(new_bom.active)
+    new_bom = openpyxl.Workbook(write_only=True)
     for index, ws_name in enumerate(ws_name_list):
 
         # write new bom
-        ws_name = str(index)
         ws_name = new_bom.create_sheet(title=ws_name_list[index])
+        # Freeze the top row
+        ws_name.freeze_panes = 'A2'
 
         # Write content to the worksheet
         data = data_list[index]
         for row in data:
             ws_name.append(row)
-        # Freeze the top row
-        ws_name.freeze_panes = 'A2'
 
     new_bom.save(destination)
 
@@ -1131,8 +1221,11 @@ def get_sheetname_from_xlsx(input):
     """
     Get all the sheetnames from the input
     """
-    input_bom = load_workbook(input)
-    return input_bom.sheetnames
+    input_bom = load_workbook(input, read_only=True)
+    try:
+        return input_bom.sheetnames
+    finally:
+        input_bom.close()
 
 
 def get_data_from_xlsx(input, sheet_name=None):
@@ -1140,46 +1233,182 @@ def get_data_from_xlsx(input, sheet_name=None):
     This function read the input xlsx file and return a
     list of dictionary of its content and the headers list
     """
-    input_bom = load_workbook(input)
+    input_bom = load_workbook(input, read_only=True)
+    try:
+        ws = get_read_only_worksheet(input_bom, sheet_name)
+        return get_data_from_worksheet(ws)
+    finally:
+        input_bom.close()
+
+
+def get_read_only_worksheet(workbook, sheet_name=None):
+    """
+    Return the `sheet_name` (or active) worksheet of a read-only `workbook`.
+
+    The dimensions stored in the file are reset: some tools write a stale or
+    no dimension and the rows and columns outside of it would be skipped.
+    """
     if sheet_name:
-        ws = input_bom[sheet_name]
+        ws = workbook[sheet_name]
     else:
-        ws = input_bom.active
-
-    rows = []
-    results = []
-    headers = []
+        ws = workbook.active
+    ws.reset_dimensions()
+    return ws
 
-    # Create tuple of column names
-    column_names = []
-    for cell in ws[1]:
-        column_names.append(cell.value)
-    header = tuple(column_names)
 
-    # Use rows, created above, to create a list of dictionaries and set the min_row to 2
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        rows.append(dict(zip(header, row)))
+def get_data_from_worksheet(ws):
+    """
+    Return a list of dictionary of the content of the `ws` worksheet and the
+    headers list.
+    """
+    values = ws.iter_rows(min_row=1, values_only=True)
+    header = next(values, (None,))
+    results = list(iter_row_dicts(header, values))
 
     # Handle situation where only header row exist and no value
-    if not rows:
+    if not results:
         header_row = {}
         for h in header:
             header_row[h] = ''
-            headers.append(h)
-        results.append(header_row)
-    else:
-        # Replace None values with empty string to avoid openpyxl errors -- requires a new dict
-        for row in rows:
-            # Append "if key" to avoid creating empty column
-            row = {key: '' if value is None else value for (
-                key, value) in row.items() if key}
-            results.append(row)
-
-        headers = [cell.value for cell in ws[1] if cell.value]
+        return [header_row], list(header)
 
+    headers = [h for h in header if h]
     return results, headers
 
 
+def iter_sheets_data_from_xlsx(input, sheet_names=None):
+    """
+    Yield a (sheet name, list of dictionary, headers list) tuple for each of
+    the `sheet_names` worksheets (or all the worksheets) of the input xlsx
+    file, in the workbook order.
+
+    The workbook is opened only once and each worksheet is streamed in
+    read-only mode, rather than calling get_data_from_xlsx for each sheet.
+    """
+    input_bom = load_workbook(input, read_only=True)
+    try:
+        for sheet_name in input_bom.sheetnames:
+            if sheet_names is not None and sheet_name not in sheet_names:
+                continue
+            ws = get_read_only_worksheet(input_bom, sheet_name)
+            results, headers = get_data_from_worksheet(ws)
+            yield sheet_name, results, headers
+    finally:
+        input_bom.close()
+
+
+def iter_data_from_xlsx(input, sheet_name=None):
+    """
+    Return an iterator of dictionaries for the rows of the `sheet_name` (or
+    active) worksheet of the input xlsx file and the headers list.
+
+    Unlike get_data_from_xlsx, the worksheet is streamed in read-only mode and
+    each row is only built when the iterator reaches it, so that the memory
+    use does not grow with the size of the worksheet. The workbook is closed
+    once the iterator is exhausted.
+    """
+    input_bom = load_workbook(input, read_only=True)
+    ws = get_read_only_worksheet(input_bom, sheet_name)
+    values = ws.iter_rows(min_row=1, values_only=True)
+    header = next(values, (None,))
+    first_values = next(values, None)
+
+    # Handle situation where only header row exist and no value: the headers
+    # are kept as-is, like with get_data_from_worksheet
+    if first_values is None:
+        input_bom.close()
+        return iter([{h: '' for h in header}]), list(header)
+
+    headers = [h for h in header if h]
+
+    def rows():
+        try:
+            yield from iter_row_dicts(header, chain([first_values], values))
+        finally:
+            input_bom.close()
+
+    return rows(), headers
+
+
+def iter_row_dicts(header, values):
+    """
+    Yield a dictionary keyed by the `header` column names for each tuple of
+    cell `values`. None values are replaced by an empty string to avoid
+    openpyxl errors and columns without a name are skipped.
+    """
+    # Use the last column for duplicated column names, as a dict() of the
+    # zipped header and values would
+    columns = {}
+    for index, key in enumerate(header):
+        if key:
+            columns[key] = index
+    columns = list(columns.items())
+    width = len(header)
+    padding = (None,) * width
+
+    for row in values:
+        # Rows of a streamed worksheet may be shorter than the header
+        if len(row) < width:
+            row = tuple(row) + padding[len(row):]
+        yield {key: '' if row[index] is None else row[index]
+               for key, index in columns}
+
+
+def iter_data_from_jsonl(input):
+    """
+    Return an iterator of dictionaries for the JSON objects of each line of
+    the input JSON Lines file and the headers list.
+
+    The headers are the union of the keys of all the objects, so the whole
+    file is loaded in a Table first. A missing key or a null value is
+    returned as an empty string, like for the CSV and XLSX inputs.
+    """
+    with open(input, encoding='utf-8-sig') as jsonlfile:
+        table = Table.from_rows(
+            json.loads(line) for line in jsonlfile if line.strip())
+    for column in table.columns:
+        column[:] = ['' if value is None else value for value in column]
+    return table.iter_rows(), table.headers
+
+
+def iter_data_from_parquet(input):
+    """
+    Return an iterator of dictionaries for the rows of the input Parquet file
+    and the headers list.
+
+    The file is read by batches of PARQUET_BATCH_SIZE rows as the iterator
+    advances. A null value is returned as an empty string, like for the CSV
+    and XLSX inputs. This requires the optional pyarrow package.
+    """
+    pq = get_parquet_module()
+    headers = list(pq.read_schema(input).names)
+
+    def rows():
+        with open(input, 'rb') as parquetfile:
+            batches = pq.ParquetFile(parquetfile).iter_batches(
+                batch_size=PARQUET_BATCH_SIZE)
+            for batch in batches:
+                for row in batch.to_pylist():
+                    yield {key: '' if value is None else value
+                           for key, value in row.items()}
+
+    return rows(), headers
+
+
+def get_parquet_module():
+    """
+    Return the pyarrow.parquet module or raise an ImportError with an
+    installation hint if pyarrow is not installed.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            'The "pyarrow" package is required to read or write Parquet '
+            'files: install it with "pip install pyarrow".')
+    return pq
+
+
 def write_to_json(data, output):
     """
     Given a list of dictioanry data.
@@ -1189,37 +1418,227 @@ def write_to_json(data, output):
         json.dump(list(data), outfile)
 
 
-def write_to_csv(data_list, output):
+def write_to_csv(data_list, output, headers=None, compress=False):
     """
-    Given a list of dictioanry data.
+    Given a list of dictioanry data or a Table.
     Write CSV format output
+
+    If the `headers` columns are provided, data_list can be any iterable of
+    dictionaries: the rows are streamed to the output and the keys that are
+    not in `headers` are ignored. The output is gzip-compressed if `compress`
+    is True or if it ends with '.gz'.
     """
-    key_list = []
-    # Get all the dictionary keys from the list
-    for data_dict in data_list:
-        for key in data_dict:
-            if key not in key_list:
-                key_list.append(key)
-
-    with open(output, 'w', encoding='utf-8-sig', newline='') as csvfile:
-        fieldnames = key_list
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for item in data_list:
+    if headers is None:
+        table = Table.from_rows(data_list)
+        headers = table.headers
+        rows = table.iter_values()
+    else:
+        rows = iter_row_values(data_list, headers)
+
+    if compress or output.endswith('.gz'):
+        csvfile = io.TextIOWrapper(
+            io.BufferedWriter(gzip.GzipFile(output, 'wb'), CSV_BUFFER_SIZE),
+            encoding='utf-8-sig', newline='')
+    else:
+        csvfile = open(output, 'w', encoding='utf-8-sig',
+                       newline='', buffering=CSV_BUFFER_SIZE)
+
+    with csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(headers)
+        # Prevent empty row
+        writer.writerows(filter(any, rows))
+
+
+def write_to_jsonl(data_list, output):
+    """
+    Given an iterable of dictionary data or a Table.
+    Write JSON Lines format output: one JSON object per line.
+    """
+    if isinstance(data_list, Table):
+        data_list = data_list.iter_rows()
+    with open(output, 'w', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as jsonlfile:
+        for row in data_list:
             # Prevent empty row
-            have_content = False
-            for key in item:
-                if item[key]:
-                    have_content = True
-                    break
-            if have_content:
-                writer.writerow(item)
+            if any(row.values()):
+                jsonlfile.write(json.dumps(row, ensure_ascii=False, default=str))
+                jsonlfile.write('\n')
 
 
-def write_to_xlsx(data_list, output):
+def write_to_parquet(data_list, output, headers=None):
     """
-    Given a list of dictioanry data.
+    Given a list of dictionary data or a Table.
+    Write Parquet format output. This requires the optional pyarrow package.
+
+    Each column gets the type of its values when they have a common type and
+    the empty strings of such a column are stored as nulls. Otherwise, the
+    values of the column are stored as strings.
+
+    If the `headers` columns are provided, data_list can be any iterable of
+    dictionaries: the rows are streamed to the output by batches of
+    PARQUET_BATCH_SIZE rows and the keys that are not in `headers` are
+    ignored. The column types are then those of the first batch.
+    """
+    pq = get_parquet_module()
+    import pyarrow as pa
+
+    if headers is not None:
+        write_parquet_batches(pa, pq, data_list, output, headers)
+        return
+
+    table = Table.from_rows(data_list)
+    # Prevent empty row
+    rows = [index for index, values in enumerate(table.iter_values()) if any(values)]
+    if len(rows) != len(table):
+        table = Table(
+            table.headers,
+            [[column[index] for index in rows] for column in table.columns],
+            len(rows))
+
+    arrays = [get_parquet_array(pa, column) for column in table.columns]
+    pq.write_table(pa.Table.from_arrays(arrays, names=table.headers), output)
+
+
+def write_parquet_batches(pa, pq, data_list, output, headers):
+    """
+    Write an iterable of dictionary `data_list` rows to the Parquet `output`
+    by batches of PARQUET_BATCH_SIZE rows with the `headers` columns.
+
+    The column types are those of the first batch. A column with values of
+    another type in a later batch is widened to a string column. The rows
+    are written to a temporary file moved to `output` once all the rows are
+    written, so that no partial output is left on failure.
+    """
+    headers = list(dict.fromkeys(headers))
+    # Prevent empty row
+    rows = filter(any, iter_row_values(data_list, headers))
+    schema = None
+    writer = None
+    location = None
+    try:
+        while True:
+            batch = list(islice(rows, PARQUET_BATCH_SIZE))
+            if not batch and writer:
+                break
+            columns = [list(column) for column in zip(*batch)] or [[] for _ in headers]
+            if schema is None:
+                arrays = [get_parquet_array(pa, column) for column in columns]
+                # A column without values in the first batch is a string column
+                arrays = [array.cast(pa.string()) if array.type == pa.null() else array
+                          for array in arrays]
+                schema = pa.schema(
+                    [(header, array.type) for header, array in zip(headers, arrays)])
+                location = get_temp_location(output)
+                writer = pq.ParquetWriter(location, schema)
+            else:
+                arrays = [get_parquet_array(pa, column, field.type)
+                          for column, field in zip(columns, schema)]
+                widened = [index for index, array in enumerate(arrays) if array is None]
+                if widened:
+                    writer.close()
+                    writer = None
+                    schema, location, writer = widen_parquet_columns(
+                        pa, pq, location, schema, widened, output)
+                    arrays = [get_parquet_array(pa, column, field.type)
+                              for column, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            if len(batch) < PARQUET_BATCH_SIZE:
+                break
+
+        writer.close()
+        writer = None
+        os.replace(location, output)
+        location = None
+    finally:
+        if writer:
+            writer.close()
+        if location and os.path.exists(location):
+            os.remove(location)
+
+
+def widen_parquet_columns(pa, pq, location, schema, indexes, output):
+    """
+    Return a tuple of (schema, location, writer) for a new temporary Parquet
+    file for `output` with the rows of the Parquet file at `location` and its
+    `schema` where the `indexes` columns are converted to strings. The writer
+    is open to add more rows and the file at `location` is removed.
+    """
+    fields = list(schema)
+    for index in indexes:
+        fields[index] = pa.field(fields[index].name, pa.string())
+    widened_schema = pa.schema(fields)
+
+    widened_location = get_temp_location(output)
+    writer = pq.ParquetWriter(widened_location, widened_schema)
+    try:
+        with open(location, 'rb') as parquetfile:
+            batches = pq.ParquetFile(parquetfile).iter_batches(
+                batch_size=PARQUET_BATCH_SIZE)
+            for batch in batches:
+                arrays = list(batch.columns)
+                for index in indexes:
+                    arrays[index] = get_parquet_array(
+                        pa, arrays[index].to_pylist(), pa.string())
+                writer.write_table(
+                    pa.Table.from_arrays(arrays, schema=widened_schema))
+    except BaseException:
+        writer.close()
+        os.remove(widened_location)
+        raise
+    os.remove(location)
+    return widened_schema, widened_location, writer
+
+
+def get_temp_location(output):
+    """
+    Return the location of a new empty temporary file in the directory of
+    the `output` file, with the permissions of a newly created file.
+    """
+    output = os.path.abspath(output)
+    with NamedTemporaryFile(dir=os.path.dirname(output),
+                            prefix=os.path.basename(output) + '.',
+                            suffix='.tmp', delete=False) as tmp:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp.name, 0o666 & ~umask)
+        return tmp.name
+
+
+def get_parquet_array(pa, values, type=None):
+    """
+    Return a pyarrow array for a column list of `values`. If the column
+    `type` is provided, the values are converted to this type or None is
+    returned if they cannot be.
+    """
+    if type is not None:
+        if type == pa.string():
+            return pa.array(['' if value is None else str(value) for value in values],
+                            type=type)
+        try:
+            return pa.array([None if value == '' else value for value in values],
+                            type=type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            return None
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    try:
+        return pa.array([None if value == '' else value for value in values])
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    return pa.array(['' if value is None else str(value) for value in values],
+                    type=pa.string())
+
+
+def write_to_xlsx(data_list, output, headers=None):
+    """
+    Given a list of dictioanry data or a Table.
     Write XLSX format output
+
+    If the `headers` columns are provided, data_list can be any iterable of
+    dictionaries: the rows are streamed to the output and the keys that are
+    not in `headers` are ignored.
     """
-    formatted_data = format_dict_data_for_xlsx_output(data_list)
+    formatted_data = iter_dict_data_for_xlsx_output(data_list, headers)
     create_xlsx_output(output, formatted_data)
@@ -16,11 +16,16 @@
 #  SPDX-License-Identifier: Apache-2.0
 # ============================================================================
 
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
 import csv
 import os
+import re
 import sys
 
 import click
+from openpyxl import Workbook
 from openpyxl import load_workbook
 
 from utilitycode import bom_utils, file_cat_resource
@@ -46,8 +51,12 @@ from utilitycode import bom_utils, file_cat_resource
     '-ws', '--worksheet', nargs=1,
     help='Define the name of the worksheet to work on.'
 )
+@click.option(
+    '-j', '--jobs', type=int, default=1, show_default=True,
+    help='Number of .xlsx files of an INPUT directory processed in parallel.'
+)
 @click.help_option('-h', '--help')
-def cli(input, output, rules, worksheet):
+def cli(input, output, rules, worksheet, jobs):
     """
     Categorize the records in the .xlsx file(s) generated by the sctk2inv
     or scio2inv utility, and identify the analysis priority based on the
@@ -87,55 +96,125 @@ def cli(input, output, rules, worksheet):
         reader = csv.DictReader(file)
         for row in reader:
             rules_list.append(row)
+    rule_matcher = RuleMatcher(rules_list)
 
     if os.path.isdir(input):
+        tasks = []
         for root, _dirs, files in os.walk(input):
-            total = len(files)
-            for index, file in enumerate(files):
-                index = index + 1
+            for file in files:
                 if file.endswith(".xlsx"):
                     input_file = os.path.join(root, file)
-                    print(str(index) + "/" + str(total) +
-                          " . Working on: " + file)
-                    # 'results' is a list of dictionaries, with each
-                    # dictionary representing a row in the input .xlsx
-                    # 'headers' is a list of the column names in the input
-                    # .xlsx
-                    results, headers = bom_utils.get_data_from_xlsx(
-                        input_file, worksheet)
-                    if not worksheet:
-                        worksheet_name = load_workbook(input_file).active.title
-                    else:
-                        worksheet_name = worksheet
-                    validate_required_input_columns(headers)
-                    processed_rows = process(results, rules_list)
                     output_filename = str(file).partition(
                         ".xlsx")[0] + "-file-cat.xlsx"
                     output_file = os.path.join(output, output_filename)
-                    create_output_bom(headers, processed_rows,
-                                      input_file, output_file, worksheet_name)
+                    tasks.append((input_file, output_file, worksheet))
+
+        errors = categorize_files(tasks, rule_matcher, jobs)
+        if errors:
+            print('\n{} of {} files failed:'.format(len(errors), len(tasks)))
+            for input_file, error in errors:
+                print(input_file + ': ' + error)
+            sys.exit(1)
     else:
         if not input.endswith('.xlsx'):
             print(
                 '\nfile-cat requires that the input be a .xlsx file -- your input is not a .xlsx file.\n')
             sys.exit(1)
 
-        results, headers = bom_utils.get_data_from_xlsx(input, worksheet)
-        if not worksheet:
-            worksheet_name = load_workbook(input).active.title
-        else:
-            worksheet_name = worksheet
-        validate_required_input_columns(headers)
-        processed_rows = process(results, rules_list)
-
         output_filename = os.path.basename(input).partition(".xlsx")[
             0] + "-file-cat.xlsx"
         output_file = os.path.join(output, output_filename)
-        create_output_bom(headers, processed_rows, input,
-                          output_file, worksheet_name)
+        categorize_file(input, output_file, rule_matcher, worksheet)
+
+
+def categorize_files(tasks, rule_matcher, jobs=1):
+    """
+    Categorize a list of (input file, output file, worksheet) `tasks` using the
+    `rule_matcher` RuleMatcher, in `jobs` parallel processes. Print the
+    progress for each file and return a list of (input file, error message)
+    for the files that failed. A failed file does not stop the processing of
+    the other files.
+    """
+    total = len(tasks)
+    errors = []
+
+    def report(index, input_file, error):
+        status = 'Failed' if error else 'Done'
+        print(str(index) + "/" + str(total) + " . " + status + ": " +
+              os.path.basename(input_file))
+        if error:
+            errors.append((input_file, error))
+
+    if jobs > 1 and total > 1:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_categorize_worker,
+            initargs=(rule_matcher,),
+        ) as executor:
+            futures = {executor.submit(_categorize_task, task): task for task in tasks}
+            for index, future in enumerate(as_completed(futures), 1):
+                report(index, futures[future][0], future.result())
+    else:
+        for index, task in enumerate(tasks, 1):
+            print(str(index) + "/" + str(total) +
+                  " . Working on: " + os.path.basename(task[0]))
+            report(index, task[0], _categorize_task(task, rule_matcher))
+
+    return errors
+
+
+# the RuleMatcher of a categorize worker process
+_worker_rule_matcher = None
+
+
+def _init_categorize_worker(rule_matcher):
+    global _worker_rule_matcher
+    _worker_rule_matcher = rule_matcher
+
+
+def _categorize_task(task, rule_matcher=None):
+    """
+    Categorize a (input file, output file, worksheet) `task` and return an
+    error message or None.
+    """
+    input_file, output_file, worksheet = task
+    try:
+        categorize_file(input_file, output_file, rule_matcher or _worker_rule_matcher, worksheet)
+    except SystemExit:
+        return 'Invalid input file'
+    except Exception as e:
+        return str(e) or repr(e)
+
+
+def categorize_file(input, output, rule_matcher, worksheet=None):
+    """
+    Categorize the rows of the `worksheet` (or active worksheet) of the .xlsx
+    file at `input` using the `rule_matcher` RuleMatcher and save the
+    resulting .xlsx at `output`. The input workbook is loaded only once.
+    """
+    input_wb = load_workbook(input)
+    if worksheet:
+        ws = input_wb[worksheet]
+    else:
+        ws = input_wb.active
+    worksheet_name = ws.title
+
+    # 'results' is a list of dictionaries, with each dictionary representing
+    # a row in the input .xlsx 'headers' is a list of the column names in the
+    # input .xlsx
+    results, headers = bom_utils.get_data_from_worksheet(ws)
+    validate_required_input_columns(headers)
+    processed_rows = process(results, rule_matcher)
+    create_output_bom(headers, processed_rows, input_wb,
+                      output, worksheet_name)
 
 
 def process(results, rules_list):
+    """
+    Return a list of rows mappings from a list of `results` rows mappings with
+    file-cat data applied using `rules_list`, a list of rules mappings or a
+    RuleMatcher.
+    """
     # 'resources' is a list of Resource objects representing a row in the
     # input .xlsx
     resources = [file_cat_resource.Resource.from_dict(
@@ -171,7 +250,7 @@ def create_output_bom(headers, processed_rows, input, output, worksheet_name):
     """
     Validate required input columns, add any missing columns required for
     file-cat data in output file, and write output file to 'output'
-    location.
+    location. 'input' is the input .xlsx location or its loaded Workbook.
     """
     # If the input file is missing any of the columns needed by the output
     # file for file-cat data, add them and apply defined order to all
@@ -195,7 +274,10 @@ def create_output_bom(headers, processed_rows, input, output, worksheet_name):
                 row.append("")
         output_data.append(row)
 
-    output_wb = load_workbook(input)
+    if isinstance(input, Workbook):
+        output_wb = input
+    else:
+        output_wb = load_workbook(input)
 
     # Get all worksheet names
     sheet_names = output_wb.sheetnames
@@ -210,56 +292,233 @@ def create_output_bom(headers, processed_rows, input, output, worksheet_name):
 def apply_categorize_rules_results(resources, rules_list):
     """
     Apply categorization and return the processed results
+
+    `rules_list` is a list of rule mappings or a RuleMatcher.
     """
+    if isinstance(rules_list, RuleMatcher):
+        rules = rules_list
+    else:
+        rules = RuleMatcher(rules_list)
+
     processed_resources = []
     for resource in resources:
-        for rule_dict in rules_list:
-            condition_list = rule_dict['condition'].split('\n')
-            rule_list = rule_dict['rule'].split('\n')
-            matched = False
-            classname = ''
-            order = ''
-            analysis_priority = ''
-            file_category = ''
-            file_subcategory = ''
-            for idx, condition in enumerate(condition_list):
-                rule_type = condition.partition(':')[0].strip()
-                rule = [r.strip()
-                        for r in rule_list[idx].partition(':')[2].split(",")]
-                rule_condition = condition.partition(':')[2].strip()
-                value = getattr(resource, rule_type)
-                if not validate_matching(value, rule_condition, rule):
-                    matched = False
-                    break
-                else:
-                    # Replace the file-cat data if the current rule's order
-                    # is smaller
-                    if hasattr(resource, 'order'):
-                        if resource.order > rule_dict['order']:
-                            classname = rule_dict['class']
-                            order = rule_dict['order']
-                            analysis_priority = rule_dict['analysis_priority']
-                            file_category = rule_dict['file_category']
-                            file_subcategory = rule_dict['file_subcategory']
-                            matched = True
-                    else:
-                        classname = rule_dict['class']
-                        order = rule_dict['order']
-                        analysis_priority = rule_dict['analysis_priority']
-                        file_category = rule_dict['file_category']
-                        file_subcategory = rule_dict['file_subcategory']
-                        matched = True
-            if matched:
-                resource.classname = classname
-                resource.order = order
-                resource.analysis_priority = analysis_priority
-                resource.file_category = file_category
-                resource.file_subcategory = file_subcategory
+        rule_dict = rules.match(resource)
+        if rule_dict:
+            resource.classname = rule_dict['class']
+            resource.order = rule_dict['order']
+            resource.analysis_priority = rule_dict['analysis_priority']
+            resource.file_category = rule_dict['file_category']
+            resource.file_subcategory = rule_dict['file_subcategory']
         processed_resources.append(resource)
 
     return processed_resources
 
 
+class RuleMatcher(object):
+    """
+    Match Resources against a list of file-cat rule mappings (from the
+    file_cat_rules.csv) compiled once in indexes by resource attribute.
+
+    The winning rule of a resource is the matching rule with the smallest
+    order, or the first one in the list for rules of equal order. Orders are
+    compared as strings.
+
+    Rules are sorted by order and the leading condition of each rule is
+    indexed by its resource attribute: only the rules whose leading condition
+    is satisfied are candidates and their other conditions are tested in order
+    until the first matching rule.
+    """
+
+    def __init__(self, rules_list):
+        # list of (rule mapping, [list of other Condition]) tuples sorted by
+        # order. sorted() is stable: rules of equal order keep their list order
+        self.rules = []
+        # {resource attribute: AttributeIndex} of the rules leading conditions
+        # where the condition ids are the rules positions in self.rules
+        self.indexes = {}
+        sorted_rules = sorted(rules_list, key=lambda rule_dict: rule_dict['order'])
+        for position, rule_dict in enumerate(sorted_rules):
+            leading, *conditions = get_rule_conditions(rule_dict)
+            index = self.indexes.get(leading.rule_type)
+            if index is None:
+                index = self.indexes[leading.rule_type] = AttributeIndex()
+            index.add(position, leading.rule_condition, leading.rules)
+            self.rules.append((rule_dict, conditions))
+
+        for index in self.indexes.values():
+            index.compile()
+
+    def get_candidates(self, resource):
+        """
+        Return a set of the positions of the rules whose leading condition is
+        satisfied by `resource`.
+        """
+        candidates = set()
+        for rule_type, index in self.indexes.items():
+            index.match(getattr(resource, rule_type), candidates)
+        return candidates
+
+    def match(self, resource):
+        """
+        Return the winning rule mapping for `resource` or None.
+        """
+        # {attribute: lowered value} computed at most once per resource
+        lowered_values = {}
+        for position in sorted(self.get_candidates(resource)):
+            rule_dict, conditions = self.rules[position]
+            if all(condition.matches(resource, lowered_values) for condition in conditions):
+                return rule_dict
+
+
+def get_rule_conditions(rule_dict):
+    """
+    Return a list of Condition from a file-cat `rule_dict` rule mapping.
+    """
+    condition_list = rule_dict['condition'].split('\n')
+    rule_list = rule_dict['rule'].split('\n')
+    conditions = []
+    for idx, condition in enumerate(condition_list):
+        rule_type = condition.partition(':')[0].strip()
+        rule = [r.strip()
+                for r in rule_list[idx].partition(':')[2].split(",")]
+        rule_condition = condition.partition(':')[2].strip()
+        conditions.append(Condition(rule_type, rule_condition, rule))
+    return conditions
+
+
+class Condition(object):
+    """
+    A rule condition on a resource attribute compiled once. This follows the
+    semantics of `validate_matching`.
+    """
+
+    def __init__(self, rule_type, rule_condition, rules):
+        self.rule_type = rule_type
+        self.rule_condition = rule_condition
+        self.rules = rules
+
+        if rule_condition in ('in', 'equal'):
+            self.values = frozenset(rules)
+        elif rule_condition in ('startswith', 'endswith'):
+            self.affixes = tuple(rule.lower() for rule in rules)
+        elif rule_condition == 'boolean':
+            self.expected = rules == ['True']
+        elif rule_condition != 'substring':
+            # Print the condition that the tool doesn't know what to do
+            print("NOT SUPPORTED CONDITION: " + rule_condition)
+
+    def matches(self, resource, lowered_values):
+        """
+        Return True if `resource` satisfies this condition. `lowered_values` is
+        a cache of {attribute: lowered value} for `resource`.
+        """
+        rule_condition = self.rule_condition
+        if rule_condition == 'boolean':
+            return bool(getattr(resource, self.rule_type)) == self.expected
+
+        value = lowered_values.get(self.rule_type)
+        if value is None:
+            value = lowered_values[self.rule_type] = getattr(resource, self.rule_type).lower()
+
+        if rule_condition in ('in', 'equal'):
+            return value in self.values
+        elif rule_condition == 'substring':
+            return any(rule in value for rule in self.rules)
+        elif rule_condition == 'startswith':
+            return value.startswith(self.affixes)
+        elif rule_condition == 'endswith':
+            return value.endswith(self.affixes)
+        return False
+
+
+class AttributeIndex(object):
+    """
+    An index of the rule conditions on a resource attribute, such that all the
+    conditions satisfied by an attribute value are found with a few lookups.
+    This follows the semantics of `validate_matching`.
+    """
+
+    def __init__(self):
+        # {value: [condition ids]} for "in" and "equal" conditions
+        self.values = defaultdict(list)
+        # {lowered prefix: [condition ids]} for "startswith" conditions
+        self.prefixes = defaultdict(list)
+        # {lowered suffix: [condition ids]} for "endswith" conditions
+        self.suffixes = defaultdict(list)
+        # {substring: [condition ids]} for "substring" conditions
+        self.substrings = defaultdict(list)
+        # list of (condition id, expected truth) for "boolean" conditions
+        self.booleans = []
+
+        self.prefix_lengths = []
+        self.suffix_lengths = []
+        self.substrings_regex = None
+
+    def add(self, condition_id, rule_condition, rules):
+        if rule_condition in ('in', 'equal'):
+            for rule in rules:
+                self.values[rule].append(condition_id)
+        elif rule_condition == 'substring':
+            for rule in rules:
+                self.substrings[rule].append(condition_id)
+        elif rule_condition == 'startswith':
+            for rule in rules:
+                self.prefixes[rule.lower()].append(condition_id)
+        elif rule_condition == 'endswith':
+            for rule in rules:
+                self.suffixes[rule.lower()].append(condition_id)
+        elif rule_condition == 'boolean':
+            self.booleans.append((condition_id, rules == ['True']))
+
+    def compile(self):
+        self.prefix_lengths = sorted(set(len(prefix) for prefix in self.prefixes))
+        self.suffix_lengths = sorted(set(len(suffix) for suffix in self.suffixes))
+        if self.substrings:
+            # a single regex scan tells if a value contains any substring
+            self.substrings_regex = re.compile(
+                '|'.join(re.escape(substring) for substring in self.substrings))
+        self.has_string_conditions = bool(
+            self.values or self.prefixes or self.suffixes or self.substrings)
+
+    def match(self, value, satisfied):
+        """
+        Add the ids of the conditions satisfied by `value` to the `satisfied`
+        set.
+        """
+        for condition_id, expected in self.booleans:
+            if bool(value) == expected:
+                satisfied.add(condition_id)
+
+        if not self.has_string_conditions:
+            return
+
+        value = value.lower()
+        length = len(value)
+
+        condition_ids = self.values.get(value)
+        if condition_ids:
+            satisfied.update(condition_ids)
+
+        for prefix_length in self.prefix_lengths:
+            if prefix_length > length:
+                break
+            condition_ids = self.prefixes.get(value[:prefix_length])
+            if condition_ids:
+                satisfied.update(condition_ids)
+
+        for suffix_length in self.suffix_lengths:
+            if suffix_length > length:
+                break
+            condition_ids = self.suffixes.get(value[length - suffix_length:])
+            if condition_ids:
+                satisfied.update(condition_ids)
+
+        if self.substrings_regex and self.substrings_regex.search(value):
+            for substring, condition_ids in self.substrings.items():
+                if substring in value:
+                    satisfied.update(condition_ids)
+
+
 def validate_matching(value, rule_condition, rules):
     """
     Check if value meet the rule's condition
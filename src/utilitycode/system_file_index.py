@@ -18,72 +18,301 @@
 
 from __future__ import absolute_import, print_function
 
+from array import array
 from collections import defaultdict
-
+from collections import deque
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from socketserver import ThreadingMixIn
+from socketserver import UnixStreamServer
 from tempfile import NamedTemporaryFile
+from tempfile import TemporaryDirectory
+from urllib.parse import urlparse
+import csv
+import functools
 import gzip
+import hashlib
+import heapq
+import http.client
+import itertools
+import json
+import mmap
 import os
-import pickle
+import posixpath
+import shutil
+import socket
+import struct
+import sys
+import uuid
 
 import click
 import requests
-import unicodecsv
 
 from commoncode.fileutils import create_dir
 
+from utilitycode.utils import to_posix
+
+
+VERSION = '0.0.3'
+
+DEFAULT_CONTENTS_URLS = [
+    'http://ftp.de.debian.org/debian/dists/Debian10.6/contrib/Contents-amd64.gz',
+    'http://ftp.de.debian.org/debian/dists/Debian10.6/main/Contents-amd64.gz',
+    'http://ftp.de.debian.org/debian/dists/Debian10.6/non-free/Contents-amd64.gz',
+]
+
+# Maximum number of (path, package) entries sorted in memory at once when
+# building an index. Larger inputs are sorted on disk in runs of this size.
+DEFAULT_SORT_BUFFER_SIZE = 1000000
 
-VERSION = '0.0.1'
+DEFAULT_SERVER_HOST = '127.0.0.1'
+DEFAULT_SERVER_PORT = 8765
+
+# Number of paths sent to an sfi server in each match query
+SERVER_BATCH_SIZE = 10000
+
+# Size in bytes of the output CSV write buffer
+CSV_BUFFER_SIZE = 1024 * 1024
+
+# Number of paths matched at once by a worker process
+MATCH_CHUNK_SIZE = 10000
 
 
 # TODO: make a smaller Content file for testing
 # TODO: use fetchcode
-# TODO: have options to make queries to index
 @click.command()
 @click.argument('location', type=click.Path(exists=True, readable=True))
 @click.argument('destination', type=click.Path(exists=False), required=True)
-@click.option('--reindex', is_flag=True, help='Recreate the system package files index before matching.')
+@click.option('--reindex', is_flag=True, help='Update the system package files index before matching. '
+                                              'Only new or changed Contents files are parsed again.')
 @click.option('--contents-file', multiple=True, help='Create index from a specified Contents-<arch>.gz file. '
                                                      'Multiple Contents files can be specified and they will be combined into a single index.')
+@click.option('--mirror-dir', type=click.Path(exists=True, file_okay=False, readable=True),
+              help='Create index from all the Contents-<arch>.gz files found in the dists/ '
+                   'directory of a local Debian or Ubuntu mirror.')
+@click.option('--suite', multiple=True, help='Only use the Contents files of this suite from --mirror-dir. '
+                                             'Can be repeated. Defaults to all suites.')
+@click.option('--arch', multiple=True, help='Only use the Contents files of this architecture from --mirror-dir. '
+                                            'Can be repeated. Defaults to all architectures.')
+@click.option('-n', '--processes', type=int, default=1, show_default=True,
+              help='Number of parallel processes used to parse Contents files when creating the index.')
 @click.option('--index-file', help='Specify an index file to use for matching. This option is only used for testing purposes.')
+@click.option('--sort-buffer-size', type=int, default=DEFAULT_SORT_BUFFER_SIZE, show_default=True,
+              help='Maximum number of path entries sorted in memory when creating the index. '
+                   'Larger inputs are sorted on disk in chunks of this size.')
+@click.option('--server', help='Match paths with a running sfi-serve server instead of loading the index. '
+                               'Use a http://<host>:<port> URL or unix:<socket path> for a Unix socket.')
+@click.option('--workers', type=int, default=1, show_default=True,
+              help='Number of parallel processes used to match paths with the local index.')
 @click.help_option('-h', '--help')
-def cli(location, destination, reindex=False, contents_file=[], index_file=''):
+def cli(location, destination, reindex=False, contents_file=[], mirror_dir=None, suite=(), arch=(),
+        processes=1, index_file='', sort_buffer_size=DEFAULT_SORT_BUFFER_SIZE, server=None, workers=1):
     """
     Match file paths to Linux system packages.
 
     LOCATION is the path to a CSV with one column named `Resource` that contains the paths to be matched.
 
     DESTINATION is the path where the match results are to be saved as CSV.
+    The input CSV columns are kept in the results.
     """
-    # Create or load index
-    index_directory = get_index_directory()
-    if index_file:
-        index_path = index_file
+    if server:
+        matcher = functools.partial(query_server, server)
     else:
-        index_path = os.path.join(index_directory, 'index-file')
+        # Create or load index
+        index_path = index_file or get_default_index_path()
+
+        contents_files = list(contents_file)
+        if mirror_dir:
+            contents_files.extend(find_contents_files(mirror_dir, suites=suite, archs=arch))
+            if not contents_files:
+                raise click.UsageError('No Contents files found in mirror directory: {}'.format(mirror_dir))
+
+        if reindex or contents_files or not os.path.exists(index_path):
+            create_index_file(
+                contents_files,
+                index_path,
+                sort_buffer_size=sort_buffer_size,
+                processes=processes,
+            )
+        if workers > 1:
+            matcher = functools.partial(
+                get_matches_by_path_in_parallel, index_path=index_path, workers=workers)
+        else:
+            packages_by_path = load_index(index_path)
+            matcher = functools.partial(get_matches_by_path, packages_by_path=packages_by_path)
+
+    match_csv(location, destination, matcher)
+
+
+def match_csv(location, destination, matcher):
+    """
+    Match the paths of the `Resource` column of the CSV at `location` and write
+    the input rows with their matches to a CSV at `destination`.
+
+    Rows are streamed from input to output: `matcher` is a callable accepting
+    an iterable of paths and yielding a list of Match for each path in order.
+    """
+    with open(location, newline='', encoding='utf-8') as inp, \
+            open(destination, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as out:
+        reader = csv.DictReader(inp)
+        input_fields = reader.fieldnames or []
+        if 'Resource' not in input_fields:
+            raise Exception('Input CSV does not have a Resource column')
+        fields = input_fields + [field for field in MATCH_FIELDS if field not in input_fields]
+        writer = csv.DictWriter(out, fields)
+        writer.writeheader()
+
+        # the matcher may read ahead a batch of paths: the rows are buffered
+        # by the tee until they are written
+        rows, path_rows = itertools.tee(reader)
+        paths = (get_resource_path(row) for row in path_rows)
+        for row, matches in zip(rows, matcher(paths)):
+            for match in matches:
+                result = dict(row)
+                result.update(match.to_dict())
+                writer.writerow(result)
+
+
+def get_resource_path(row):
+    path = row.get('Resource')
+    if not path:
+        raise Exception('Input CSV row does not have a Resource: {}'.format(row))
+    return path
+
+
+@click.command()
+@click.option('--index-file', help='Specify an index file to serve. Defaults to the index created by sfi.')
+@click.option('--host', default=DEFAULT_SERVER_HOST, show_default=True, help='Host to listen on.')
+@click.option('--port', type=int, default=DEFAULT_SERVER_PORT, show_default=True, help='TCP port to listen on.')
+@click.option('--socket', 'socket_path', type=click.Path(), help='Listen on a local Unix socket at this path instead of a TCP port.')
+@click.help_option('-h', '--help')
+def serve(index_file=None, host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT, socket_path=None):
+    """
+    Serve file paths to Linux system packages matches from a resident index.
+
+    Match queries are HTTP POST requests to /match with a JSON object body
+    {"paths": [list of paths]} and return a JSON object {"matches": [list of
+    matches for each path]}. Use `sfi --server` to match a CSV with a running
+    server.
+    """
+    index_path = index_file or get_default_index_path()
+    if not os.path.exists(index_path):
+        raise click.UsageError('Index file not found: {}. Create it first with sfi --reindex.'.format(index_path))
+
+    with load_index(index_path) as index:
+        server = make_server(index, host=host, port=port, socket_path=socket_path)
+        if socket_path:
+            click.echo('Serving index {} on unix:{}'.format(index_path, socket_path))
+        else:
+            click.echo('Serving index {} on http://{}:{}'.format(index_path, host, server.server_port))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+class MatchRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answer POST /match path match queries using the server index.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path != '/match':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            paths = json.loads(self.rfile.read(length))['paths']
+            if not isinstance(paths, list):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400, 'Expected a JSON object with a list of "paths"')
+            return
 
-    if reindex or contents_file or not os.path.exists(index_path):
-        packages_by_path = create_index(contents_file)
-        save_index(packages_by_path, index_path)
+        matches = [
+            [match.to_dict() for match in path_matches]
+            for path_matches in get_matches_by_path(paths, self.server.index)
+        ]
+        body = json.dumps(dict(matches=matches)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(index, host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT, socket_path=None):
+    """
+    Return a threaded HTTP server answering match queries from `index`, either
+    on a TCP `host` and `port` or on a Unix socket at `socket_path`.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, MatchRequestHandler)
     else:
-        packages_by_path = load_index(index_path)
+        server = ThreadingHTTPServer((host, port), MatchRequestHandler)
+    server.index = index
+    return server
 
-    # Collect paths to match on from `location`
-    paths = []
-    with open(location, 'rb') as f:
-        r = unicodecsv.DictReader(f)
-        for row in r:
-            path = row.get('Resource')
-            if not path:
-                raise Exception('Input CSV does not have a Resource column')
-            paths.append(path)
-
-    # Perform matching process and write results to `destination`
-    results = [match.to_dict() for match in get_matches(paths, packages_by_path)]
-    with open(destination, 'wb') as f:
-        w = unicodecsv.DictWriter(f, ('Resource', 'matched_suffix', 'matched_package'))
-        w.writeheader()
-        for match in results:
-            w.writerow(match)
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, socket_path):
+        super().__init__('localhost')
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def query_server(server, paths, batch_size=SERVER_BATCH_SIZE):
+    """
+    Yield a list of Match objects for each of the `paths` queried in batches
+    from a running sfi server at the `server` http://<host>:<port> URL or
+    unix:<socket path>.
+    """
+    if server.startswith('unix:'):
+        connection = UnixHTTPConnection(server[len('unix:'):])
+    else:
+        url = urlparse(server)
+        connection = http.client.HTTPConnection(url.hostname, url.port or DEFAULT_SERVER_PORT)
+
+    paths = iter(paths)
+    try:
+        while True:
+            batch = list(itertools.islice(paths, batch_size))
+            if not batch:
+                break
+            body = json.dumps(dict(paths=batch))
+            connection.request('POST', '/match', body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            data = response.read()
+            if response.status != 200:
+                raise Exception('sfi server error: {} {}'.format(response.status, response.reason))
+            for path_matches in json.loads(data)['matches']:
+                yield [Match.from_dict(match) for match in path_matches]
+    finally:
+        connection.close()
+
+
+def get_default_index_path():
+    return os.path.join(get_index_directory(), 'index-file')
 
 
 def get_index_directory():
@@ -96,15 +325,543 @@ def get_index_directory():
     return index_directory
 
 
+# The index file starts with a fixed header followed by these sections:
+#  - package string offsets: (package count + 1) uint64
+#  - path string offsets: (path count + 1) uint64
+#  - postings offsets: (path count + 1) uint64 into the package ids array
+#  - package ids: (postings count) uint32
+#  - package strings: UTF-8 blob of all unique packages, each encoded as the
+#    tab-separated fields of a Package
+#  - path strings: UTF-8 blob of all path keys, sorted by their UTF-8 bytes
+# A path key is the path with its segments in reverse order (see `path_key`) so
+# that all the paths ending with the same suffix are stored next to each other.
+# Numbers are stored in native byte order, recorded in the magic.
+INDEX_MAGIC = b'SFIDX03' + (b'L' if sys.byteorder == 'little' else b'B')
+INDEX_HEADER = struct.Struct('<8sQQQQQ')
+
+
 def load_index(index_path):
-    with open(index_path, 'rb') as f:
-        index = pickle.load(f)
-    return index
+    """
+    Return a memory-mapped MappedIndex for the index file at `index_path`.
+    """
+    return MappedIndex(index_path)
 
 
 def save_index(index, index_path):
-    with open(index_path, 'wb') as f:
-        pickle.dump(index, f)
+    """
+    Save the `index` mapping of {path: [list of packages]} as an index file at
+    `index_path` that can be loaded with `load_index`.
+    """
+    items = sorted((path_key(path).encode('utf-8'), pkgs) for path, pkgs in index.items() if pkgs)
+    with IndexWriter(index_path) as writer:
+        for key, packages in items:
+            writer.add(key, [encode_package(package) for package in packages])
+
+
+class IndexWriter(object):
+    """
+    Write an index file at `index_path` incrementally from path keys added in
+    sorted order.
+
+    The sections of the index are streamed to temporary files next to the
+    index and assembled when the writer is closed: only the interned package
+    names are kept in memory. The index is written to a temporary file first
+    and then moved in place, so processes that have the previous index mapped
+    keep a consistent view.
+    """
+
+    # number of array items buffered before they are flushed to disk
+    buffer_size = 65536
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.temp_dir = TemporaryDirectory(
+            prefix='sfi-', dir=os.path.dirname(os.path.abspath(index_path)))
+
+        self.package_ids = {}
+        self.packages = []
+        self.path_count = 0
+        self.last_key = None
+
+        self.path_offset = 0
+        self.path_offsets = array('Q', [0])
+        self.postings_offset = 0
+        self.postings_offsets = array('Q', [0])
+        self.postings = array('I')
+
+        self.files = {
+            name: open(os.path.join(self.temp_dir.name, name), 'wb')
+            for name in ('path_offsets', 'postings_offsets', 'postings', 'paths')
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, key, packages):
+        """
+        Add the list of `packages` encoded bytes for the path `key` bytes. Keys
+        must be added in strictly increasing order.
+        """
+        if self.last_key is not None and key <= self.last_key:
+            raise Exception('Index keys must be added in sorted order: {!r}'.format(key))
+        self.last_key = key
+
+        package_ids = self.package_ids
+        for package in packages:
+            package_id = package_ids.get(package)
+            if package_id is None:
+                package_id = package_ids[package] = len(self.packages)
+                self.packages.append(package)
+            self.postings.append(package_id)
+        self.postings_offset += len(packages)
+        self.postings_offsets.append(self.postings_offset)
+
+        self.files['paths'].write(key)
+        self.path_offset += len(key)
+        self.path_offsets.append(self.path_offset)
+        self.path_count += 1
+
+        if len(self.path_offsets) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        for name in ('path_offsets', 'postings_offsets', 'postings'):
+            buffered = getattr(self, name)
+            buffered.tofile(self.files[name])
+            del buffered[:]
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+        package_offsets = array('Q', [0])
+        for package in self.packages:
+            package_offsets.append(package_offsets[-1] + len(package))
+
+        header = INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            self.path_count,
+            len(self.packages),
+            self.postings_offset,
+            package_offsets[-1],
+            self.path_offset,
+        )
+
+        temp_path = os.path.join(self.temp_dir.name, 'index-file')
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            package_offsets.tofile(f)
+            for name in ('path_offsets', 'postings_offsets', 'postings'):
+                with open(os.path.join(self.temp_dir.name, name), 'rb') as section:
+                    shutil.copyfileobj(section, f)
+            for package in self.packages:
+                f.write(package)
+            with open(os.path.join(self.temp_dir.name, 'paths'), 'rb') as section:
+                shutil.copyfileobj(section, f)
+        os.replace(temp_path, self.index_path)
+        self.temp_dir.cleanup()
+
+    def abort(self):
+        for f in self.files.values():
+            f.close()
+        self.temp_dir.cleanup()
+
+
+def build_index(contents_files, index_path, has_header=False,
+                sort_buffer_size=DEFAULT_SORT_BUFFER_SIZE, processes=1):
+    """
+    Create or update an index file at `index_path` from a list of Debian
+    Contents files `contents_files` locations or ContentsFile, streaming
+    through the Contents files one line at a time.
+
+    Each Contents file is sorted in runs of at most `sort_buffer_size` entries
+    that are kept as shards next to the index and then merged. When
+    `processes` is more than one, the Contents files are decompressed and
+    sorted in parallel in that many worker processes.
+
+    The shards manifest records the checksum and mtime of each Contents file:
+    the shards of unchanged Contents files are reused as-is, only changed or
+    new Contents files are parsed again and the shards of Contents files that
+    are no longer used are removed.
+    """
+    contents_files = [
+        cf if isinstance(cf, ContentsFile) else get_contents_file_info(cf)
+        for cf in contents_files
+    ]
+    shards_dir = get_shards_dir(index_path)
+    create_dir(shards_dir)
+    previous_sources = {
+        source['source']: source
+        for source in load_manifest(shards_dir)
+    }
+
+    sources = []
+    tasks = []
+    for contents_file in contents_files:
+        source = get_source_info(contents_file, has_header, previous_sources, shards_dir)
+        sources.append(source)
+        if not source['runs']:
+            run_prefix = os.path.join(shards_dir, uuid.uuid4().hex)
+            tasks.append((source, (contents_file, has_header, sort_buffer_size, run_prefix)))
+
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            runs_by_task = list(executor.map(sort_contents_file, [task for _, task in tasks]))
+    else:
+        runs_by_task = [sort_contents_file(task) for _, task in tasks]
+    for (source, _), runs in zip(tasks, runs_by_task):
+        source['runs'] = [os.path.basename(run) for run in runs]
+
+    # runs are kept in the order of the Contents files and heapq.merge is
+    # stable: for a given path, packages are kept in that order.
+    runs = [os.path.join(shards_dir, run) for source in sources for run in source['runs']]
+    run_files = [open(run, 'rb') for run in runs]
+    try:
+        sorted_entries = heapq.merge(
+            *(iter_sorted_run(f) for f in run_files),
+            key=_entry_key)
+        write_entries(sorted_entries, index_path)
+    finally:
+        for f in run_files:
+            f.close()
+
+    save_manifest(sources, shards_dir)
+
+    # remove stale shards of changed or removed Contents files
+    used_runs = set(run for source in sources for run in source['runs'])
+    for name in os.listdir(shards_dir):
+        if name != MANIFEST_NAME and name not in used_runs:
+            os.remove(os.path.join(shards_dir, name))
+
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def get_shards_dir(index_path):
+    """
+    Return the directory where the sorted shards of the index file at
+    `index_path` are stored.
+    """
+    return index_path + '-shards'
+
+
+def load_manifest(shards_dir):
+    """
+    Return a list of source Contents files mappings from the manifest in
+    `shards_dir` or an empty list if there is no manifest for this version.
+    """
+    location = os.path.join(shards_dir, MANIFEST_NAME)
+    if not os.path.exists(location):
+        return []
+    with open(location) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != VERSION:
+        return []
+    return manifest.get('sources', [])
+
+
+def save_manifest(sources, shards_dir):
+    location = os.path.join(shards_dir, MANIFEST_NAME)
+    temp_location = location + '.tmp'
+    with open(temp_location, 'w') as f:
+        json.dump(dict(version=VERSION, sources=sources), f, indent=2)
+    os.replace(temp_location, location)
+
+
+def get_source_info(contents_file, has_header, previous_sources, shards_dir):
+    """
+    Return a manifest mapping for a `contents_file` ContentsFile. Its list of
+    "runs" is copied from `previous_sources` if the file has not changed since
+    it was last indexed, and empty otherwise.
+    """
+    source_key = contents_file.url or os.path.abspath(contents_file.location)
+    stat = os.stat(contents_file.location)
+    source = dict(
+        source=source_key,
+        suite=contents_file.suite,
+        area=contents_file.area,
+        arch=contents_file.arch,
+        has_header=has_header,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        sha256=None,
+        runs=[],
+    )
+
+    previous = previous_sources.get(source_key)
+    if not previous or any(
+        previous.get(key) != source[key]
+        for key in ('suite', 'area', 'arch', 'has_header', 'size')
+    ):
+        previous = None
+    elif not all(os.path.exists(os.path.join(shards_dir, run)) for run in previous['runs']):
+        previous = None
+
+    if previous and previous['mtime'] == source['mtime']:
+        source['sha256'] = previous['sha256']
+    else:
+        source['sha256'] = get_sha256(contents_file.location)
+
+    if previous and previous['sha256'] == source['sha256']:
+        source['runs'] = list(previous['runs'])
+    return source
+
+
+def get_sha256(location):
+    """
+    Return the SHA256 hex digest of the file at `location`.
+    """
+    sha256 = hashlib.sha256()
+    with open(location, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def sort_contents_file(task):
+    """
+    Parse a Contents file and write its (key, package) entries to sorted run
+    files of at most `sort_buffer_size` entries. Return a list of run file
+    locations. A Contents file without entries has a single empty run.
+
+    `task` is a tuple of (ContentsFile, has_header, sort_buffer_size, run
+    location prefix) such that this can be used with a process pool.
+    """
+    contents_file, has_header, sort_buffer_size, run_prefix = task
+    entries = iter_contents(
+        contents_file.location,
+        has_header=has_header,
+        suite=contents_file.suite,
+        arch=contents_file.arch,
+        area=contents_file.area,
+    )
+    runs = []
+    buffer = []
+    for path, package in entries:
+        buffer.append((path_key(path).encode('utf-8'), encode_package(package)))
+        if len(buffer) >= sort_buffer_size:
+            runs.append(write_sorted_run(buffer, '{}-{}'.format(run_prefix, len(runs))))
+            buffer = []
+    if buffer or not runs:
+        runs.append(write_sorted_run(buffer, '{}-{}'.format(run_prefix, len(runs))))
+    return runs
+
+
+def _entry_key(entry):
+    return entry[0]
+
+
+def write_sorted_run(entries, location):
+    """
+    Sort a list of (key, package) bytes `entries` and write them to a new run
+    file at `location`. Return the run file location.
+    """
+    entries.sort(key=_entry_key)
+    with open(location, 'wb') as f:
+        # Contents file paths and packages never contain NUL or newlines
+        f.writelines(key + b'\0' + package + b'\n' for key, package in entries)
+    return location
+
+
+def iter_sorted_run(run_file):
+    """
+    Yield (key, package) bytes entries from an opened sorted `run_file`.
+    """
+    for line in run_file:
+        key, _, package = line.rstrip(b'\n').partition(b'\0')
+        yield key, package
+
+
+def write_entries(sorted_entries, index_path):
+    """
+    Write an index file at `index_path` from an iterable of (key, package) bytes
+    entries sorted by key.
+    """
+    with IndexWriter(index_path) as writer:
+        for key, entries in itertools.groupby(sorted_entries, key=_entry_key):
+            writer.add(key, [package for _, package in entries])
+
+
+class MappedIndex(object):
+    """
+    A read-only mapping of {path: [list of packages]} backed by a memory-mapped
+    index file created with `save_index`.
+
+    Nothing is deserialized upfront: paths are found with a binary search over
+    the sorted path keys table and only the packages of matched paths are
+    decoded. Since the path keys are reversed paths, the sorted table is also
+    walked as a trie of reversed path segments in `longest_match`.
+    The file pages are shared through the OS page cache between all the
+    processes that map the same index file.
+    """
+
+    def __init__(self, location):
+        self.location = location
+        with open(location, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            (
+                magic,
+                path_count,
+                package_count,
+                postings_count,
+                packages_size,
+                paths_size,
+            ) = INDEX_HEADER.unpack_from(self._mmap)
+        except struct.error:
+            magic = None
+        if magic != INDEX_MAGIC:
+            self._mmap.close()
+            raise Exception(
+                'Invalid or incompatible index file: {}. '
+                'Use --reindex to recreate it.'.format(location))
+
+        self.path_count = path_count
+        self.package_count = package_count
+
+        view = memoryview(self._mmap)
+        start = INDEX_HEADER.size
+        end = start + (package_count + 1) * 8
+        self._package_offsets = view[start:end].cast('Q')
+        start, end = end, end + (path_count + 1) * 8
+        self._path_offsets = view[start:end].cast('Q')
+        start, end = end, end + (path_count + 1) * 8
+        self._postings_offsets = view[start:end].cast('Q')
+        start, end = end, end + postings_count * 4
+        self._postings = view[start:end].cast('I')
+        self._packages_start = end
+        self._paths_start = end + packages_size
+        view.release()
+
+    def close(self):
+        for view in (
+            self._package_offsets,
+            self._path_offsets,
+            self._postings_offsets,
+            self._postings,
+        ):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.path_count
+
+    def _get_path(self, position):
+        offsets = self._path_offsets
+        start = self._paths_start
+        return self._mmap[start + offsets[position]:start + offsets[position + 1]]
+
+    def _get_package(self, package_id):
+        offsets = self._package_offsets
+        start = self._packages_start
+        return decode_package(
+            self._mmap[start + offsets[package_id]:start + offsets[package_id + 1]])
+
+    def _get_packages(self, position):
+        postings = self._postings
+        start = self._postings_offsets[position]
+        end = self._postings_offsets[position + 1]
+        return [self._get_package(postings[i]) for i in range(start, end)]
+
+    def _bisect(self, key, low, high):
+        """
+        Return the position of the first path key that is greater than or equal
+        to the `key` bytes between the `low` and `high` positions.
+        """
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_path(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, path):
+        """
+        Return the position of `path` in the sorted path keys table or -1.
+        """
+        key = path_key(path).encode('utf-8')
+        position = self._bisect(key, 0, self.path_count)
+        if position < self.path_count and self._get_path(position) == key:
+            return position
+        return -1
+
+    def longest_match(self, path):
+        """
+        Return a LongestMatch for the longest suffix of `path` with two or more
+        segments that is in this index or None.
+        """
+        segments = path.strip('/').split('/')
+        low = 0
+        high = self.path_count
+        key = b''
+        match = None
+        for depth, segment in enumerate(reversed(segments), 1):
+            if depth == 1:
+                key = segment.encode('utf-8')
+            else:
+                key = key + b'/' + segment.encode('utf-8')
+                low = self._bisect(key, low, high)
+                if low < high and self._get_path(low) == key:
+                    match = depth, low
+            # narrow the range to the path keys under `key`: these all start
+            # with `key/` and sort before `key0` as "0" follows "/".
+            low = self._bisect(key + b'/', low, high)
+            high = self._bisect(key + b'0', low, high)
+            if low >= high:
+                break
+
+        if match:
+            depth, position = match
+            return LongestMatch(
+                suffix='/'.join(segments[-depth:]),
+                packages=self._get_packages(position),
+            )
+
+    def get(self, path, default=None):
+        position = self._find(path)
+        if position < 0:
+            return default
+        return self._get_packages(position)
+
+    def __getitem__(self, path):
+        position = self._find(path)
+        if position < 0:
+            raise KeyError(path)
+        return self._get_packages(position)
+
+    def __contains__(self, path):
+        return self._find(path) >= 0
+
+    def __iter__(self):
+        for position in range(self.path_count):
+            yield path_key(self._get_path(position).decode('utf-8'))
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        for position in range(self.path_count):
+            path = path_key(self._get_path(position).decode('utf-8'))
+            yield path, self._get_packages(position)
+
+    def values(self):
+        for position in range(self.path_count):
+            yield self._get_packages(position)
 
 
 def download_contents_file_from_url(contents_file_url):
@@ -119,18 +876,91 @@ def download_contents_file_from_url(contents_file_url):
     return contents_file_location
 
 
-def parse_contents(location, has_header=True):
+Package = namedtuple('Package', ['name', 'suite', 'arch', 'area', 'section'], defaults=('', '', '', ''))
+
+
+def encode_package(package):
     """
-    Return a mapping of {path: [list of packages]} and a mapping of
-    {package: [list of paths]} from parsing a Debian Contents file at
-    ``location``.
+    Return the bytes stored in an index for a Package or a package name.
+    """
+    if isinstance(package, str):
+        package = Package(package)
+    return '\t'.join(package).encode('utf-8')
+
+
+def decode_package(encoded):
+    """
+    Return a Package from bytes created with `encode_package`.
+    """
+    return Package(*encoded.decode('utf-8').split('\t'))
+
+
+# the url is set for a Contents file downloaded to a temporary location
+ContentsFile = namedtuple('ContentsFile', ['location', 'suite', 'area', 'arch', 'url'], defaults=('',))
+
+
+def get_contents_file_info(location):
+    """
+    Return a ContentsFile for a Contents file `location` path or URL, using the
+    Debian repository layout to collect its suite, area and architecture.
+
+    For example:
+    >>> get_contents_file_info('debian/dists/bookworm/main/Contents-amd64.gz')
+    ContentsFile(location='debian/dists/bookworm/main/Contents-amd64.gz', suite='bookworm', area='main', arch='amd64', url='')
+    >>> get_contents_file_info('ubuntu/dists/jammy/Contents-arm64.gz')
+    ContentsFile(location='ubuntu/dists/jammy/Contents-arm64.gz', suite='jammy', area='', arch='arm64', url='')
+    """
+    path = to_posix(location)
+    name = posixpath.basename(path)
+    arch = ''
+    if name.startswith('Contents-'):
+        arch = name[len('Contents-'):]
+        if arch.endswith('.gz'):
+            arch = arch[:-len('.gz')]
+
+    parent = posixpath.dirname(path)
+    grandparent = posixpath.dirname(parent)
+    suite = area = ''
+    if posixpath.basename(grandparent) == 'dists':
+        suite = posixpath.basename(parent)
+    elif posixpath.basename(posixpath.dirname(grandparent)) == 'dists':
+        suite = posixpath.basename(grandparent)
+        area = posixpath.basename(parent)
+    return ContentsFile(location, suite, area, arch)
+
+
+def find_contents_files(mirror_dir, suites=(), archs=()):
+    """
+    Return a sorted list of ContentsFile for all the Contents-<arch>.gz files
+    found under the `mirror_dir` Debian mirror directory, optionally limited to
+    a list of `suites` and `archs`.
+    """
+    contents_files = []
+    for top, _dirs, files in os.walk(mirror_dir):
+        for name in files:
+            if not (name.startswith('Contents-') and name.endswith('.gz')):
+                continue
+            contents_file = get_contents_file_info(os.path.join(top, name))
+            if suites and contents_file.suite not in suites:
+                continue
+            if archs and contents_file.arch not in archs:
+                continue
+            contents_files.append(contents_file)
+    return sorted(contents_files)
+
+
+def iter_contents(location, has_header=True, suite='', arch='', area=''):
+    """
+    Yield (path, Package) tuples from parsing a Debian Contents file at
+    ``location`` one line at a time.
     If ``has_header`` is True, the file is expected to have a header narrative
     and a FILE/LOCATION columns headers before the table starts in earnest.
     See https://wiki.debian.org/DebianRepository/Format#A.22Contents.22_indices
     for format details.
+    Packages are tagged with the ``suite``, ``arch`` and ``area`` of the
+    Contents file. The area and section of a qualified package name are used
+    when present.
     """
-    packages_by_path = defaultdict(list)
-    paths_by_package = defaultdict(list)
     with gzip.GzipFile(location) as lines:
         if has_header:
             # keep track if we are now in the table proper
@@ -163,20 +993,63 @@ def parse_contents(location, has_header=True):
                     # $SECTION the package section, and $NAME the name of the
                     # package."
 
-                    # NOTE: we ignore the arch and section for now
-                    archsec, _, package_name = archsec_name.rpartition('/')
-                    arch, _, section = archsec.rpartition('/')
-                    packages_by_path[path].append(package_name)
-                    paths_by_package[package_name].append(path)
+                    areasec, _, package_name = archsec_name.rpartition('/')
+                    package_area, _, section = areasec.rpartition('/')
+                    yield path, Package(
+                        name=package_name,
+                        suite=suite,
+                        arch=arch,
+                        area=package_area or area,
+                        section=section,
+                    )
 
     if not in_table:
         raise Exception('Invalid Content files without FILE/LOCATION header.')
+
+
+def parse_contents(location, has_header=True):
+    """
+    Return a mapping of {path: [list of packages]} and a mapping of
+    {package: [list of paths]} from parsing a Debian Contents file at
+    ``location``.
+    If ``has_header`` is True, the file is expected to have a header narrative
+    and a FILE/LOCATION columns headers before the table starts in earnest.
+    """
+    packages_by_path = defaultdict(list)
+    paths_by_package = defaultdict(list)
+    for path, package in iter_contents(location, has_header=has_header):
+        packages_by_path[path].append(package.name)
+        paths_by_package[package.name].append(path)
     return packages_by_path, paths_by_package
 
 
+def create_index_file(contents_files, index_path, sort_buffer_size=DEFAULT_SORT_BUFFER_SIZE, processes=1):
+    """
+    Create an index file at `index_path` from Debian Contents files.
+
+    If `contents_files` is not empty, then we create our index from the Contents
+    files locations or ContentsFile from `contents_files`. Otherwise the default
+    Debian Contents files are downloaded and used.
+    """
+    if contents_files:
+        build_index(contents_files, index_path, sort_buffer_size=sort_buffer_size, processes=processes)
+        return
+
+    downloaded = [
+        get_contents_file_info(url)._replace(location=download_contents_file_from_url(url), url=url)
+        for url in DEFAULT_CONTENTS_URLS
+    ]
+    try:
+        build_index(downloaded, index_path, sort_buffer_size=sort_buffer_size, processes=processes)
+    finally:
+        # Remove downloaded Contents files after we are done parsing them
+        for contents_file in downloaded:
+            os.remove(contents_file.location)
+
+
 def create_index(contents_files=[]):
     """
-    Return a dictionary of paths and their associated Package names that has
+    Return a PathTrie of paths and their associated Package names that has
     been created from Debian Contents files
 
     If `contents_files` is not empty, then we create our index from the Contents
@@ -184,68 +1057,246 @@ def create_index(contents_files=[]):
 
     TODO: have option to process Contents files with headers
     """
+    downloaded = []
     if contents_files:
-        indexes = []
-        for contents_file in contents_files:
-            index, _ = parse_contents(contents_file, has_header=False)
-            indexes.append(index)
+        contents_files = [
+            cf if isinstance(cf, ContentsFile) else get_contents_file_info(cf)
+            for cf in contents_files
+        ]
     else:
-        contrib_contents = download_contents_file_from_url('http://ftp.de.debian.org/debian/dists/Debian10.6/contrib/Contents-amd64.gz')
-        main_contents = download_contents_file_from_url('http://ftp.de.debian.org/debian/dists/Debian10.6/main/Contents-amd64.gz')
-        non_free_contents = download_contents_file_from_url('http://ftp.de.debian.org/debian/dists/Debian10.6/non-free/Contents-amd64.gz')
-
-        contrib_index, _ = parse_contents(contrib_contents, has_header=False)
-        main_index, _ = parse_contents(main_contents, has_header=False)
-        non_free_index, _ = parse_contents(non_free_contents, has_header=False)
+        downloaded = contents_files = [
+            get_contents_file_info(url)._replace(location=download_contents_file_from_url(url))
+            for url in DEFAULT_CONTENTS_URLS
+        ]
 
+    combined_index = PathTrie()
+    try:
+        for cf in contents_files:
+            entries = iter_contents(
+                cf.location,
+                has_header=False,
+                suite=cf.suite,
+                arch=cf.arch,
+                area=cf.area,
+            )
+            for path, package in entries:
+                combined_index.add(path, [package])
+    finally:
         # Remove downloaded Contents files after we are done parsing them
-        os.remove(contrib_contents)
-        os.remove(main_contents)
-        os.remove(non_free_contents)
-        indexes = [contrib_index, main_index, non_free_index]
-
-    # Combine the three packages_by_paths into one
-    combined_index = defaultdict(list)
-    for index in indexes:
-        for path, packages in index.items():
-            combined_index[path].extend(packages)
+        for contents_file in downloaded:
+            os.remove(contents_file.location)
 
     return combined_index
 
 
+LongestMatch = namedtuple('LongestMatch', ['suffix', 'packages'])
+
+
+class PathTrieNode(object):
+    __slots__ = ('children', 'packages')
+
+    def __init__(self):
+        self.children = {}
+        self.packages = []
+
+
+class PathTrie(object):
+    """
+    An in-memory mapping of {path: [list of packages]} stored as a trie of
+    reversed path segments, such that the longest known suffix of a path is
+    found in a single walk from its last segment.
+    """
+
+    def __init__(self, items=()):
+        self.root = PathTrieNode()
+        self.path_count = 0
+        for path, packages in items:
+            self.add(path, packages)
+
+    def add(self, path, packages):
+        """
+        Add the list of `packages` to `path`.
+        """
+        node = self.root
+        for segment in reversed(path.split('/')):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = PathTrieNode()
+            node = child
+        if not node.packages and packages:
+            self.path_count += 1
+        node.packages.extend(packages)
+
+    def __len__(self):
+        return self.path_count
+
+    def longest_match(self, path):
+        """
+        Return a LongestMatch for the longest suffix of `path` with two or more
+        segments that is in this trie or None.
+        """
+        segments = path.strip('/').split('/')
+        node = self.root
+        match = None
+        for depth, segment in enumerate(reversed(segments), 1):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if depth > 1 and node.packages:
+                match = depth, node
+
+        if match:
+            depth, node = match
+            return LongestMatch(
+                suffix='/'.join(segments[-depth:]),
+                packages=list(node.packages),
+            )
+
+    def items(self):
+        stack = [(self.root, [])]
+        while stack:
+            node, reversed_segments = stack.pop()
+            if node.packages:
+                yield '/'.join(reversed(reversed_segments)), list(node.packages)
+            for segment, child in node.children.items():
+                stack.append((child, reversed_segments + [segment]))
+
+    def values(self):
+        for _path, packages in self.items():
+            yield packages
+
+
+MATCH_FIELDS = (
+    'Resource',
+    'matched_suffix',
+    'matched_package',
+    'matched_suite',
+    'matched_arch',
+    'matched_area',
+    'matched_section',
+)
+
+
 class Match(object):
-    def __init__(self, path, matched_suffix='', matched_package=''):
+    def __init__(self, path, matched_suffix='', matched_package='',
+                 suite='', arch='', area='', section=''):
         self.path = path
         self.matched_suffix = matched_suffix
         self.matched_package = matched_package
+        self.suite = suite
+        self.arch = arch
+        self.area = area
+        self.section = section
+
+    @classmethod
+    def from_dict(cls, mapping):
+        return cls(
+            path=mapping['Resource'],
+            matched_suffix=mapping['matched_suffix'],
+            matched_package=mapping['matched_package'],
+            suite=mapping['matched_suite'],
+            arch=mapping['matched_arch'],
+            area=mapping['matched_area'],
+            section=mapping['matched_section'],
+        )
 
     def to_dict(self):
         return dict(
             Resource=self.path,
             matched_suffix=self.matched_suffix,
-            matched_package=self.matched_package
+            matched_package=self.matched_package,
+            matched_suite=self.suite,
+            matched_arch=self.arch,
+            matched_area=self.area,
+            matched_section=self.section,
         )
 
 
 def get_matches(paths, packages_by_path):
     """
     Yield a Match object, containing the matched path, matched suffix, and
-    package given a list of paths
+    package given a list of paths.
+
+    `packages_by_path` is a PathTrie or MappedIndex, or a plain mapping of
+    {path: [list of packages]} which is then loaded in a PathTrie first.
+    """
+    for matches in get_matches_by_path(paths, packages_by_path):
+        yield from matches
+
+
+def get_matches_by_path(paths, packages_by_path):
     """
+    Yield a list of Match objects for each path of a `paths` iterable, in the
+    same order. See `get_matches` for details.
+    """
+    if not hasattr(packages_by_path, 'longest_match'):
+        packages_by_path = PathTrie(packages_by_path.items())
+
     for path in paths:
-        path_is_matched = False
-        # iterate through suffixes until we find a match
-        for suffix in path_suffixes(path):
-            for package in packages_by_path[suffix]:
-                yield Match(path, suffix, package)
-                # We stop matching on a path if we have a match result
-                path_is_matched = True
-            if path_is_matched:
-                break
-        else:
-            # If we do not find a suffix that has a Package match and did not
-            # break out of the loop, return an empty Match object
-            yield Match(path)
+        match = packages_by_path.longest_match(path)
+        if not match:
+            # If we do not find a suffix that has a Package match, return an
+            # empty Match object
+            yield [Match(path)]
+            continue
+        matches = []
+        for package in match.packages:
+            if isinstance(package, str):
+                package = Package(package)
+            matches.append(Match(path, match.suffix, *package))
+        yield matches
+
+
+def get_matches_by_path_in_parallel(paths, index_path, workers, chunk_size=MATCH_CHUNK_SIZE):
+    """
+    Yield a list of Match objects for each path of a `paths` iterable, in the
+    same order, matching chunks of `chunk_size` paths in `workers` processes.
+
+    Each worker memory-maps the index file at `index_path` such that they all
+    share the same read-only index pages. At most two chunks per worker are
+    pending at any time, so `paths` is consumed lazily.
+    """
+    paths = iter(paths)
+    chunks = iter(lambda: list(itertools.islice(paths, chunk_size)), [])
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_match_worker,
+        initargs=(index_path,),
+    ) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_match_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+# the index of a match worker process
+_worker_index = None
+
+
+def _init_match_worker(index_path):
+    global _worker_index
+    _worker_index = load_index(index_path)
+
+
+def _match_chunk(paths):
+    return list(get_matches_by_path(paths, _worker_index))
+
+
+def path_key(path):
+    """
+    Return the index key of a `path`, which is the `path` with its segments in
+    reverse order. Applying `path_key` to a key returns the original path.
+
+    For example:
+    >>> path_key('usr/bin/busybox')
+    'busybox/bin/usr'
+    >>> path_key(path_key('usr/bin/busybox'))
+    'usr/bin/busybox'
+    """
+    return '/'.join(reversed(path.split('/')))
 
 
 def path_suffixes(path):
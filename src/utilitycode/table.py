@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  SPDX-License-Identifier: Apache-2.0
+# ============================================================================
+
+import sys
+
+# Values longer than this are not interned: they are rarely repeated
+MAX_INTERNED_LENGTH = 200
+
+# Value of the cells of a row without a column
+MISSING_VALUE = ''
+
+
+class Table(object):
+    """
+    A table of rows stored by column: an ordered list of header names and a
+    list of values for each column, with short string values interned so that
+    repeated values are stored once.
+
+    The headers are the union of the keys of all the rows, in the order they
+    are first seen, and a row without a column has an empty string value.
+    """
+    __slots__ = ('headers', 'columns', 'length', 'index')
+
+    def __init__(self, headers=(), columns=None, length=0):
+        self.headers = [intern_value(header) for header in headers]
+        if columns is None:
+            columns = [[MISSING_VALUE] * length for _ in self.headers]
+        assert len(columns) == len(self.headers)
+        self.columns = columns
+        self.length = length
+        # Map a header name to its column position
+        self.index = {header: pos for pos, header in enumerate(self.headers)}
+
+    @classmethod
+    def from_rows(cls, rows, headers=()):
+        """
+        Return a new Table from an iterable of dictionary `rows`, with the
+        `headers` columns first.
+        """
+        if isinstance(rows, Table):
+            return rows
+        table = cls(headers)
+        table.extend(rows)
+        return table
+
+    @classmethod
+    def concat(cls, tables):
+        """
+        Return a new Table with the rows of all the `tables`, using the union
+        of their headers.
+        """
+        result = cls()
+        for table in tables:
+            result.extend_table(table)
+        return result
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return 'Table(headers={!r}, length={!r})'.format(self.headers, self.length)
+
+    def add_column(self, header):
+        """
+        Add an empty `header` column if missing and return its position.
+        """
+        pos = self.index.get(header)
+        if pos is None:
+            pos = len(self.headers)
+            header = intern_value(header)
+            self.headers.append(header)
+            self.columns.append([MISSING_VALUE] * self.length)
+            self.index[header] = pos
+        return pos
+
+    def extend(self, rows):
+        """
+        Append an iterable of dictionary `rows`, adding the new keys as columns.
+        """
+        index = self.index
+        columns = self.columns
+        for row in rows:
+            for key, value in row.items():
+                pos = index.get(key)
+                if pos is None:
+                    pos = self.add_column(key)
+                columns[pos].append(intern_value(value))
+
+            self.length += 1
+            if len(row) != len(columns):
+                self._pad()
+
+    def extend_table(self, table):
+        """
+        Append the rows of another `table`, adding its new columns.
+        """
+        for header, column in zip(table.headers, table.columns):
+            pos = self.add_column(header)
+            self.columns[pos].extend(column)
+        self.length += table.length
+        self._pad()
+
+    def _pad(self):
+        """
+        Add a missing value to the columns shorter than the table.
+        """
+        length = self.length
+        for column in self.columns:
+            missing = length - len(column)
+            if missing:
+                column.extend([MISSING_VALUE] * missing)
+
+    def column(self, header):
+        """
+        Return the list of values of the `header` column.
+        """
+        return self.columns[self.index[header]]
+
+    def select(self, headers):
+        """
+        Return a new Table with only the `headers` columns, in this order.
+        The column values are shared and not copied.
+        """
+        headers = list(dict.fromkeys(headers))
+        columns = [self.column(header) for header in headers]
+        return Table(headers, columns, self.length)
+
+    def drop(self, headers):
+        """
+        Return a new Table without the `headers` columns.
+        The column values are shared and not copied.
+        """
+        kept = [header for header in self.headers if header not in headers]
+        return self.select(kept)
+
+    def iter_values(self):
+        """
+        Yield a tuple of values for each row, in the headers order.
+        """
+        if not self.columns:
+            for _ in range(self.length):
+                yield ()
+            return
+        for values in zip(*self.columns):
+            yield values
+
+    def iter_rows(self):
+        """
+        Yield a dictionary for each row.
+        """
+        headers = self.headers
+        for values in self.iter_values():
+            yield dict(zip(headers, values))
+
+
+def iter_row_values(rows, headers):
+    """
+    Yield a tuple of the `headers` values of each dictionary of the `rows`
+    iterable, using an empty string for a missing key.
+    """
+    for row in rows:
+        yield tuple([row.get(header, MISSING_VALUE) for header in headers])
+
+
+def intern_value(value, _intern=sys.intern):
+    """
+    Return an interned `value` if this is a short string or the value as-is.
+    """
+    if type(value) is str and len(value) <= MAX_INTERNED_LENGTH:
+        return _intern(value)
+    return value
@@ -16,6 +16,7 @@
 #  SPDX-License-Identifier: Apache-2.0
 # ============================================================================
 
+from copy import copy
 import json
 
 import click
@@ -24,9 +25,11 @@ from openpyxl import Workbook
 from openpyxl.styles import DEFAULT_FONT
 from openpyxl.styles import Alignment
 from openpyxl.styles import Font
+from openpyxl.styles import NamedStyle
 from openpyxl.styles import PatternFill
 from openpyxl.styles import borders
 from openpyxl.styles.borders import Border
+from openpyxl.utils import get_column_letter
 from packageurl import PackageURL
 
 vcids = []
@@ -72,16 +75,66 @@ def create_purl_vulns(purls, token):
     return purl_vulns
 
 
+HEADER_STYLE = "VCIO Header"
+CONTENT_STYLE = "VCIO Content"
+
+
+def add_cell_styles(wb):
+    """
+    Register the named styles of the header and content cells in the `wb`
+    workbook. Each cell is styled once when written, instead of walking every
+    cell of the worksheets again before saving.
+    """
+    border = borders.Side(
+        style=None, color="FF000000", border_style="thin")
+    thin = Border(left=border, right=border, bottom=border, top=border)
+    alignment = Alignment(
+        wrapText=True, horizontal="left", vertical="center")
+
+    header_style = NamedStyle(name=HEADER_STYLE)
+    header_style.font = Font(name="Calibri", size=10, bold=True, italic=False)
+    header_style.fill = PatternFill(
+        start_color="CCE6FF",
+        end_color="CCE6FF",
+        fill_type="solid",
+    )
+    header_style.border = thin
+    header_style.alignment = alignment
+    wb.add_named_style(header_style)
+
+    content_style = NamedStyle(name=CONTENT_STYLE)
+    content_style.font = copy(DEFAULT_FONT)
+    content_style.border = thin
+    content_style.alignment = alignment
+    wb.add_named_style(content_style)
+
+
+def write_cell(ws, row, column, value):
+    """
+    Write `value` to the cell at `row` and `column` of the `ws` worksheet with
+    the header style for the first row or the content style otherwise.
+    """
+    cell = ws.cell(row=row, column=column, value=value)
+    if row == 1:
+        cell.style = HEADER_STYLE
+    else:
+        cell.style = CONTENT_STYLE
+    return cell
+
+
 def create_xlsx(purl_vulns, destination):
     """
     Generate a .xlsx from the data gathered from the '/api/packages/bulk_lookup' endpoint.
     """
+    # We handle the header row in more detail below using a named style.
+    DEFAULT_FONT.size = 10
     wb_bulk_lookup = Workbook()
+    add_cell_styles(wb_bulk_lookup)
     wb_bulk_lookup_sheetnames = ["VCID_CPE", "VULN_PACKAGES", "VULN_FIXES"]
     for sheet_name in wb_bulk_lookup_sheetnames:
         ws = wb_bulk_lookup.create_sheet(sheet_name)
         ws.freeze_panes = "A2"
-        ws.append([f"This is {ws.title}"])
+        write_cell(ws, row=1, column=1, value=f"This is {ws.title}")
 
     # Populate the .xlsx sheets.
     if purl_vulns:
@@ -136,7 +189,7 @@ def create_xlsx(purl_vulns, destination):
                     cpe_col = 1
                     header = ["VCID", "CPE"]
                     for h in header:
-                        ws.cell(row=cpe_row, column=cpe_col).value = h
+                        write_cell(ws, row=cpe_row, column=cpe_col, value=h)
                         cpe_col += 1
                     for vuln in result.get('vuln_details').get("affected_by_vulnerabilities"):
                         vuln_id = vuln.get("vulnerability_id")
@@ -147,12 +200,14 @@ def create_xlsx(purl_vulns, destination):
                             for ref in vuln.get("references"):
                                 if ref.get("reference_id").startswith("cpe:"):
                                     newRowLocation = ws.max_row + 1
-                                    ws.cell(
+                                    write_cell(
+                                        ws,
                                         column=1,
                                         row=newRowLocation,
                                         value=vuln_id,
                                     )
-                                    ws.cell(
+                                    write_cell(
+                                        ws,
                                         column=2,
                                         row=newRowLocation,
                                         value=ref.get("reference_id"),
@@ -175,7 +230,7 @@ def create_xlsx(purl_vulns, destination):
                         "Description",
                     ]
                     for h in header:
-                        ws.cell(row=count, column=col).value = h
+                        write_cell(ws, row=count, column=col, value=h)
                         col += 1
                     purl_id = result.get('vuln_details').get("purl")
                     # Get the non-vuln Packages for this PURL -- 1 time only for each PURL,
@@ -205,7 +260,8 @@ def create_xlsx(purl_vulns, destination):
                                 next_and_latest_non_vuln_fixes)
                             for ref in vuln.get("references"):
                                 newRowLocation = ws.max_row + 1
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=1,
                                     row=newRowLocation,
                                     value=purl_id,
@@ -213,21 +269,24 @@ def create_xlsx(purl_vulns, destination):
                                 # column 2 = 'Present in VCIO'
                                 package_id = result.get('vuln_details').get(
                                     "url").split("/")[-1]
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=2,
                                     row=newRowLocation,
                                     value=package_id,
                                 )
                                 # column 3 = 'Package Type'
                                 package_type = true_purl.type
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=3,
                                     row=newRowLocation,
                                     value=package_type,
                                 )
                                 # column 4 = 'VCID'
                                 vuln_id = vuln["vulnerability_id"]
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=4,
                                     row=newRowLocation,
                                     value=vuln_id,
@@ -292,19 +351,22 @@ def create_xlsx(purl_vulns, destination):
                                 else:
                                     vuln_alias = ""
                                 # column 5 = 'VulnID (alias)'
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=5,
                                     row=newRowLocation,
                                     value=vuln_alias,
                                 )
                                 # column 6 = "Immediate Fix"
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=6,
                                     row=newRowLocation,
                                     value="\n".join(immediate_fixes),
                                 )
                                 # column 7 = "Non_vulnerable Fix"
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=7,
                                     row=newRowLocation,
                                     value="\n".join(
@@ -341,13 +403,15 @@ def create_xlsx(purl_vulns, destination):
                                     vuln_severity = "NA"
                                     vuln_scoring_system = "NA"
                                 # column 8 = "Severity"
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=8,
                                     row=newRowLocation,
                                     value=vuln_severity,
                                 )
                                 # column 9 = "Scoring System"
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=9,
                                     row=newRowLocation,
                                     value=vuln_scoring_system,
@@ -360,20 +424,23 @@ def create_xlsx(purl_vulns, destination):
                                     vuln_origin = "GHSA"
                                 else:
                                     vuln_origin = "Other"
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=10,
                                     row=newRowLocation,
                                     value=vuln_origin,
                                 )
                                 # column 11 = 'VulnID URL' (was column 10)
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=11,
                                     row=newRowLocation,
                                     value=ref.get("reference_url"),
                                 )
                                 # column 12 = 'Description' (was column 11)
                                 vuln_summary = vuln["summary"]
-                                ws.cell(
+                                write_cell(
+                                    ws,
                                     column=12,
                                     row=newRowLocation,
                                     value=vuln_summary,
@@ -390,7 +457,7 @@ def create_xlsx(purl_vulns, destination):
                         "Description",
                     ]
                     for h in header:
-                        ws.cell(row=count, column=col).value = h
+                        write_cell(ws, row=count, column=col, value=h)
                         col += 1
 
                     if result.get("vuln_details").get("affected_by_vulnerabilities"):
@@ -403,33 +470,38 @@ def create_xlsx(purl_vulns, destination):
 
                             newRowLocation = ws.max_row + 1
                             # column 1 = 'Package (PURL)'
-                            ws.cell(
+                            write_cell(
+                                ws,
                                 column=1,
                                 row=newRowLocation,
                                 value=purl_id,
                             )
                             # column 2 = 'Package Type'
                             package_type = true_purl.type
-                            ws.cell(
+                            write_cell(
+                                ws,
                                 column=2,
                                 row=newRowLocation,
                                 value=package_type,
                             )
                             # column 3 = 'VCID'
                             vuln_id = vuln["vulnerability_id"]
-                            ws.cell(
+                            write_cell(
+                                ws,
                                 column=3,
                                 row=newRowLocation,
                                 value=vuln_id,
                             )
                             # column 4 = "Immediate Fix"
-                            ws.cell(
+                            write_cell(
+                                ws,
                                 column=4,
                                 row=newRowLocation,
                                 value="\n".join(immediate_fixes),
                             )
                             # column 5 = "Non_vulnerable Fix"
-                            ws.cell(
+                            write_cell(
+                                ws,
                                 column=5,
                                 row=newRowLocation,
                                 value="\n".join(
@@ -438,7 +510,8 @@ def create_xlsx(purl_vulns, destination):
                             )
                             # column 6 = 'Description'
                             vuln_summary = vuln["summary"]
-                            ws.cell(
+                            write_cell(
+                                ws,
                                 column=6,
                                 row=newRowLocation,
                                 value=vuln_summary,
@@ -446,15 +519,12 @@ def create_xlsx(purl_vulns, destination):
 
     sh = wb_bulk_lookup["Sheet"]
     wb_bulk_lookup.remove(sh)
-    # We handle the header row in more detail below using cell.font = font.
-    DEFAULT_FONT.size = 10
     for ws in wb_bulk_lookup.worksheets:
         # Get the maximum number of columns in the worksheet.
         max_columns = ws.max_column
         # Iterate over the columns and set a default width.
         for column in range(1, max_columns + 1):
-            ws.column_dimensions[ws.cell(
-                row=1, column=column).column_letter].width = 25
+            ws.column_dimensions[get_column_letter(column)].width = 25
         # Set individual column widths as needed.
         if ws.title == "VCID_CPE":
             ws.column_dimensions["B"].width = 42
@@ -478,24 +548,6 @@ def create_xlsx(purl_vulns, destination):
             ws.column_dimensions["D"].width = 50
             ws.column_dimensions["E"].width = 50
             ws.column_dimensions["F"].width = 75
-        font = Font(name="Calibri", size=10, bold=True, italic=False)
-        for rows in ws.iter_rows(min_row=1, max_row=1, min_col=None):
-            for cell in rows:
-                cell.fill = PatternFill(
-                    start_color="CCE6FF",
-                    end_color="CCE6FF",
-                    fill_type="solid",
-                )
-                cell.font = font
-        border = borders.Side(
-            style=None, color="FF000000", border_style="thin")
-        thin = Border(left=border, right=border, bottom=border, top=border)
-        alignment = Alignment(
-            wrapText=True, horizontal="left", vertical="center")
-        for row in ws.iter_rows(min_row=None, min_col=None, max_row=None, max_col=None):
-            for cell in row:
-                cell.border = thin
-                cell.alignment = alignment
 
     wb_bulk_lookup.save(destination)
 
@@ -22,6 +22,8 @@ import unicodecsv
 
 from spreadsheet_toolkit import column_match
 from spreadsheet_toolkit.csv_utils import read_csv_rows
+from spreadsheet_toolkit.csv_utils import read_input
+from utilitycode.bom_utils import write_to_jsonl
 
 
 def load_csv(location):
@@ -210,6 +212,31 @@ class TestColumnMatch(FileBasedTesting):
         }
         self.assertEqual(results, expected_results)
 
+    def test_segment_trie(self):
+        paths = [
+            ('index.js', 'lib', 'foo'),
+            ('index.js',),
+            ('index.js', 'lib', 'bar'),
+            ('index.js', 'src', 'foo'),
+        ]
+        trie = column_match.SegmentTrie(paths)
+        split_path = ('index.js', 'lib', 'foo', 'node_modules')
+        assert trie.best_matches(split_path) == (3, [paths[0]])
+        assert trie.best_matches(('index.js', 'lib')) == (2, [paths[0], paths[2]])
+        assert trie.best_matches(('index.js', 'test')) == (1, paths)
+        expected = [(3, paths[0]), (1, paths[1]), (2, paths[2]), (1, paths[3])]
+        assert trie.scored_matches(split_path) == expected
+
+    def test_get_matching_segments_count(self):
+        count = column_match.get_matching_segments_count
+        path = ('node_modules', 'foo', 'lib', 'index.js')
+        assert count(path, path) == 4
+        assert count(path, ('foo', 'lib', 'index.js')) == 3
+        assert count(path, ('bar', 'lib', 'index.js')) == 2
+        assert count(path, ('lib', 'foo', 'index.js')) == 2
+        assert count(path, ('src',)) == 0
+        assert count((), path) == 0
+
     def test_generate_headers(self):
         headers = column_match.generate_headers(self.headers1, self.headers2, self.key2)
         expected_headers = [
@@ -453,3 +480,76 @@ class TestColumnMatch(FileBasedTesting):
         expected = read_csv_rows(expected_csv)
         assert list(output) == list(expected)
         #check_csvs(output_csv, expected_csv, regen=False)
+
+    def test_column_match_end_to_end_with_jobs(self):
+        test_csv = self.get_test_loc("column_match/input_1.csv")
+        test_csv_2 = self.get_test_loc("column_match/input_2.csv")
+        output_csv = self.get_temp_file("out.csv")
+        expected_csv = self.get_test_loc("column_match/expected.csv")
+        options = [
+            "-k1",
+            "dwarf_source_path",
+            "-k2",
+            "Resource",
+            "--jobs",
+            "2",
+            test_csv,
+            test_csv_2,
+            output_csv,
+            "--csv"
+        ]
+        runner = CliRunner()
+        _ = runner.invoke(column_match.cli, options, catch_exceptions=False)
+        output = read_csv_rows(output_csv)
+        expected = read_csv_rows(expected_csv)
+        assert list(output) == list(expected)
+
+    def test_column_match_end_to_end_external(self):
+        test_csv = self.get_test_loc("column_match/input_1.csv")
+        test_csv_2 = self.get_test_loc("column_match/input_2.csv")
+        output_csv = self.get_temp_file("out.csv")
+        expected_csv = self.get_test_loc("column_match/expected.csv")
+        options = [
+            "-k1",
+            "dwarf_source_path",
+            "-k2",
+            "Resource",
+            "--external",
+            "--sort_buffer_size",
+            "2",
+            test_csv,
+            test_csv_2,
+            output_csv,
+            "--csv"
+        ]
+        runner = CliRunner()
+        _ = runner.invoke(column_match.cli, options, catch_exceptions=False)
+        output = read_csv_rows(output_csv)
+        expected = read_csv_rows(expected_csv)
+        assert list(output) == list(expected)
+
+    def test_column_match_end_to_end_jsonl(self):
+        test_csv = self.get_test_loc("column_match/input_1.csv")
+        test_csv_2 = self.get_test_loc("column_match/input_2.csv")
+        test_jsonl = self.get_temp_file("input_1.jsonl")
+        write_to_jsonl(read_csv_rows(test_csv), test_jsonl)
+        output_jsonl = self.get_temp_file("out.jsonl")
+        expected_csv = self.get_test_loc("column_match/expected.csv")
+        options = [
+            "-k1",
+            "dwarf_source_path",
+            "-k2",
+            "Resource",
+            test_jsonl,
+            test_csv_2,
+            output_jsonl,
+            "--jsonl"
+        ]
+        runner = CliRunner()
+        _ = runner.invoke(column_match.cli, options, catch_exceptions=False)
+        output, headers = read_input(output_jsonl)
+        expected = list(read_csv_rows(expected_csv))
+        # The JSON Lines output keeps the numeric values types
+        output = [{k: str(v) for k, v in row.items()} for row in output]
+        assert output == expected
+        assert headers == list(expected[0])
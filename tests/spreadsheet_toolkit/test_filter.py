@@ -202,3 +202,49 @@ def test_and_equals_filtering():
     assert result2 == None
     result3 = filter.equals_filtering(input3, equals_condition)
     assert result3 == None
+
+
+def test_filter_rows():
+    rows = [{'license': 'mit', 'Resource': '/project/a.c', 'type': 'file'},
+            {'license': 'gpl', 'Resource': '/project/a.h', 'type': 'file'},
+            {'license': '', 'Resource': '/project/test/b.c', 'type': 'file'},
+            {'license': 'mit', 'Resource': '/project/', 'type': 'directory'}]
+    conditions = filter.get_filter_conditions(
+        include=['license=mit or license=gpl.*'],
+        exclude=['Resource=/test/'],
+        endswith=['Resource=.c or Resource=.h'],
+        equals=['type=file'])
+    result = list(filter.filter_rows(rows, conditions))
+    assert result == [rows[0]]
+
+
+def test_filter_rows_include_key_without_value_keeps_row():
+    rows = [{'license': 'mit', 'notes': ''},
+            {'license': '', 'notes': 'a'},
+            {'license': '', 'notes': ''}]
+    # A row with a value for a key without values is kept right away
+    conditions = filter.get_filter_conditions(include=['license or notes=a', 'notes=b'])
+    result = list(filter.filter_rows(rows, conditions))
+    assert result == [rows[0]]
+    for row in rows:
+        kept = filter.include_filtering(row, conditions[0][1])
+        assert (row in result) == bool(kept)
+
+
+def test_filter_rows_exact_matches_only_string_cells():
+    # Numeric and boolean cell values of XLSX, JSON Lines or Parquet inputs
+    rows = [{'size': 1, 'type': True},
+            {'size': '1', 'type': 'True'},
+            {'size': 10, 'type': ''}]
+    conditions = filter.get_filter_conditions(equals=['size=1'])
+    assert list(filter.filter_rows(rows, conditions)) == [rows[1]]
+    conditions = filter.get_filter_conditions(exclude_exact=['type=True'])
+    assert list(filter.filter_rows(rows, conditions)) == [rows[0], rows[2]]
+    for row in rows:
+        assert bool(filter.equals_filtering(row, [{'size': ['1']}])) == (row is rows[1])
+
+    # The substring and prefix tests use the text of the non-string cells
+    conditions = filter.get_filter_conditions(include=['size=1'])
+    assert list(filter.filter_rows(rows, conditions)) == rows
+    conditions = filter.get_filter_conditions(startswith=['size=1'])
+    assert list(filter.filter_rows(rows, conditions)) == rows
@@ -14,6 +14,10 @@
 # ============================================================================
 
 from __future__ import absolute_import, print_function
+import copy
+
+from click.testing import CliRunner
+
 from spreadsheet_toolkit import flatten
 
 
@@ -28,3 +32,90 @@ def test_flattening():
     expected = [{'Resource': '/tmp/test.c', 'name': 'test.c', 'license_expression': 'mit\napache-2.0', 'type': 'file'},
                 {'Resource': '/tmp/test.h', 'name': '', 'license_expression': 'public-domain', 'type': 'file'}]
     assert result == expected
+
+
+def test_flattening_merges_lines_once():
+    input = [{'Resource': '/tmp/test.c', 'license_expression': 'mit\ngpl'},
+             {'Resource': '/tmp/test.c', 'license_expression': 'gpl\napache-2.0'},
+             {'Resource': '/tmp/test.c', 'license_expression': 'mit'}]
+    headers = ['Resource', 'license_expression']
+    result = flatten.flattening(headers, input, 'Resource')
+    expected = [{'Resource': '/tmp/test.c', 'license_expression': 'mit\ngpl\napache-2.0'}]
+    assert result == expected
+
+
+def test_iter_flattened_sorted():
+    input = [{'Resource': '/tmp/test.c', 'name': '', 'license_expression': 'mit', 'type': 'file'},
+             {'Resource': '/tmp/test.c', 'name': 'test.c', 'license_expression': 'apache-2.0', 'type': 'file'},
+             {'Resource': '/tmp/test.h', 'name': '',
+                 'license_expression': 'public-domain', 'type': 'file'}]
+    headers = ['Resource', 'name', 'license_expression', 'type']
+    result = list(flatten.iter_flattened_sorted(headers, input, 'Resource'))
+    expected = [{'Resource': '/tmp/test.c', 'name': 'test.c', 'license_expression': 'mit\napache-2.0', 'type': 'file'},
+                {'Resource': '/tmp/test.h', 'name': '', 'license_expression': 'public-domain', 'type': 'file'}]
+    assert result == expected
+
+
+def test_iter_flattened_sorted_with_unsorted_input():
+    import pytest
+    input = [{'Resource': '/tmp/test.h'}, {'Resource': '/tmp/test.c'}, {'Resource': '/tmp/test.h'}]
+    with pytest.raises(flatten.UnsortedInputError):
+        list(flatten.iter_flattened_sorted(['Resource'], input, 'Resource'))
+
+
+def test_iter_flattened_sorted_with_input_sorted_in_any_order():
+    input = [{'id': '9', 'name': 'a'},
+             {'id': '10', 'name': 'b'},
+             {'id': '10', 'name': 'c'},
+             {'id': 'B', 'name': 'd'},
+             {'id': 'a', 'name': 'e'}]
+    result = list(flatten.iter_flattened_sorted(['id', 'name'], input, 'id'))
+    expected = [{'id': '9', 'name': 'a'},
+                {'id': '10', 'name': 'b\nc'},
+                {'id': 'B', 'name': 'd'},
+                {'id': 'a', 'name': 'e'}]
+    assert result == expected
+
+
+def test_flattening_groups_equal_key_values():
+    input = [{'id': 1, 'name': 'a'},
+             {'id': '1', 'name': 'b'},
+             {'id': 1.0, 'name': 'c'},
+             {'id': ['x'], 'name': 'd'},
+             {'id': ['x'], 'name': 'e'}]
+    headers = ['id', 'name']
+    expected = [{'id': '1\n1.0', 'name': 'a\nc'},
+                {'id': '1', 'name': 'b'},
+                {'id': ['x'], 'name': 'd\ne'}]
+    assert flatten.flattening(headers, copy.deepcopy(input), 'id') == expected
+
+    sorted_input = [input[0], input[2], input[1], input[3], input[4]]
+    result = list(flatten.iter_flattened_sorted(headers, sorted_input, 'id'))
+    assert result == expected
+
+
+def test_flatten_cli_with_unsorted_input_does_not_leave_output(tmp_path):
+    input = tmp_path / 'input.csv'
+    input.write_text('Resource,name\n/tmp/b,b\n/tmp/b,c\n/tmp/c,c\n/tmp/b,a\n')
+    output = str(tmp_path / 'output.csv')
+    runner = CliRunner()
+    result = runner.invoke(
+        flatten.cli, ['--csv', '--sorted_input', '-k', 'Resource', str(input), output])
+    assert result.exit_code != 0
+    assert 'not sorted' in result.output
+    assert not (tmp_path / 'output.csv').exists()
+
+
+def test_flatten_cli_does_not_catch_output_errors(tmp_path, monkeypatch):
+    input = tmp_path / 'input.csv'
+    input.write_text('Resource,name\n/tmp/b,b\n')
+    output = str(tmp_path / 'output.csv')
+
+    def write_output(*args, **kwargs):
+        raise ValueError('output error')
+
+    monkeypatch.setattr(flatten, 'write_output', write_output)
+    result = CliRunner().invoke(
+        flatten.cli, ['--csv', '--sorted_input', '-k', 'Resource', str(input), output])
+    assert isinstance(result.exception, ValueError)
+    assert not isinstance(result.exception, flatten.UnsortedInputError)
@@ -14,7 +14,10 @@
 # ============================================================================
 
 from __future__ import absolute_import, print_function
+from click.testing import CliRunner
+
 from spreadsheet_toolkit import keep_column
+from spreadsheet_toolkit.csv_utils import read_csv_rows
 
 
 def test_get_column_names():
@@ -35,3 +38,18 @@ def test_get_multi_column_names():
     expected = [{'Resource': '/tmp/test.c', 'license_expression': 'mit'},
                 {'Resource': '/tmp/test.h', 'license_expression': 'public-domain'}]
     assert result == expected
+
+
+def test_keep_column_with_headers_only():
+    result = keep_column.keep_column([], ['Resource'], headers=['Resource', 'type'])
+    assert result == []
+
+
+def test_keep_column_cli_with_headers_only_input(tmp_path):
+    input = tmp_path / 'input.csv'
+    input.write_text('a,b\n')
+    output = str(tmp_path / 'output.csv')
+    result = CliRunner().invoke(
+        keep_column.cli, ['--csv', '-k', 'a', str(input), output], catch_exceptions=False)
+    assert result.exit_code == 0
+    assert list(read_csv_rows(output)) == []
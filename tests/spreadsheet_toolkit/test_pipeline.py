@@ -0,0 +1,112 @@
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  SPDX-License-Identifier: Apache-2.0
+# ============================================================================
+
+from __future__ import absolute_import, print_function
+
+import click
+from click.testing import CliRunner
+import pytest
+
+from spreadsheet_toolkit import pipeline
+from spreadsheet_toolkit.csv_utils import read_csv_rows
+
+from testing_utils import get_test_loc
+
+
+def test_run_pipeline_streams_steps():
+    test_input = [get_test_loc('concat/sample1.csv'), get_test_loc('concat/sample2.csv')]
+    steps = [
+        {'filter': {'include': 'Resource=test'}},
+        {'keep_column': {'key': 'Resource,license_expression'}},
+        {'add_column_prefix': {'key': 'x_'}},
+    ]
+    rows, headers = pipeline.run_pipeline(test_input, steps)
+    assert headers == ['x_Resource', 'x_license_expression']
+    expected = [{'x_Resource': '/tmp/test.c', 'x_license_expression': 'mit'}]
+    assert list(rows) == expected
+
+
+def test_concat_rows_uses_the_union_of_headers():
+    inputs = [
+        (iter([{'Resource': '/a', 'type': 'file'}]), ['Resource', 'type']),
+        (iter([{'Resource': '/b', 'license': 'mit'}]), ['Resource', 'license']),
+    ]
+    rows, headers = pipeline.concat_rows(inputs)
+    assert headers == ['Resource', 'type', 'license']
+    expected = [{'Resource': '/a', 'type': 'file', 'license': ''},
+                {'Resource': '/b', 'type': '', 'license': 'mit'}]
+    assert list(rows) == expected
+
+
+def test_unflatten_and_summarize_steps():
+    rows = iter([{'Resource': '/project/a/b.c', 'license': 'mit\ngpl'}])
+    rows, headers = pipeline.unflatten_step(rows, ['Resource', 'license'], 'license')
+    rows, headers = pipeline.summarize_step(rows, headers, 'license')
+    assert headers == ['Resource', 'license']
+    expected = [{'Resource': '/project/', 'license': 'mit\ngpl'},
+                {'Resource': '/project/a/', 'license': 'mit\ngpl'}]
+    assert list(rows) == expected
+
+
+def test_run_pipeline_checks_steps():
+    test_input = [get_test_loc('concat/sample1.csv')]
+    with pytest.raises(click.UsageError):
+        pipeline.run_pipeline(test_input, [{'sort': {'key': 'Resource'}}])
+    with pytest.raises(click.UsageError):
+        pipeline.run_pipeline(test_input, [{'flatten': {'key': 'missing'}}])
+    with pytest.raises(click.UsageError):
+        pipeline.run_pipeline(test_input, [{'flatten': {'column': 'Resource'}}])
+
+
+def test_pipeline_cli(tmp_path):
+    test_file = get_test_loc('concat/sample1.csv')
+    test_file2 = get_test_loc('concat/sample2.csv')
+    output = str(tmp_path / 'output.csv')
+    spec = tmp_path / 'pipeline.yml'
+    spec.write_text(
+        'input: {}\n'
+        'output: {}\n'
+        'steps:\n'
+        '  - concat:\n'
+        '      input: {}\n'
+        '  - remove_column:\n'
+        '      key: name\n'.format(test_file, output, test_file2))
+    result = CliRunner().invoke(pipeline.cli, [str(spec)], catch_exceptions=False)
+    assert result.exit_code == 0
+
+    expected = [{'Resource': '/tmp/', 'license_expression': ''},
+                {'Resource': '/tmp/test.c', 'license_expression': 'mit'}]
+    assert list(read_csv_rows(output)) == expected
+
+
+def test_pipeline_cli_with_relative_paths_and_empty_result(tmp_path, monkeypatch):
+    import shutil
+    spec_dir = tmp_path / 'spec'
+    spec_dir.mkdir()
+    shutil.copy(get_test_loc('concat/sample1.csv'), str(spec_dir / 'input.csv'))
+    spec = spec_dir / 'pipeline.yml'
+    spec.write_text(
+        'input: input.csv\n'
+        'output: output.csv\n'
+        'steps:\n'
+        '  - filter:\n'
+        '      include: Resource=missing\n')
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(pipeline.cli, [str(spec)], catch_exceptions=False)
+    assert result.exit_code == 0
+
+    output = spec_dir / 'output.csv'
+    assert output.read_text(encoding='utf-8-sig').splitlines() == ['Resource,name']
+    assert not (tmp_path / 'output.csv').exists()
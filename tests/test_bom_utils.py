@@ -169,3 +169,231 @@ class TestBomUtils(FileBasedTesting):
         expected = {'mit': ['C2', 'C4'], 'bsd-n': ['C3']}
         result = bom_utils.get_lic_key_and_coord(expression_info)
         assert result == expected
+
+    def test_iter_data_from_xlsx_matches_get_data_from_xlsx(self):
+        location = self.get_test_loc('bom_utils/input.xlsx')
+        rows, headers = bom_utils.iter_data_from_xlsx(location)
+        expected_rows, expected_headers = bom_utils.get_data_from_xlsx(location)
+        assert not isinstance(rows, list)
+        assert headers == expected_headers
+        rows = list(rows)
+        assert rows == expected_rows
+        assert rows[0]['Concluded License Expression'] == 'mit'
+        assert rows[0]['Resource Path'] == ''
+
+    def test_xlsx_readers_ignore_a_stale_dimension(self):
+        import re
+        import zipfile
+        written = self.get_temp_file('written.xlsx')
+        wb = openpyxl.Workbook()
+        wb.active.append(['Resource', 'license'])
+        wb.active.append(['/tmp', 'mit'])
+        wb.active.append(['/usr', 'gpl'])
+        wb.save(written)
+        # Rewrite the workbook with a worksheet dimension of only one cell
+        location = self.get_temp_file('stale.xlsx')
+        with zipfile.ZipFile(written) as zin, zipfile.ZipFile(location, 'w') as zout:
+            for item in zin.infolist():
+                data = zin.read(item.filename)
+                if item.filename == 'xl/worksheets/sheet1.xml':
+                    data = re.sub(b'<dimension ref="[^"]*"', b'<dimension ref="A1"', data)
+                zout.writestr(item, data)
+
+        expected_rows = [{'Resource': '/tmp', 'license': 'mit'},
+                         {'Resource': '/usr', 'license': 'gpl'}]
+        expected_headers = ['Resource', 'license']
+        rows, headers = bom_utils.iter_data_from_xlsx(location)
+        assert (list(rows), headers) == (expected_rows, expected_headers)
+        assert bom_utils.get_data_from_xlsx(location) == (expected_rows, expected_headers)
+        [(_, rows, headers)] = bom_utils.iter_sheets_data_from_xlsx(location)
+        assert (rows, headers) == (expected_rows, expected_headers)
+
+    def test_iter_data_from_xlsx_header_only_matches_get_data_from_xlsx(self):
+        location = self.get_temp_file('header.xlsx')
+        wb = openpyxl.Workbook()
+        wb.active.append(['Resource', None, 'license'])
+        wb.save(location)
+
+        rows, headers = bom_utils.iter_data_from_xlsx(location)
+        expected_rows, expected_headers = bom_utils.get_data_from_xlsx(location)
+        assert (list(rows), headers) == (expected_rows, expected_headers)
+        assert headers == ['Resource', None, 'license']
+
+    def test_iter_row_dicts_pads_short_rows_and_skips_unnamed_columns(self):
+        header = ('a', None, 'b', 'c')
+        values = [('1', 'x', None, '3'), ('4',)]
+        result = list(bom_utils.iter_row_dicts(header, values))
+        expected = [{'a': '1', 'b': '', 'c': '3'}, {'a': '4', 'b': '', 'c': ''}]
+        assert result == expected
+
+    def test_create_nexb_bom_write_only(self):
+        data = [['header 1', 'header 2'],
+                ['content 1', 'content 2']]
+        output = self.get_temp_file('nexb-bom.xlsx')
+        result_wb = bom_utils.create_nexb_bom(iter(data), write_only=True)
+        result_wb.save(output)
+
+        ws = load_workbook(output).active
+        assert list(ws.values) == [tuple(row) for row in data]
+        assert ws['A1'].font.b
+        assert ws['A1'].fill.fgColor.rgb == '00c5ffff'
+        assert not ws['A2'].font.b
+        assert ws['A2'].alignment.wrapText
+        assert ws['A1'].style == 'nexB BOM Header'
+        assert ws['B2'].style == 'nexB BOM Content'
+
+    def test_write_to_xlsx_from_iterator(self):
+        data = iter([{'Resource': '/tmp', 'name': 'tmp'},
+                     {'Resource': '/usr', 'license': '=mit'},
+                     {'Resource': '', 'name': ''}])
+        output = self.get_temp_file('output.xlsx')
+        bom_utils.write_to_xlsx(data, output)
+
+        ws = load_workbook(output).active
+        expected = [('Resource', 'name', 'license'),
+                    ('/tmp', 'tmp', None),
+                    ('/usr', None, "'=mit")]
+        assert list(ws.values) == expected
+        assert ws.freeze_panes == 'A2'
+
+    def test_iter_sheets_data_from_xlsx(self):
+        location = self.get_temp_file('sheets.xlsx')
+        wb = openpyxl.Workbook()
+        wb.active.title = 'PACKAGES'
+        wb.active.append(['name', 'version'])
+        wb.active.append(['foo', '1.0'])
+        wb.create_sheet('RESOURCES').append(['path'])
+        wb.create_sheet('MESSAGES').append(['message'])
+        wb.save(location)
+
+        result = list(bom_utils.iter_sheets_data_from_xlsx(location))
+        expected = [
+            ('PACKAGES', [{'name': 'foo', 'version': '1.0'}], ['name', 'version']),
+            ('RESOURCES', [{'path': ''}], ['path']),
+            ('MESSAGES', [{'message': ''}], ['message']),
+        ]
+        assert result == expected
+        for sheet_name, results, headers in result:
+            assert (results, headers) == bom_utils.get_data_from_xlsx(location, sheet_name)
+
+        result = list(bom_utils.iter_sheets_data_from_xlsx(
+            location, ['MESSAGES', 'PACKAGES']))
+        assert [sheet_name for sheet_name, _, _ in result] == ['PACKAGES', 'MESSAGES']
+
+    def test_write_to_csv_streams_rows_with_headers(self):
+        output = self.get_temp_file('output.csv')
+        rows = iter([{'Resource': '/tmp', 'name': 'tmp', 'extra': 'x'},
+                     {'Resource': '', 'name': ''},
+                     {'name': 'usr'}])
+        bom_utils.write_to_csv(rows, output, headers=['Resource', 'name'])
+        with open(output, encoding='utf-8-sig') as csvfile:
+            assert csvfile.read() == 'Resource,name\n/tmp,tmp\n,usr\n'
+
+    def test_write_to_csv_gzip(self):
+        import gzip
+        output = self.get_temp_file('output.csv.gz')
+        bom_utils.write_to_csv(
+            [{'Resource': '/tmp', 'name': 'tmp'}, {'license': 'mit'}], output)
+        with gzip.open(output, 'rt', encoding='utf-8-sig', newline='') as csvfile:
+            assert csvfile.read() == 'Resource,name,license\r\n/tmp,tmp,\r\n,,mit\r\n'
+
+    def test_write_to_jsonl_and_iter_data_from_jsonl(self):
+        output = self.get_temp_file('output.jsonl')
+        data = [{'Resource': '/tmp', 'size': 10},
+                {'Resource': '', 'size': ''},
+                {'Resource': '/usr', 'license': None}]
+        bom_utils.write_to_jsonl(data, output)
+
+        rows, headers = bom_utils.iter_data_from_jsonl(output)
+        assert headers == ['Resource', 'size', 'license']
+        expected = [{'Resource': '/tmp', 'size': 10, 'license': ''},
+                    {'Resource': '/usr', 'size': '', 'license': ''}]
+        assert list(rows) == expected
+
+    def test_write_to_parquet_and_iter_data_from_parquet(self):
+        import pytest
+        pytest.importorskip('pyarrow')
+        output = self.get_temp_file('output.parquet')
+        data = [{'Resource': '/tmp', 'size': 10, 'type': 'file'},
+                {'Resource': '', 'size': '', 'type': ''},
+                {'Resource': '/usr', 'size': '', 'type': 1}]
+        bom_utils.write_to_parquet(data, output)
+
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(output)
+        assert str(schema.field('size').type) == 'int64'
+        assert str(schema.field('type').type) == 'string'
+
+        rows, headers = bom_utils.iter_data_from_parquet(output)
+        assert headers == ['Resource', 'size', 'type']
+        expected = [{'Resource': '/tmp', 'size': 10, 'type': 'file'},
+                    {'Resource': '/usr', 'size': '', 'type': '1'}]
+        assert list(rows) == expected
+
+    def test_write_to_parquet_with_headers_streams_batches(self):
+        import pytest
+        pytest.importorskip('pyarrow')
+        output = self.get_temp_file('output.parquet')
+        data = [{'Resource': '/tmp', 'size': 10, 'type': ''},
+                {'Resource': '/usr', 'size': '', 'type': '', 'other': 'x'},
+                {'Resource': '/var', 'size': 3, 'type': 1}]
+        batch_size = bom_utils.PARQUET_BATCH_SIZE
+        bom_utils.PARQUET_BATCH_SIZE = 2
+        try:
+            bom_utils.write_to_parquet(
+                iter(data), output, headers=['Resource', 'size', 'type'])
+        finally:
+            bom_utils.PARQUET_BATCH_SIZE = batch_size
+
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(output)
+        assert str(schema.field('size').type) == 'int64'
+        assert str(schema.field('type').type) == 'string'
+
+        rows, headers = bom_utils.iter_data_from_parquet(output)
+        assert headers == ['Resource', 'size', 'type']
+        expected = [{'Resource': '/tmp', 'size': 10, 'type': ''},
+                    {'Resource': '/usr', 'size': '', 'type': ''},
+                    {'Resource': '/var', 'size': 3, 'type': '1'}]
+        assert list(rows) == expected
+
+    def test_write_to_parquet_with_headers_widens_columns_to_strings(self):
+        import pytest
+        pytest.importorskip('pyarrow')
+        output_dir = self.get_temp_dir()
+        output = os.path.join(output_dir, 'output.parquet')
+        data = [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}, {'a': 'x', 'b': 'z'}]
+        batch_size = bom_utils.PARQUET_BATCH_SIZE
+        bom_utils.PARQUET_BATCH_SIZE = 2
+        try:
+            bom_utils.write_to_parquet(iter(data), output, headers=['a', 'b'])
+        finally:
+            bom_utils.PARQUET_BATCH_SIZE = batch_size
+
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(output)
+        assert str(schema.field('a').type) == 'string'
+        rows, _headers = bom_utils.iter_data_from_parquet(output)
+        expected = [{'a': '1', 'b': 'x'}, {'a': '2', 'b': 'y'}, {'a': 'x', 'b': 'z'}]
+        assert list(rows) == expected
+        assert os.listdir(output_dir) == ['output.parquet']
+
+    def test_write_to_parquet_with_headers_does_not_leave_partial_output(self):
+        import pytest
+        pytest.importorskip('pyarrow')
+        output_dir = self.get_temp_dir()
+        output = os.path.join(output_dir, 'output.parquet')
+
+        def rows():
+            yield {'a': 1}
+            yield {'a': 2}
+            raise ValueError('broken input')
+
+        batch_size = bom_utils.PARQUET_BATCH_SIZE
+        bom_utils.PARQUET_BATCH_SIZE = 1
+        try:
+            with pytest.raises(ValueError):
+                bom_utils.write_to_parquet(rows(), output, headers=['a'])
+        finally:
+            bom_utils.PARQUET_BATCH_SIZE = batch_size
+        assert os.listdir(output_dir) == []
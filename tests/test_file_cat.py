@@ -17,9 +17,13 @@ from __future__ import absolute_import, print_function
 
 from utilitycode import file_cat, file_cat_resource
 
+from click.testing import CliRunner
 from commoncode.testcase import FileBasedTesting
 import csv
+import os
 from os.path import dirname, join
+from openpyxl import Workbook
+from openpyxl import load_workbook
 
 
 file_cat_rules_csv = join(
@@ -228,3 +232,69 @@ class TestFileCat(FileBasedTesting):
         processed_resources = file_cat.apply_categorize_rules_results(
             resources, rules_list)
         assert processed_resources[0].classname == 'SourcePython'
+
+    def test_rule_matcher_uses_smallest_order_and_first_rule_on_ties(self):
+        rules = [
+            {'class': 'A', 'order': '20', 'analysis_priority': '', 'file_category': '',
+             'file_subcategory': '', 'rule': 'name: README', 'condition': 'name: startswith'},
+            {'class': 'B', 'order': '10', 'analysis_priority': '', 'file_category': '',
+             'file_subcategory': '', 'rule': 'path: /doc/\ntype: file',
+             'condition': 'path: substring\ntype: equal'},
+            {'class': 'C', 'order': '10', 'analysis_priority': '', 'file_category': '',
+             'file_subcategory': '', 'rule': 'extension: .MD, .txt', 'condition': 'extension: endswith'},
+            {'class': 'D', 'order': '0', 'analysis_priority': '', 'file_category': '',
+             'file_subcategory': '', 'rule': 'programming_language: True',
+             'condition': 'programming_language: boolean'},
+        ]
+        matcher = file_cat.RuleMatcher(rules)
+
+        value = {'path': '/p/DOC/readme.md', 'name': 'readme.md', 'extension': '.md', 'type': 'file'}
+        resource = file_cat_resource.Resource.from_dict(value)
+        assert matcher.match(resource)['class'] == 'B'
+
+        value = {'path': '/p/readme.md', 'name': 'readme.md', 'extension': '.md', 'type': 'file'}
+        resource = file_cat_resource.Resource.from_dict(value)
+        assert matcher.match(resource)['class'] == 'C'
+
+        value = {'path': '/p/readme', 'name': 'readme', 'type': 'file'}
+        resource = file_cat_resource.Resource.from_dict(value)
+        assert matcher.match(resource)['class'] == 'A'
+
+        value = {'path': '/p/doc/readme.c', 'name': 'readme.c', 'type': 'directory',
+                 'programming_language': 'C'}
+        resource = file_cat_resource.Resource.from_dict(value)
+        assert matcher.match(resource)['class'] == 'D'
+
+        value = {'path': '/p/foo.c', 'name': 'foo.c', 'type': 'file'}
+        resource = file_cat_resource.Resource.from_dict(value)
+        assert matcher.match(resource) is None
+
+    def test_cli_directory_with_jobs_isolates_failed_files(self):
+        input_dir = self.get_temp_dir()
+        output_dir = self.get_temp_dir()
+        headers = ['path', 'name', 'extension', 'mime_type', 'file_type', 'type',
+                   'programming_language']
+        for index in range(3):
+            wb = Workbook()
+            ws = wb.active
+            ws.title = 'RESOURCES'
+            ws.append(headers)
+            ws.append(['p/setup.py', 'setup.py', '.py', 'text/x-script.python',
+                       'Python script, ASCII text executable', 'file', 'Python'])
+            wb.save(os.path.join(input_dir, 'bom{}.xlsx'.format(index)))
+        wb = Workbook()
+        wb.active.append(['path'])
+        wb.save(os.path.join(input_dir, 'invalid.xlsx'))
+
+        result = CliRunner().invoke(
+            file_cat.cli, [input_dir, output_dir, '--jobs', '2'])
+        assert result.exit_code == 1
+        assert '1 of 4 files failed' in result.output
+        assert 'invalid.xlsx' in result.output
+
+        for index in range(3):
+            output_file = os.path.join(output_dir, 'bom{}-file-cat.xlsx'.format(index))
+            ws = load_workbook(output_file)['RESOURCES']
+            rows = list(ws.values)
+            assert rows[0][:3] == ('analysis_priority', 'file_category', 'file_subcategory')
+            assert rows[1][:3] == (1, 'script', 'python')
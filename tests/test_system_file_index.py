@@ -17,9 +17,14 @@ from __future__ import absolute_import, print_function
 
 from collections import defaultdict
 
+import csv
+import functools
+import gzip
 import io
 import json
 import os
+import shutil
+import threading
 
 from click.testing import CliRunner
 import unicodecsv
@@ -49,6 +54,37 @@ class TestSystemFileIndex(FileBasedTesting):
         self.assertEqual(expected_suffix, matched_suffix)
         self.assertEqual(expected_package, package)
 
+    def test_system_file_index_get_matches_does_not_mutate_index(self):
+        packages_by_path = defaultdict(list)
+        packages_by_path['bin/busybox'].append('busybox')
+        paths = ['/foo/bar/baz', 'busybox']
+        results = [match.to_dict() for match in system_file_index.get_matches(paths, packages_by_path)]
+        self.assertEqual(['/foo/bar/baz', 'busybox'], [r['Resource'] for r in results])
+        self.assertEqual([''], list(set(v for r in results for k, v in r.items() if k != 'Resource')))
+        self.assertEqual(['bin/busybox'], list(packages_by_path))
+
+    def test_system_file_index_longest_match(self):
+        packages_by_path = {
+            'bin/busybox': ['busybox'],
+            'usr/bin/busybox': ['busybox-static', 'busybox-extra'],
+            'usr/bin!/busybox': ['other'],
+        }
+        index_path = self.get_temp_file('index-file')
+        system_file_index.save_index(packages_by_path, index_path)
+        trie = system_file_index.PathTrie(packages_by_path.items())
+        with system_file_index.load_index(index_path) as mapped:
+            for index in (trie, mapped):
+                match = index.longest_match('/foo/usr/bin/busybox')
+                self.assertEqual('usr/bin/busybox', match.suffix)
+                self.assertEqual(['busybox-static', 'busybox-extra'], package_names(match.packages))
+
+                match = index.longest_match('/foo/sbin/bin/busybox')
+                self.assertEqual('bin/busybox', match.suffix)
+                self.assertEqual(['busybox'], package_names(match.packages))
+
+                self.assertIsNone(index.longest_match('busybox'))
+                self.assertIsNone(index.longest_match('/foo/sbin/busybox'))
+
     def test_system_file_index_parse_contents(self):
         truncated_contents_file = self.get_test_loc(
             'system_file_index/truncated-contents-file.gz')
@@ -61,6 +97,124 @@ class TestSystemFileIndex(FileBasedTesting):
             'system_file_index/expected-paths-by-packages.json')
         check_json(paths_by_packages, expected_paths_by_packages, regen=False)
 
+    def test_system_file_index_save_and_load_index(self):
+        packages_by_path = defaultdict(list)
+        packages_by_path['bin/busybox'].extend(['busybox', 'busybox-static'])
+        packages_by_path['usr/bin/ls'].append('coreutils')
+        packages_by_path['usr/share/doc/caf\xe9'].append('busybox')
+        index_path = self.get_temp_file('index-file')
+        system_file_index.save_index(packages_by_path, index_path)
+        with system_file_index.load_index(index_path) as index:
+            self.assertEqual(3, len(index))
+            self.assertEqual(['busybox', 'busybox-static'], package_names(index['bin/busybox']))
+            self.assertEqual(['busybox'], package_names(index.get('usr/share/doc/caf\xe9')))
+            self.assertIsNone(index.get('bin/ls'))
+            self.assertNotIn('bin/ls', index)
+            results = {path: package_names(packages) for path, packages in index.items()}
+            self.assertEqual(dict(packages_by_path), results)
+
+    def test_system_file_index_load_index_invalid_file(self):
+        index_path = self.get_temp_file('index-file')
+        with open(index_path, 'wb') as f:
+            f.write(b'not an index')
+        with self.assertRaises(Exception):
+            system_file_index.load_index(index_path)
+
+    def test_system_file_index_build_index(self):
+        truncated_contents_file = self.get_test_loc(
+            'system_file_index/truncated-contents-file.gz')
+        expected_packages_by_path = self.get_test_loc(
+            'system_file_index/expected-packages-by-path.json')
+        # a small sort buffer forces an on-disk sort in multiple runs
+        for sort_buffer_size, processes in ((2, 1), (1000, 1), (2, 2)):
+            index_path = self.get_temp_file('index-file')
+            system_file_index.build_index(
+                [truncated_contents_file, truncated_contents_file],
+                index_path,
+                has_header=True,
+                sort_buffer_size=sort_buffer_size,
+                processes=processes,
+            )
+            with system_file_index.load_index(index_path) as index:
+                with io.open(expected_packages_by_path, encoding='utf-8') as exp:
+                    expected = json.load(exp)
+                expected = {path: packages * 2 for path, packages in expected.items()}
+                results = {path: package_names(packages) for path, packages in index.items()}
+                self.assertEqual(expected, results)
+
+    def test_system_file_index_find_contents_files_and_tags(self):
+        truncated_contents_file = self.get_test_loc(
+            'system_file_index/truncated-contents-file.gz')
+        mirror_dir = self.get_temp_dir()
+        for suite, area, arch in (
+            ('bookworm', 'main', 'amd64'),
+            ('bookworm', 'main', 'arm64'),
+            ('bullseye', 'contrib', 'amd64'),
+        ):
+            target_dir = os.path.join(mirror_dir, 'dists', suite, area)
+            os.makedirs(target_dir, exist_ok=True)
+            shutil.copy(truncated_contents_file, os.path.join(target_dir, 'Contents-{}.gz'.format(arch)))
+
+        contents_files = system_file_index.find_contents_files(mirror_dir, archs=['amd64'])
+        results = [(cf.suite, cf.area, cf.arch) for cf in contents_files]
+        expected = [('bookworm', 'main', 'amd64'), ('bullseye', 'contrib', 'amd64')]
+        self.assertEqual(expected, results)
+
+        index_path = self.get_temp_file('index-file')
+        system_file_index.build_index(contents_files, index_path, has_header=True, processes=2)
+        with system_file_index.load_index(index_path) as index:
+            expected = [
+                system_file_index.Package('archdetect-deb', 'bookworm', 'amd64', 'main', 'utils'),
+                system_file_index.Package('archdetect-deb', 'bullseye', 'amd64', 'contrib', 'utils'),
+            ]
+            self.assertEqual(expected, index['bin/archdetect'])
+
+    def test_system_file_index_build_index_is_incremental(self):
+        truncated_contents_file = self.get_test_loc(
+            'system_file_index/truncated-contents-file.gz')
+        contents_dir = self.get_temp_dir()
+        contents1 = os.path.join(contents_dir, 'Contents-amd64.gz')
+        contents2 = os.path.join(contents_dir, 'Contents-arm64.gz')
+        shutil.copy(truncated_contents_file, contents1)
+        shutil.copy(truncated_contents_file, contents2)
+
+        index_path = self.get_temp_file('index-file')
+        shards_dir = system_file_index.get_shards_dir(index_path)
+
+        def get_runs():
+            return {
+                source['arch']: source['runs']
+                for source in system_file_index.load_manifest(shards_dir)
+            }
+
+        system_file_index.build_index([contents1, contents2], index_path, has_header=True)
+        initial_runs = get_runs()
+        self.assertEqual(['amd64', 'arm64'], sorted(initial_runs))
+
+        # unchanged files are not parsed again
+        system_file_index.build_index([contents1, contents2], index_path, has_header=True)
+        self.assertEqual(initial_runs, get_runs())
+
+        # changed files are parsed again
+        with gzip.open(contents2, 'wb') as f:
+            f.write(b'FILE LOCATION\nbin/busybox utils/busybox\n')
+        system_file_index.build_index([contents1, contents2], index_path, has_header=True)
+        runs = get_runs()
+        self.assertEqual(initial_runs['amd64'], runs['amd64'])
+        self.assertNotEqual(initial_runs['arm64'], runs['arm64'])
+        with system_file_index.load_index(index_path) as index:
+            self.assertEqual(['arm64'], [p.arch for p in index['bin/busybox']])
+            self.assertEqual(['amd64'], [p.arch for p in index['bin/archdetect']])
+
+        # removed files are dropped from the index and their shards deleted
+        system_file_index.build_index([contents2], index_path, has_header=True)
+        self.assertEqual(['arm64'], sorted(get_runs()))
+        expected_files = sorted(runs['arm64'] + [system_file_index.MANIFEST_NAME])
+        self.assertEqual(expected_files, sorted(os.listdir(shards_dir)))
+        with system_file_index.load_index(index_path) as index:
+            self.assertEqual(1, len(index))
+            self.assertNotIn('bin/archdetect', index)
+
     def test_system_file_index_cli(self):
         test_index_file = self.get_test_loc(
             'system_file_index/test-index-file')
@@ -73,6 +227,81 @@ class TestSystemFileIndex(FileBasedTesting):
                           catch_exceptions=False)
         check_csvs(output_csv, expected_csv, regen=False)
 
+    def test_system_file_index_cli_with_server(self):
+        test_index_file = self.get_test_loc(
+            'system_file_index/test-index-file')
+        test_csv = self.get_test_loc('system_file_index/test-in.csv')
+        expected_csv = self.get_test_loc('system_file_index/expected.csv')
+        socket_path = os.path.join(self.get_temp_dir(), 'sfi.sock')
+        with system_file_index.load_index(test_index_file) as index:
+            tcp_server = system_file_index.make_server(index, port=0)
+            unix_server = system_file_index.make_server(index, socket_path=socket_path)
+            for server in (tcp_server, unix_server):
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                for server_url in (
+                    'http://127.0.0.1:{}'.format(tcp_server.server_port),
+                    'unix:{}'.format(socket_path),
+                ):
+                    output_csv = self.get_temp_file('test-out.csv')
+                    options = ['--server', server_url, test_csv, output_csv]
+                    runner = CliRunner()
+                    _ = runner.invoke(system_file_index.cli, options,
+                                      catch_exceptions=False)
+                    check_csvs(output_csv, expected_csv, regen=False)
+            finally:
+                for server in (tcp_server, unix_server):
+                    server.shutdown()
+                    server.server_close()
+
+    def test_system_file_index_match_csv_keeps_input_columns(self):
+        packages_by_path = {'bin/busybox': ['busybox', 'busybox-static']}
+        input_csv = self.get_temp_file('test-in.csv')
+        with io.open(input_csv, 'w', encoding='utf-8') as f:
+            f.write('sha1,Resource\n1,/x/bin/busybox\n2,/x/bin/busybox\n3,/x/bin/ls\n')
+        output_csv = self.get_temp_file('test-out.csv')
+        matcher = functools.partial(
+            system_file_index.get_matches_by_path, packages_by_path=packages_by_path)
+        system_file_index.match_csv(input_csv, output_csv, matcher)
+
+        with io.open(output_csv, encoding='utf-8') as f:
+            results = list(csv.DictReader(f))
+        expected = [
+            ('1', '/x/bin/busybox', 'busybox'),
+            ('1', '/x/bin/busybox', 'busybox-static'),
+            ('2', '/x/bin/busybox', 'busybox'),
+            ('2', '/x/bin/busybox', 'busybox-static'),
+            ('3', '/x/bin/ls', ''),
+        ]
+        self.assertEqual(expected, [(r['sha1'], r['Resource'], r['matched_package']) for r in results])
+        self.assertEqual(['sha1', 'Resource', 'matched_suffix'], list(results[0])[:3])
+
+    def test_system_file_index_cli_with_workers(self):
+        test_index_file = self.get_test_loc(
+            'system_file_index/test-index-file')
+        test_csv = self.get_test_loc('system_file_index/test-in.csv')
+        output_csv = self.get_temp_file('test-out.csv')
+        expected_csv = self.get_test_loc('system_file_index/expected.csv')
+        options = ['--index-file', test_index_file, '--workers', '2', test_csv, output_csv]
+        runner = CliRunner()
+        _ = runner.invoke(system_file_index.cli, options,
+                          catch_exceptions=False)
+        check_csvs(output_csv, expected_csv, regen=False)
+
+    def test_system_file_index_get_matches_by_path_in_parallel_keeps_order(self):
+        test_index_file = self.get_test_loc(
+            'system_file_index/test-index-file')
+        paths = ['/foo/bin/afio', '/foo/bin/ash', 'afio', '/foo/bin/archdetect'] * 5
+        results = system_file_index.get_matches_by_path_in_parallel(
+            paths, test_index_file, workers=2, chunk_size=3)
+        results = [[m.matched_package for m in matches] for matches in results]
+        expected = [['afio'], ['ash'], [''], ['archdetect-deb']] * 5
+        self.assertEqual(expected, results)
+
+
+def package_names(packages):
+    return [getattr(package, 'name', package) for package in packages]
+
 
 def check_json(result, expected_file, regen=False):
     if regen:
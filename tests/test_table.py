@@ -0,0 +1,58 @@
+# ============================================================================
+#  Copyright (c) nexB Inc. http://www.nexb.com/ - All rights reserved.
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+#  SPDX-License-Identifier: Apache-2.0
+# ============================================================================
+
+from utilitycode.table import Table
+
+
+def test_table_from_rows_uses_the_union_of_the_keys():
+    rows = [{'Resource': '/tmp/', 'name': 'tmp'},
+            {'license_expression': 'mit', 'Resource': '/tmp/test.c'},
+            {}]
+    table = Table.from_rows(rows)
+    assert table.headers == ['Resource', 'name', 'license_expression']
+    assert len(table) == 3
+    expected = [('/tmp/', 'tmp', ''), ('/tmp/test.c', '', 'mit'), ('', '', '')]
+    assert list(table.iter_values()) == expected
+    expected = [{'Resource': '/tmp/', 'name': 'tmp', 'license_expression': ''},
+                {'Resource': '/tmp/test.c', 'name': '', 'license_expression': 'mit'},
+                {'Resource': '', 'name': '', 'license_expression': ''}]
+    assert list(table.iter_rows()) == expected
+
+
+def test_table_interns_short_string_values():
+    value = ''.join(['m', 'i', 't'])
+    table = Table.from_rows([{'license': value}, {'license': 'mi' + 't'}])
+    first, second = table.column('license')
+    assert first is second
+
+
+def test_table_select_and_drop_share_columns():
+    table = Table.from_rows([{'a': 1, 'b': 2, 'c': 3}, {'a': 4, 'c': 6}])
+    selected = table.select(['c', 'a', 'c'])
+    assert selected.headers == ['c', 'a']
+    assert list(selected.iter_values()) == [(3, 1), (6, 4)]
+    assert selected.column('a') is table.column('a')
+
+    dropped = table.drop(['b', 'missing'])
+    assert dropped.headers == ['a', 'c']
+    assert list(dropped.iter_values()) == [(1, 3), (4, 6)]
+
+
+def test_table_concat():
+    table1 = Table.from_rows([{'a': 1, 'b': 2}])
+    table2 = Table.from_rows([{'c': 3, 'a': 4}, {'c': 5}])
+    table = Table.concat([table1, table2])
+    assert table.headers == ['a', 'b', 'c']
+    assert list(table.iter_values()) == [(1, 2, ''), (4, '', 3), ('', '', 5)]